@@ -0,0 +1,47 @@
+"""Compressed per-user archives of records moved out of the hot JSON files.
+
+Each user's archived entries of one collection live in
+data/archive/<user_id>/<collection>.jsonl.gz, one JSON object per line.
+Appends add a new gzip member, so archiving never rewrites what is
+already there. Cold archives (<collection>.cold.jsonl.gz) hold data moved
+out while its owner was inactive and are taken back on their return.
+"""
+import gzip
+import json
+import os
+from storage import data_path
+
+ARCHIVE_DIR = 'archive'
+
+def archive_name(user_id, filename, cold=False):
+    """Path of a user's archive relative to the data directory."""
+    name = os.path.splitext(filename)[0] + ('.cold' if cold else '')
+    return os.path.join(ARCHIVE_DIR, str(user_id), f"{name}.jsonl.gz")
+
+def archive_path(user_id, filename, cold=False):
+    return data_path(archive_name(user_id, filename, cold))
+
+def append_archive(user_id, filename, items, cold=False):
+    """Append stored dicts to the user's archive of a collection."""
+    if not items:
+        return
+    path = archive_path(user_id, filename, cold)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with gzip.open(path, 'at', encoding='utf-8') as f:
+        f.writelines(json.dumps(item) + '\n' for item in items)
+
+def iter_archive(user_id, filename, cold=False):
+    """Yield the stored dicts archived for a user, oldest first."""
+    path = archive_path(user_id, filename, cold)
+    if not os.path.exists(path):
+        return
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        for line in f:
+            yield json.loads(line)
+
+def discard_archive(user_id, filename, cold=False):
+    """Delete a user's archive of a collection (after it has been restored)."""
+    try:
+        os.remove(archive_path(user_id, filename, cold))
+    except FileNotFoundError:
+        pass
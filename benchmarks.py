@@ -0,0 +1,388 @@
+"""Micro-benchmarks for the storage, vault and rendering paths.
+
+Each benchmark runs against a throwaway data directory:
+
+    python benchmarks.py cold_start
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+def _run_in_temp_dir(code, env=None):
+    """Run a Python snippet in a fresh interpreter and temp data dir; returns stdout."""
+    with tempfile.TemporaryDirectory() as workdir:
+        result = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=workdir,
+            env=dict(os.environ, PYTHONPATH=REPO_DIR, **(env or {})),
+            capture_output=True, text=True, check=True
+        )
+    return result.stdout
+
+def bench_cold_start(runs=5):
+    """Import time of the storage layer and cost of the first vault operation."""
+    code = (
+        "import time\n"
+        "t0 = time.perf_counter()\n"
+        "import extra_storage\n"
+        "t1 = time.perf_counter()\n"
+        "from vault import get_vault\n"
+        "get_vault().encrypt('x')\n"
+        "t2 = time.perf_counter()\n"
+        "print(t1 - t0, t2 - t1)\n"
+    )
+    env = {'ENCRYPTION_KEY': ''}
+    samples = [tuple(map(float, _run_in_temp_dir(code, env).split())) for _ in range(runs)]
+    import_ms = min(s[0] for s in samples) * 1000
+    first_use_ms = min(s[1] for s in samples) * 1000
+
+    # What the old encryption.py paid on every import without ENCRYPTION_KEY
+    from cryptography.hazmat.primitives import hashes
+    from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+    started = time.perf_counter()
+    PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=os.urandom(16),
+               iterations=100000).derive(os.urandom(32))
+    legacy_kdf_ms = (time.perf_counter() - started) * 1000
+
+    print(f"import extra_storage:        {import_ms:8.1f} ms")
+    print(f"first vault encrypt:         {first_use_ms:8.1f} ms (keyring created lazily)")
+    print(f"removed import-time PBKDF2:  {legacy_kdf_ms:8.1f} ms")
+
+def bench_vault(users=64, ops_per_user=20):
+    """Vault encrypt+decrypt throughput with a cold vs warm derived-key cache."""
+    import asyncio
+    from vault import PasswordVault
+
+    async def run(vault, user_ids):
+        started = time.perf_counter()
+        for user_id in user_ids:
+            token, key_id, kdf = await vault.encrypt_for(user_id, 'hunter2')
+            await vault.decrypt_for(user_id, token, key_id, kdf)
+        return len(user_ids) / (time.perf_counter() - started)
+
+    async def burst(vault, user_ids):
+        """Concurrent cold requests; measures the longest event-loop stall."""
+        worst = 0.0
+        stop = False
+
+        async def ticker():
+            nonlocal worst
+            while not stop:
+                tick = time.perf_counter()
+                await asyncio.sleep(0.001)
+                worst = max(worst, time.perf_counter() - tick - 0.001)
+
+        probe = asyncio.create_task(ticker())
+        await asyncio.sleep(0.01)
+        await asyncio.gather(*(vault.encrypt_for(u, 'x') for u in user_ids))
+        stop = True
+        await probe
+        return worst
+
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            vault = PasswordVault(keyring_file=os.path.join(workdir, 'keys.json'))
+            cold = asyncio.run(run(vault, list(range(users))))
+            warm = asyncio.run(run(vault, [u for u in range(users) for _ in range(ops_per_user)]))
+            stall = asyncio.run(burst(vault, list(range(users, users * 2))))
+        finally:
+            os.chdir(cwd)
+
+    print(f"cold cache:  {cold:10.1f} ops/s ({users} derivations)")
+    print(f"warm cache:  {warm:10.1f} ops/s")
+    print(f"worst event-loop stall during a {users}-user cold burst: {stall * 1000:.1f} ms")
+
+def bench_timeparse(rounds=2000):
+    """Time-expression parses/sec with a cold vs warm spec cache."""
+    from timeparse import _parse_spec, parse_time
+    from timezones import get_zone
+
+    tz = get_zone('Asia/Kolkata')
+    expressions = [
+        'in 20m', 'in 1h30m', '14:30', '9am', 'tomorrow 9am', '9am tomorrow',
+        'next fri 14:30', 'monday at noon', '2025-03-20 14:30', '12/25', 'dec 25 2025', 'tonight',
+    ]
+
+    def run(clear):
+        started = time.perf_counter()
+        for _ in range(rounds):
+            if clear:
+                _parse_spec.cache_clear()
+            for text in expressions:
+                parse_time(text, tz)
+        return rounds * len(expressions) / (time.perf_counter() - started)
+
+    cold = run(clear=True)
+    warm = run(clear=False)
+    print(f"cold cache:  {cold:10.0f} parses/s")
+    print(f"warm cache:  {warm:10.0f} parses/s")
+
+def bench_records(count=50000):
+    """Retained memory of decoded collections: plain dicts vs slotted records."""
+    import json
+    import tracemalloc
+    from records import Task, Reminder, CalendarEvent
+
+    samples = {
+        Task: lambda i: {'task': f"Task number {i}", 'created_at': 1760000000 + i,
+                         'completed': i % 3 == 0, 'user_id': i % 500},
+        Reminder: lambda i: {'time': 1760000000 + i * 60, 'message': f"Reminder {i}", 'user_id': i % 500},
+        CalendarEvent: lambda i: {'date': f"2026-{i % 12 + 1:02d}-{i % 28 + 1:02d}", 'event': f"Event {i}",
+                                  'user_id': i % 500, 'created_at': 1760000000 + i},
+    }
+
+    def retained(build):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        value = build()
+        used = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+        del value
+        return used
+
+    for cls, make in samples.items():
+        blob = json.dumps([make(i) for i in range(count)])
+        as_dicts = retained(lambda: json.loads(blob))
+        as_records = retained(lambda: [cls.from_storage(d) for d in json.loads(blob)])
+        started = time.perf_counter()
+        decoded = [cls.from_storage(d) for d in json.loads(blob)]
+        decode_s = time.perf_counter() - started
+        started = time.perf_counter()
+        json.dumps([r.to_storage() for r in decoded])
+        encode_s = time.perf_counter() - started
+        print(f"{cls.__name__:14} dicts {as_dicts / count:6.0f} B/record   records {as_records / count:6.0f} B/record"
+              f"   ({1 - as_records / as_dicts:.0%} less)   load {decode_s * 1000:6.1f} ms"
+              f"   save {encode_s * 1000:6.1f} ms for {count}")
+
+def bench_notes_search(notes=5000, vocabulary=20000, words_per_note=80, queries=200):
+    """Notes listing, index build time and /searchnotes latency for one heavy user."""
+    import random
+    from note_store import NotesIndex, get_notes_page
+    from storage import save_json
+
+    rng = random.Random(42)
+    words = [f"word{i}" for i in range(vocabulary)]
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            save_json([
+                {'title': f"Note {i}", 'content': ' '.join(rng.choices(words, k=words_per_note)), 'user_id': 1}
+                for i in range(notes)
+            ], 'notes.json')
+            NotesIndex().refresh()  # moves the inline bodies out and writes their terms files
+            started = time.perf_counter()
+            for _ in range(20):
+                get_notes_page(1, 0, 10)
+            list_s = (time.perf_counter() - started) / 20
+            index = NotesIndex()
+            started = time.perf_counter()
+            index.refresh()
+            build_s = time.perf_counter() - started
+
+            for label, make_query in [
+                ('one term', lambda: rng.choice(words)),
+                ('two terms', lambda: f"{rng.choice(words)} {rng.choice(words)}"),
+                ('term + prefix', lambda: f"{rng.choice(words)} {rng.choice(words)[:7]}*"),
+                ('prefix only', lambda: f"{rng.choice(words)[:8]}*"),
+            ]:
+                batch = [make_query() for _ in range(queries)]
+                started = time.perf_counter()
+                for query in batch:
+                    index.search(1, query)
+                print(f"{label:14} {(time.perf_counter() - started) / queries * 1000:8.3f} ms/query")
+        finally:
+            os.chdir(cwd)
+    print(f"notes page: {list_s * 1000:.1f} ms; index build for {notes} notes (from terms files): {build_s * 1000:.0f} ms")
+
+def bench_task_filters(tasks=10000, queries=200):
+    """Filtered /todo page latency for one user with many tagged tasks, against a full scan."""
+    import random
+    from datetime import timezone
+    from task_store import TaskIndex, parse_task_filter
+    from storage import save_json, load_json
+
+    rng = random.Random(42)
+    now = int(time.time())
+    tags = [f"tag{i}" for i in range(20)]
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            save_json([
+                {'user_id': 1, 'task': f"Task {i}", 'completed': rng.random() < 0.5, 'created_at': now,
+                 'tags': rng.sample(tags, 2), 'priority': rng.choice([1, 2, 3]),
+                 'due': now + rng.randint(-10, 30) * 86400}
+                for i in range(tasks)
+            ], 'tasks.json')
+            index = TaskIndex()
+            started = time.perf_counter()
+            index.refresh()
+            build_s = time.perf_counter() - started
+
+            for query in ['#tag3', '#tag3 open', '#tag3 !high due:week', 'due:overdue open', 'task 99']:
+                task_filter = parse_task_filter(query, timezone.utc)
+                started = time.perf_counter()
+                for _ in range(queries):
+                    page, total = index.user(1).page(task_filter, 0, 10)
+                indexed_s = (time.perf_counter() - started) / queries
+                started = time.perf_counter()
+                for _ in range(queries // 20):
+                    # What a filter costs without the index: decode and test every task
+                    matches = [
+                        item for item in load_json('tasks.json')
+                        if all(t[1:] in item['tags'] for t in query.split() if t.startswith('#'))
+                    ]
+                scan_s = (time.perf_counter() - started) / (queries // 20)
+                print(f"{query:22} {indexed_s * 1000:8.3f} ms/page   full scan {scan_s * 1000:7.1f} ms   ({total} matches)")
+        finally:
+            os.chdir(cwd)
+    print(f"index build for {tasks} tasks: {build_s * 1000:.0f} ms")
+
+def bench_goal_history(years=5):
+    """Memory, disk and trend cost of a goal updated daily for years."""
+    import tracemalloc
+    from goal_store import GoalHistory
+
+    days = 365 * years
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            now = int(time.time())
+            writer = GoalHistory()
+            for day in range(days):
+                writer.record('goal', now + day * 86400, min(100, day * 100 // days))
+            disk = os.path.getsize(os.path.join('data', 'goal_history', 'goal.bin'))
+
+            tracemalloc.start()
+            before = tracemalloc.get_traced_memory()[0]
+            series = GoalHistory().series('goal')
+            packed = tracemalloc.get_traced_memory()[0] - before
+            before = tracemalloc.get_traced_memory()[0]
+            as_dicts = [{'at': when, 'progress': value} for when, value in zip(series.times, series.values)]
+            dicts = tracemalloc.get_traced_memory()[0] - before
+            tracemalloc.stop()
+            del as_dicts
+
+            started = time.perf_counter()
+            for _ in range(1000):
+                series.projected_completion()
+            trend_s = (time.perf_counter() - started) / 1000
+        finally:
+            os.chdir(cwd)
+    print(f"{days} daily updates: {disk} B on disk, {packed} B in memory (as dicts: {dicts} B), "
+          f"trend {trend_s * 1000:.3f} ms")
+
+def bench_calendar(events=5000, queries=200):
+    """/calendar week latency through the date index against decoding every event."""
+    import random
+    from datetime import date, datetime, timedelta
+    from calendar_store import CalendarIndex, parse_span
+    from storage import save_json, get_user_records
+
+    rng = random.Random(42)
+    today = date.today()
+    with tempfile.TemporaryDirectory() as workdir:
+        cwd = os.getcwd()
+        os.chdir(workdir)
+        try:
+            save_json([
+                {'user_id': 1, 'date': (today + timedelta(days=rng.randint(-1000, 1000))).isoformat(),
+                 'event': f"Event {i}"}
+                for i in range(events)
+            ], 'calendar_events.json')
+            index = CalendarIndex()
+            index.refresh()
+            first, last = parse_span('week', today)
+            started = time.perf_counter()
+            for _ in range(queries):
+                user = index.user(1)
+                week = user.decode(user.between(first, last))
+            indexed_s = (time.perf_counter() - started) / queries
+
+            started = time.perf_counter()
+            for _ in range(queries // 20):
+                scanned = [
+                    event for event in get_user_records('calendar_events.json', 1)
+                    if 0 <= (datetime.strptime(event.date, "%Y-%m-%d").date() - today).days <= 6
+                ]
+            scan_s = (time.perf_counter() - started) / (queries // 20)
+        finally:
+            os.chdir(cwd)
+    print(f"week of {events} events ({len(week)} found): index {indexed_s * 1000:.3f} ms, "
+          f"full scan {scan_s * 1000:.1f} ms")
+
+def bench_export(sizes=(5000, 50000)):
+    """/export peak memory as a user's data grows, next to the size of what it reads and writes."""
+    import tracemalloc
+    from export import write_export, import_user_data
+    from storage import save_json, load_json
+
+    for size in sizes:
+        with tempfile.TemporaryDirectory() as workdir:
+            cwd = os.getcwd()
+            os.chdir(workdir)
+            try:
+                now = int(time.time())
+                save_json([
+                    {'user_id': 1, 'task': f"Task number {i} with some words", 'completed': False, 'created_at': now}
+                    for i in range(size)
+                ], 'tasks.json')
+                stored = os.path.getsize(os.path.join('data', 'tasks.json'))
+                tracemalloc.start()
+                load_json('tasks.json')
+                loaded = tracemalloc.get_traced_memory()[1]  # what any read of the collection costs
+                tracemalloc.stop()
+                with tempfile.TemporaryFile() as out:
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    write_export(1, out)
+                    export_s = time.perf_counter() - started
+                    export_peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+                    zipped = out.tell()
+
+                    out.seek(0)
+                    tracemalloc.start()
+                    started = time.perf_counter()
+                    asyncio.run(import_user_data(2, out))
+                    import_s = time.perf_counter() - started
+                    import_peak = tracemalloc.get_traced_memory()[1]
+                    tracemalloc.stop()
+            finally:
+                os.chdir(cwd)
+        print(f"{size:6} tasks: tasks.json {stored / 1e6:5.1f} MB, zip {zipped / 1e6:4.1f} MB; "
+              f"export {export_s * 1000:5.0f} ms, {(export_peak - loaded) / 1e6:4.1f} MB over loading tasks.json; "
+              f"import {import_s * 1000:5.0f} ms, {(import_peak - loaded) / 1e6:4.1f} MB over")
+
+BENCHMARKS = {
+    'cold_start': bench_cold_start,
+    'vault': bench_vault,
+    'timeparse': bench_timeparse,
+    'records': bench_records,
+    'notes_search': bench_notes_search,
+    'task_filters': bench_task_filters,
+    'goal_history': bench_goal_history,
+    'calendar': bench_calendar,
+    'export': bench_export,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('names', nargs='*', help=f"Benchmarks to run (default: all): {', '.join(BENCHMARKS)}")
+    args = parser.parse_args()
+    unknown = set(args.names) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+    for name in args.names or BENCHMARKS:
+        print(f"== {name}")
+        BENCHMARKS[name]()
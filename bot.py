@@ -5,14 +5,14 @@ import nest_asyncio
 from telegram import Update
 from telegram.ext import (
     Application, CommandHandler, ContextTypes, MessageHandler, 
-    filters, CallbackQueryHandler
+    filters, CallbackQueryHandler, TypeHandler
 )
 
 from handlers import (
     start_command, help_command, remind_command, add_task_command, todo_command,
-    spend_command, note_command, view_notes_command, done_command,
-    view_reminders_command, edit_task_command, delete_task_command,
-    edit_reminder_command, delete_reminder_command
+    spend_command, note_command, view_notes_command, done_command, delete_tasks_command,
+    view_reminders_command, timezone_command, track_activity, search_notes_command,
+    export_command, import_command, import_document
 )
 from goal_handlers import (
     add_goal_command, view_goals_command, update_goal_command
@@ -24,7 +24,9 @@ from extra_handlers import (
     custom_notification_command
 )
 from callback_handlers import handle_callback_query
-from scheduler import setup_scheduler
+from dynamic_commands import DYNAMIC_COMMAND_PATTERN, handle_dynamic_commands
+from scheduler import setup_scheduler, shutdown_scheduler
+from storage import migrate_timestamps
 
 # Apply nest_asyncio to handle nested event loops
 nest_asyncio.apply()
@@ -44,18 +46,6 @@ async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Sorry, an error occurred while processing your command. Please try again."
         )
 
-async def handle_dynamic_commands(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle dynamic edit/delete commands."""
-    message_text = update.message.text
-    if message_text.startswith('/edit_task_'):
-        await edit_task_command(update, context)
-    elif message_text.startswith('/delete_task_'):
-        await delete_task_command(update, context)
-    elif message_text.startswith('/edit_reminder_'):
-        await edit_reminder_command(update, context)
-    elif message_text.startswith('/delete_reminder_'):
-        await delete_reminder_command(update, context)
-
 async def setup_application():
     """Initialize and configure the application."""
     token = os.getenv("TELEGRAM_TOKEN")
@@ -67,6 +57,9 @@ async def setup_application():
     application = Application.builder().token(token).build()
     logger.info("Application created successfully")
 
+    # Runs before every other handler so archived data is back in place first
+    application.add_handler(TypeHandler(Update, track_activity), group=-1)
+
     # Add basic command handlers
     application.add_handler(CommandHandler("start", start_command))
     application.add_handler(CommandHandler("help", help_command))
@@ -74,10 +67,21 @@ async def setup_application():
     application.add_handler(CommandHandler("addtask", add_task_command))
     application.add_handler(CommandHandler("todo", todo_command))
     application.add_handler(CommandHandler("done", done_command))
+    application.add_handler(CommandHandler("delete_task", delete_tasks_command))
     application.add_handler(CommandHandler("reminders", view_reminders_command))
+    application.add_handler(CommandHandler("timezone", timezone_command))
     application.add_handler(CommandHandler("spend", spend_command))
     application.add_handler(CommandHandler("note", note_command))
     application.add_handler(CommandHandler("viewnotes", view_notes_command))
+    application.add_handler(CommandHandler("searchnotes", search_notes_command))
+
+    # Data export and import (the file comes back as a document captioned /import)
+    application.add_handler(CommandHandler("export", export_command))
+    application.add_handler(CommandHandler("import", import_command))
+    application.add_handler(MessageHandler(
+        filters.Document.ALL & filters.CaptionRegex(r'^/import(@\w+)?\s*$'),
+        import_document
+    ))
 
     # Add goal handlers
     application.add_handler(CommandHandler("addgoal", add_goal_command))
@@ -96,14 +100,9 @@ async def setup_application():
     application.add_handler(CommandHandler("calendar", calendar_command))
     application.add_handler(CommandHandler("notify", custom_notification_command))
 
-    # Add handler for dynamic edit/delete commands
+    # Add handler for dynamic edit/delete commands (/edit_task_1, /delete_note_2, ...)
     application.add_handler(MessageHandler(
-        filters.COMMAND & (
-            filters.Regex('^/edit_task_') |
-            filters.Regex('^/delete_task_') |
-            filters.Regex('^/edit_reminder_') |
-            filters.Regex('^/delete_reminder_')
-        ),
+        filters.COMMAND & filters.Regex(DYNAMIC_COMMAND_PATTERN),
         handle_dynamic_commands
     ))
 
@@ -123,6 +122,10 @@ async def run_bot():
         if not application:
             return
 
+        migrated = migrate_timestamps()
+        if migrated:
+            logger.info("Converted %d legacy timestamps to epoch seconds", migrated)
+
         # Initialize background tasks
         await setup_scheduler(application.bot)
         logger.info("Background tasks initialized")
@@ -133,6 +136,9 @@ async def run_bot():
 
     except Exception as e:
         logger.error(f"Bot crashed: {e}")
+    finally:
+        # Stops the background tasks and saves state they keep in memory (user activity)
+        await shutdown_scheduler()
 
 if __name__ == '__main__':
     asyncio.run(run_bot())
\ No newline at end of file
@@ -0,0 +1,154 @@
+"""Calendar events storage with a per-user sorted date index.
+
+Events are single days (YYYY-MM-DD, which sorts chronologically as text),
+so each user's events are kept in a list sorted by date and any range,
+such as today, the next week or an explicit span, is two bisects and a
+slice; only the events in that slice are decoded into the reply.
+"""
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+from records import CalendarEvent
+from storage import FileIndex, append_record, update_user_item, delete_user_item
+
+EVENTS_FILE = 'calendar_events.json'
+
+# /calendar <span> -> (first day offset, last day offset) from today, inclusive
+SPANS = {
+    'today': (0, 0),
+    'tomorrow': (1, 1),
+    'week': (0, 6),
+    'month': (0, 29),
+}
+
+def parse_span(text, today):
+    """(first, last) ISO dates for today|tomorrow|week|month, a date or a YYYY-MM-DD..YYYY-MM-DD range.
+
+    Raises ValueError for anything else.
+    """
+    text = text.lower()
+    if text in SPANS:
+        first, last = SPANS[text]
+        return (today + timedelta(days=first)).isoformat(), (today + timedelta(days=last)).isoformat()
+    first, dots, last = text.partition('..')
+    first = date.fromisoformat(first)
+    last = date.fromisoformat(last) if dots else first
+    if last < first:
+        raise ValueError("The range ends before it starts")
+    return first.isoformat(), last.isoformat()
+
+class _UserEvents:
+    """One user's events by internal id, plus (date, id) pairs in date order.
+
+    Ids increase in file order, so an event's position (its number in
+    /edit_event_N) is a bisect into `ids`.
+    """
+    __slots__ = ('ids', 'records', 'by_date', 'next_id')
+
+    def __init__(self):
+        self.ids = []
+        self.records = {}  # id -> stored dict, decoded only when listed
+        self.by_date = []  # sorted (date, id)
+        self.next_id = 0
+
+    def add(self, item):
+        event_id = self.next_id
+        self.next_id += 1
+        self.ids.append(event_id)
+        self.records[event_id] = item
+        insort(self.by_date, (item['date'], event_id))
+
+    def change(self, position, changes):
+        event_id = self.ids[position]
+        item = self.records[event_id]
+        self.by_date.remove((item['date'], event_id))
+        item.update(changes)
+        insort(self.by_date, (item['date'], event_id))
+
+    def remove(self, position):
+        event_id = self.ids.pop(position)
+        item = self.records.pop(event_id)
+        del self.by_date[bisect_left(self.by_date, (item['date'], event_id))]
+
+    def between(self, first, last):
+        """(date, id) pairs from first to last (ISO dates, inclusive); None leaves an end open."""
+        start = 0 if first is None else bisect_left(self.by_date, (first,))
+        end = len(self.by_date) if last is None else bisect_right(self.by_date, (last, float('inf')))
+        return self.by_date[start:end]
+
+    def decode(self, pairs):
+        """[(position, CalendarEvent)] for (date, id) pairs."""
+        return [
+            (bisect_left(self.ids, event_id), CalendarEvent.from_storage(self.records[event_id]))
+            for _, event_id in pairs
+        ]
+
+class CalendarIndex(FileIndex):
+    """Per-user date indexes over calendar_events.json.
+
+    Follows the write functions below, which refresh() first, and is
+    rebuilt when the file changes any other way (retention sweeps, tiering).
+    """
+
+    def __init__(self, filename=EVENTS_FILE):
+        super().__init__(filename, self._build)
+
+    @staticmethod
+    def _build(items):
+        users = {}  # user_id -> _UserEvents
+        for item in items:
+            users.setdefault(item['user_id'], _UserEvents()).add(item)
+        return users
+
+    def user(self, user_id):
+        return self.state.setdefault(user_id, _UserEvents())
+
+    def user_ids(self):
+        return [user_id for user_id, events in self.state.items() if events.ids]
+
+calendar_index = CalendarIndex()
+
+def save_calendar_event(event):
+    """Save a CalendarEvent."""
+    calendar_index.refresh()
+    append_record(EVENTS_FILE, event)
+    calendar_index.user(event.user_id).add(event.to_storage())
+    calendar_index.written()
+
+def get_events_between(user_id, first, last, limit=None):
+    """A user's events from first to last (ISO dates, inclusive; None is open-ended) in date order.
+
+    Returns ([(position, CalendarEvent)], total); only the first `limit`
+    events are decoded.
+    """
+    calendar_index.refresh()
+    events = calendar_index.user(user_id)
+    pairs = events.between(first, last)
+    return events.decode(pairs[:limit]), len(pairs)
+
+def get_event_users():
+    """Ids of the users who have calendar events."""
+    calendar_index.refresh()
+    return calendar_index.user_ids()
+
+def update_calendar_event(user_id, event_index, date=None, event=None):
+    """Update a calendar event's date or description."""
+    changes = {}
+    if date:
+        changes['date'] = date
+    if event:
+        changes['event'] = event
+    calendar_index.refresh()
+    if not update_user_item(EVENTS_FILE, user_id, event_index, changes):
+        return False
+    calendar_index.user(user_id).change(event_index, changes)
+    calendar_index.written()
+    return True
+
+def delete_calendar_event(user_id, event_index):
+    """Delete a calendar event."""
+    calendar_index.refresh()
+    if not delete_user_item(EVENTS_FILE, user_id, event_index):
+        return False
+    calendar_index.user(user_id).remove(event_index)
+    calendar_index.written()
+    return True
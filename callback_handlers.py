@@ -1,12 +1,22 @@
 import os
 from datetime import datetime
-import requests
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from storage import save_task, save_reminder, save_note, save_expense, save_goal
+from storage import save_reminder, save_expense
 from extra_storage import (
-    get_password, get_calendar_events, get_custom_notifications,
-    save_calendar_event, save_custom_notification
+    list_passwords, delete_password, get_custom_notifications, get_birthdays,
+    save_custom_notification, cancel_timer
+)
+from callback_store import callback_payloads
+from extra_handlers import render_calendar
+from utils import format_password_services
+from note_store import get_note_body
+from handlers import LIST_RENDERERS, remember_list_message
+from callback_router import callback_router
+from timezones import local_time
+from upstream import (
+    weather_api, news_api, translation_api, WEATHER_URL, NEWS_URL, TRANSLATE_URL,
+    SIMULATED_NEWS, offline_translate
 )
 
 async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -14,297 +24,344 @@ async def handle_callback_query(update: Update, context: ContextTypes.DEFAULT_TY
     query = update.callback_query
     await query.answer()  # Acknowledge the button click
 
-    # Weather forecast handlers
-    if query.data.startswith("weather_"):
-        parts = query.data.split("_")
-        forecast_type = parts[1]  # hourly or daily
-        city = "_".join(parts[2:])  # Handle city names with spaces
-
-        API_KEY = os.environ.get('OPENWEATHERMAP_API_KEY')
-
-        if forecast_type == "hourly":
-            # Get 3-hour forecast for next 12 hours
-            response = requests.get(
-                'http://api.openweathermap.org/data/2.5/forecast',
-                params={
-                    'q': city,
-                    'appid': API_KEY,
-                    'units': 'imperial',
-                    'cnt': 4  # Next 12 hours (3-hour intervals)
-                }
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                forecast = f"⏰ Hourly Forecast for {city}:\n\n"
-                for item in data['list']:
-                    time = datetime.fromtimestamp(item['dt']).strftime('%H:%M')
-                    temp = round(item['main']['temp'])
-                    desc = item['weather'][0]['description'].capitalize()
-                    forecast += f"{time} - {temp}°F, {desc}\n"
-            else:
-                forecast = "Sorry, couldn't fetch hourly forecast."
-
-        else:  # daily
-            # Get 4-day forecast
-            response = requests.get(
-                'http://api.openweathermap.org/data/2.5/forecast',
-                params={
-                    'q': city,
-                    'appid': API_KEY,
-                    'units': 'imperial'
-                }
-            )
-
-            if response.status_code == 200:
-                data = response.json()
-                forecast = f"📅 Daily Forecast for {city}:\n\n"
-
-                # Group by day and get daily averages
-                daily_forecasts = {}
-                for item in data['list']:
-                    date = datetime.fromtimestamp(item['dt']).strftime('%Y-%m-%d')
-                    if date not in daily_forecasts:
-                        daily_forecasts[date] = {
-                            'temps': [],
-                            'descriptions': []
-                        }
-                    daily_forecasts[date]['temps'].append(item['main']['temp'])
-                    daily_forecasts[date]['descriptions'].append(item['weather'][0]['description'])
-
-                # Format daily forecasts
-                for date, info in list(daily_forecasts.items())[:4]:  # Show 4 days
-                    avg_temp = round(sum(info['temps']) / len(info['temps']))
-                    # Get most common weather description
-                    desc = max(set(info['descriptions']), key=info['descriptions'].count).capitalize()
-                    day = datetime.strptime(date, '%Y-%m-%d').strftime('%A')  # Get day name
-                    forecast += f"{day} - {avg_temp}°F, {desc}\n"
-            else:
-                forecast = "Sorry, couldn't fetch daily forecast."
-
-        await query.edit_message_text(forecast)
-
-    # Quick action handlers
-    elif query.data == "quick_addtask":
-        await query.message.reply_text(
-            "📝 To add a task, use:\n"
-            "/addtask <task description>\n"
-            "Example: /addtask Buy groceries"
+    # Long or free-form payloads live server-side behind a short token
+    data, payload, found = callback_payloads.resolve(query.data)
+    if not found:
+        await query.edit_message_text("⌛ This button has expired. Please run the command again.")
+        return
+
+    await callback_router.dispatch(query, context, data, payload)
+
+# Weather forecast handlers
+@callback_router.prefix("weather_")
+async def weather_forecast_callback(query, context, forecast_type, city):
+    """Show the hourly or daily forecast for the city behind the button."""
+    API_KEY = os.environ.get('OPENWEATHERMAP_API_KEY')
+
+    if forecast_type == "hourly":
+        # Get 3-hour forecast for next 12 hours
+        response = await weather_api.get(
+            f"{WEATHER_URL}/forecast",
+            params={
+                'q': city,
+                'appid': API_KEY,
+                'units': 'imperial',
+                'cnt': 4  # Next 12 hours (3-hour intervals)
+            }
         )
-    elif query.data == "quick_remind":
-        await query.message.reply_text(
-            "⏰ To set a reminder, use:\n"
-            "/remind <time> <message>\n"
-            "Example: /remind 14:30 Call mom"
+
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            forecast = f"⏰ Hourly Forecast for {city}:\n\n"
+            for item in data['list']:
+                time = local_time(item['dt'], query.from_user.id).strftime('%H:%M')
+                temp = round(item['main']['temp'])
+                desc = item['weather'][0]['description'].capitalize()
+                forecast += f"{time} - {temp}°F, {desc}\n"
+        else:
+            forecast = "Sorry, couldn't fetch hourly forecast."
+
+    else:  # daily
+        # Get 4-day forecast
+        response = await weather_api.get(
+            f"{WEATHER_URL}/forecast",
+            params={
+                'q': city,
+                'appid': API_KEY,
+                'units': 'imperial'
+            }
         )
-    elif query.data == "quick_note":
-        await query.message.reply_text(
-            "📝 To add a note, use:\n"
-            "/note <title> <content>\n"
-            "Example: /note Meeting Notes Discuss project timeline"
+
+        if response is not None and response.status_code == 200:
+            data = response.json()
+            forecast = f"📅 Daily Forecast for {city}:\n\n"
+
+            # Group by day and get daily averages
+            daily_forecasts = {}
+            for item in data['list']:
+                date = local_time(item['dt'], query.from_user.id).strftime('%Y-%m-%d')
+                if date not in daily_forecasts:
+                    daily_forecasts[date] = {
+                        'temps': [],
+                        'descriptions': []
+                    }
+                daily_forecasts[date]['temps'].append(item['main']['temp'])
+                daily_forecasts[date]['descriptions'].append(item['weather'][0]['description'])
+
+            # Format daily forecasts
+            for date, info in list(daily_forecasts.items())[:4]:  # Show 4 days
+                avg_temp = round(sum(info['temps']) / len(info['temps']))
+                # Get most common weather description
+                desc = max(set(info['descriptions']), key=info['descriptions'].count).capitalize()
+                day = datetime.strptime(date, '%Y-%m-%d').strftime('%A')  # Get day name
+                forecast += f"{day} - {avg_temp}°F, {desc}\n"
+        else:
+            forecast = "Sorry, couldn't fetch daily forecast."
+
+    await query.edit_message_text(forecast)
+
+# Quick action handlers
+QUICK_ACTIONS = {
+    "quick_addtask": (
+        "📝 To add a task, use:\n"
+        "/addtask <task description>\n"
+        "Example: /addtask Buy groceries"
+    ),
+    "quick_remind": (
+        "⏰ To set a reminder, use:\n"
+        "/remind <time> <message>\n"
+        "Example: /remind 14:30 Call mom"
+    ),
+    "quick_note": (
+        "📝 To add a note, use:\n"
+        "/note <title> <content>\n"
+        "Example: /note Meeting Notes Discuss project timeline"
+    ),
+    "quick_spend": (
+        "💰 To log an expense, use:\n"
+        "/spend <amount> <description>\n"
+        "Example: /spend 25.50 Lunch"
+    ),
+    "quick_goal": (
+        "🎯 To add a goal, use:\n"
+        "/addgoal <title> <target_date> <description>\n"
+        "Example: /addgoal 'Learn Python' 12/31/2025 Master programming"
+    ),
+    "quick_weather": (
+        "🌤 To check weather, use:\n"
+        "/weather <city>\n"
+        "Example: /weather London"
+    ),
+}
+
+def _reply_with(text):
+    async def handler(query, context, arg, payload):
+        await query.message.reply_text(text)
+    return handler
+
+for key, text in QUICK_ACTIONS.items():
+    callback_router.add_route(key, _reply_with(text))
+
+# List pagination handlers; the argument is the cursor into the user's list
+def _page_turn(kind):
+    async def handler(query, context, start, payload):
+        # Filtered lists carry [start, *renderer args] as a payload instead
+        start, *args = payload if payload else [int(start)]
+        text, reply_markup, start = LIST_RENDERERS[kind](query.from_user.id, start, *args)
+        await query.edit_message_text(text, reply_markup=reply_markup)
+        remember_list_message(context, kind, query.message, start, text, args)
+    return handler
+
+callback_router.add_route("tasks_page_", _page_turn('tasks'), prefix=True)
+callback_router.add_route("reminders_page_", _page_turn('reminders'), prefix=True)
+callback_router.add_route("notes_page_", _page_turn('notes'), prefix=True)
+callback_router.add_route("history_page_", _page_turn('task_history'), prefix=True)
+
+@callback_router.prefix("view_note_")
+async def view_note_callback(query, context, note_id, payload):
+    found = get_note_body(query.from_user.id, note_id)
+    if found is None:
+        await query.message.reply_text("📝 That note no longer exists.")
+        return
+    note, body = found
+    await query.message.reply_text(f"📌 {note.title}\n\n{body}"[:4096])
+
+# Timer handlers
+@callback_router.prefix("cancel_timer_")
+async def cancel_timer_callback(query, context, timer_id, payload):
+    if cancel_timer(query.from_user.id, timer_id):
+        await query.edit_message_text("⏰ Timer cancelled!")
+    else:
+        await query.edit_message_text("⏰ That timer has already finished.")
+
+# Auto message handlers
+@callback_router.exact("cancel_auto_message")
+async def cancel_auto_message_callback(query, context, arg, payload):
+    await query.edit_message_text("🔄 Auto message cancelled!")
+
+# Translation handlers
+@callback_router.prefix("translate_")
+async def translate_callback(query, context, lang, text):
+    """Translate the text behind the button into another language."""
+    try:
+        # Use MyMemory Translation API
+        response = await translation_api.get(
+            TRANSLATE_URL,
+            params={
+                'q': text,
+                'langpair': f'en|{lang}'
+            }
         )
-    elif query.data == "quick_spend":
-        await query.message.reply_text(
-            "💰 To log an expense, use:\n"
-            "/spend <amount> <description>\n"
-            "Example: /spend 25.50 Lunch"
+
+        if response is not None and response.status_code == 200:
+            result = response.json()
+            translated = result['responseData']['translatedText']
+        else:
+            # Fallback to basic translation for common phrases
+            translated = offline_translate(text, lang)
+
+        # Add language names for clarity
+        lang_names = {
+            'hi': 'Hindi',
+            'es': 'Spanish',
+            'fr': 'French',
+            'de': 'German'
+        }
+
+        await query.edit_message_text(
+            f"🌐 Translation:\n"
+            f"Original: {text}\n"
+            f"Translated ({lang_names.get(lang, lang.upper())}): {translated}"
         )
-    elif query.data == "quick_goal":
-        await query.message.reply_text(
-            "🎯 To add a goal, use:\n"
-            "/addgoal <title> <target_date> <description>\n"
-            "Example: /addgoal 'Learn Python' 12/31/2025 Master programming"
+    except Exception as e:
+        await query.edit_message_text(
+            "Sorry, an error occurred during translation. Please try again."
         )
-    elif query.data == "quick_weather":
-        await query.message.reply_text(
-            "🌤 To check weather, use:\n"
-            "/weather <city>\n"
-            "Example: /weather London"
-        )
-
-    # Timer handlers
-    elif query.data.startswith("cancel_timer_"):
-        timer_id = query.data.split("_")[2]
-        await query.edit_message_text(f"⏰ Timer {timer_id} cancelled!")
-
-    # Auto message handlers
-    elif query.data == "cancel_auto_message":
-        await query.edit_message_text("🔄 Auto message cancelled!")
-
-    # Translation handlers
-    elif query.data.startswith("translate_"):
-        parts = query.data.split("_")
-        lang = parts[1]
-        text = "_".join(parts[2:])
-
-        try:
-            # Use MyMemory Translation API
-            MYMEMORY_URL = "https://api.mymemory.translated.net/get"
-            response = requests.get(
-                MYMEMORY_URL,
-                params={
-                    'q': text,
-                    'langpair': f'en|{lang}'
-                }
-            )
 
-            if response.status_code == 200:
-                result = response.json()
-                translated = result['responseData']['translatedText']
-            else:
-                # Fallback to basic translation for common phrases
-                translations = {
-                    'hi': {'hello': 'नमस्ते', 'world': 'दुनिया', 'how are you': 'आप कैसे हैं'},
-                    'es': {'hello': 'hola', 'world': 'mundo', 'how are you': '¿cómo estás?'},
-                    'fr': {'hello': 'bonjour', 'world': 'monde', 'how are you': 'comment allez-vous?'},
-                    'de': {'hello': 'hallo', 'world': 'welt', 'how are you': 'wie geht es dir?'}
-                }
-                words = text.lower().split()
-                translated_words = [
-                    translations.get(lang, {}).get(word, word)
-                    for word in words
-                ]
-                translated = ' '.join(translated_words)
-
-            # Add language names for clarity
-            lang_names = {
-                'hi': 'Hindi',
-                'es': 'Spanish',
-                'fr': 'French',
-                'de': 'German'
+# News category handlers
+@callback_router.prefix("news_")
+async def news_category_callback(query, context, category, payload):
+    """Show headlines for the selected news category."""
+    valid_categories = ["business", "entertainment", "general", "health", "science", "sports", "technology"]
+
+    if category not in valid_categories:
+        category = "general"
+
+    API_KEY = os.environ.get('NEWS_API_KEY')
+
+    try:
+        response = await news_api.get(
+            NEWS_URL,
+            params={
+                'apiKey': API_KEY,
+                'category': category,
+                'language': 'en',
+                'pageSize': 5
             }
+        )
 
-            await query.edit_message_text(
-                f"🌐 Translation:\n"
-                f"Original: {text}\n"
-                f"Translated ({lang_names.get(lang, lang.upper())}): {translated}"
-            )
-        except Exception as e:
-            await query.edit_message_text(
-                "Sorry, an error occurred during translation. Please try again."
-            )
-
-    # News category handlers
-    elif query.data.startswith("news_"):
-        category = query.data.split("_")[1]
-        valid_categories = ["business", "entertainment", "general", "health", "science", "sports", "technology"]
-
-        if category not in valid_categories:
-            category = "general"
-
-        API_KEY = os.environ.get('NEWS_API_KEY')
-        BASE_URL = 'https://newsapi.org/v2/top-headlines'
-
-        try:
-            response = requests.get(
-                BASE_URL,
-                params={
-                    'apiKey': API_KEY,
-                    'category': category,
-                    'language': 'en',
-                    'pageSize': 5
-                }
-            )
-
-            if response.status_code != 200:
-                await query.edit_message_text(
-                    "Sorry, couldn't fetch news at the moment. Please try again later."
-                )
-                return
-
+        if response is None or response.status_code != 200:
+            # Fallback to simulated news if API fails
+            articles = [
+                dict(article, source={'name': 'Offline Mode'})
+                for article in SIMULATED_NEWS.get(category, SIMULATED_NEWS["general"])
+            ]
+        else:
             data = response.json()
             articles = data.get('articles', [])
 
-            if not articles:
-                await query.edit_message_text(
-                    f"No news found for category: {category}"
-                )
-                return
-
-            # Create category selection buttons
-            keyboard = []
-            for i in range(0, len(valid_categories), 3):
-                row = [
-                    InlineKeyboardButton(
-                        cat.title(),
-                        callback_data=f"news_{cat}"
-                    ) for cat in valid_categories[i:i+3]
-                ]
-                keyboard.append(row)
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            news_text = f"📰 Latest {category.title()} News:\n\n"
-            for article in articles:
-                title = article.get('title', 'No title')
-                desc = article.get('description', 'No description available')
-                source = article.get('source', {}).get('name', 'Unknown source')
-                url = article.get('url', '')
-
-                news_text += (
-                    f"📌 {title}\n"
-                    f"Source: {source}\n"
-                    f"{desc}\n"
-                    f"Read more: {url}\n\n"
-                )
-
-            # Split message if it's too long
-            if len(news_text) > 4096:
-                news_text = news_text[:4000] + "\n\n(Message truncated due to length)"
-
-            await query.edit_message_text(news_text, reply_markup=reply_markup)
-
-        except Exception as e:
+        if not articles:
             await query.edit_message_text(
-                "Sorry, an error occurred while fetching news. Please try again later."
+                f"No news found for category: {category}"
+            )
+            return
+
+        # Create category selection buttons
+        keyboard = []
+        for i in range(0, len(valid_categories), 3):
+            row = [
+                InlineKeyboardButton(
+                    cat.title(),
+                    callback_data=f"news_{cat}"
+                ) for cat in valid_categories[i:i+3]
+            ]
+            keyboard.append(row)
+        reply_markup = InlineKeyboardMarkup(keyboard)
+
+        news_text = f"📰 Latest {category.title()} News:\n\n"
+        for article in articles:
+            title = article.get('title', 'No title')
+            desc = article.get('description', 'No description available')
+            source = article.get('source', {}).get('name', 'Unknown source')
+            url = article.get('url', '')
+
+            news_text += (
+                f"📌 {title}\n"
+                f"Source: {source}\n"
+                f"{desc}\n"
+                f"Read more: {url}\n\n"
             )
 
-    # Birthday handlers
-    elif query.data == "view_birthdays":
-        await query.message.reply_text("🎂 Loading all birthdays...")
-    elif query.data.startswith("remove_birthday_"):
-        name = query.data.split("_")[2]
-        await query.message.reply_text(f"🎂 Removed birthday reminder for {name}")
-
-    # Email handlers
-    elif query.data == "refresh_emails":
-        await query.message.reply_text("📧 Checking for new emails...")
-    elif query.data == "mark_emails_read":
-        await query.message.reply_text("📧 Marked all emails as read")
-
-    # Password handlers
-    elif query.data == "list_passwords":
-        await query.message.reply_text("🔐 Loading saved passwords...")
-    elif query.data.startswith("delete_password_"):
-        service = query.data.split("_")[2]
-        await query.message.reply_text(f"🔐 Deleted password for {service}")
+        # Split message if it's too long
+        if len(news_text) > 4096:
+            news_text = news_text[:4000] + "\n\n(Message truncated due to length)"
 
-    # Calendar handlers
-    elif query.data == "view_events":
-        events = get_calendar_events(query.from_user.id)
-        if not events:
-            await query.message.reply_text("📅 No events found!")
-        else:
-            events_text = "📅 Your Events:\n\n"
-            for event in events:
-                events_text += f"📌 {event['date']}: {event['event']}\n"
-            await query.message.reply_text(events_text)
-    elif query.data == "add_event":
+        await query.edit_message_text(news_text, reply_markup=reply_markup)
+
+    except Exception as e:
+        await query.edit_message_text(
+            "Sorry, an error occurred while fetching news. Please try again later."
+        )
+
+# Birthday handlers
+@callback_router.exact("view_birthdays")
+async def view_birthdays_callback(query, context, arg, payload):
+    birthdays = get_birthdays(query.from_user.id)
+    if not birthdays:
+        await query.message.reply_text("🎂 No birthdays saved!")
+    else:
+        birthdays_text = "🎂 Your Birthdays:\n\n"
+        for i, birthday in enumerate(birthdays, 1):
+            birthdays_text += f"{i}. {birthday.name} - {birthday.date}\n   /delete_birthday_{i}\n"
+        await query.message.reply_text(birthdays_text)
+
+@callback_router.exact("remove_birthday")
+async def remove_birthday_callback(query, context, arg, name):
+    await query.message.reply_text(f"🎂 Removed birthday reminder for {name}")
+
+# Email handlers
+@callback_router.exact("refresh_emails")
+async def refresh_emails_callback(query, context, arg, payload):
+    await query.message.reply_text("📧 Checking for new emails...")
+
+@callback_router.exact("mark_emails_read")
+async def mark_emails_read_callback(query, context, arg, payload):
+    await query.message.reply_text("📧 Marked all emails as read")
+
+# Password handlers
+@callback_router.exact("list_passwords")
+async def list_passwords_callback(query, context, arg, payload):
+    services = list_passwords(query.from_user.id)
+    if not services:
+        await query.message.reply_text("🔐 No passwords stored yet!")
+    else:
         await query.message.reply_text(
-            "📅 To add an event, use:\n"
-            "/calendar add <date> <event>\n"
-            "Example: /calendar add 2025-03-20 Team meeting"
+            format_password_services(services, f"🔐 Your stored passwords ({len(services)}):", query.from_user.id)
         )
 
-    # Notification handlers
-    elif query.data == "view_notifications":
-        notifications = get_custom_notifications(query.from_user.id)
-        if not notifications:
-            await query.message.reply_text("🔔 No custom notifications found!")
-        else:
-            notif_text = "🔔 Your Notifications:\n\n"
-            for notif in notifications:
-                notif_text += f"📌 Trigger: {notif['trigger']}\n   Message: {notif['message']}\n\n"
-            await query.message.reply_text(notif_text)
-    elif query.data.startswith("delete_notification_"):
-        notif_id = query.data.split("_")[2]
-        await query.message.reply_text(f"🔔 Deleted notification {notif_id}")
\ No newline at end of file
+@callback_router.exact("delete_password")
+async def delete_password_callback(query, context, arg, service):
+    if delete_password(query.from_user.id, service):
+        await query.message.reply_text(f"🔐 Deleted password for {service}")
+    else:
+        await query.message.reply_text(f"🔐 No password stored for {service}")
+
+# Calendar handlers
+@callback_router.exact("view_events")
+async def view_events_callback(query, context, arg, payload):
+    events_text, reply_markup = render_calendar(query.from_user.id)
+    await query.message.reply_text(events_text, reply_markup=reply_markup)
+
+@callback_router.exact("add_event")
+async def add_event_callback(query, context, arg, payload):
+    await query.message.reply_text(
+        "📅 To add an event, use:\n"
+        "/calendar add <date> <event>\n"
+        "Example: /calendar add 2025-03-20 Team meeting"
+    )
+
+# Notification handlers
+@callback_router.exact("view_notifications")
+async def view_notifications_callback(query, context, arg, payload):
+    notifications = get_custom_notifications(query.from_user.id)
+    if not notifications:
+        await query.message.reply_text("🔔 No custom notifications found!")
+    else:
+        notif_text = "🔔 Your Notifications:\n\n"
+        for notif in notifications:
+            notif_text += f"📌 Trigger: {notif['trigger']}\n   Message: {notif['message']}\n\n"
+        await query.message.reply_text(notif_text)
+
+@callback_router.prefix("delete_notification_")
+async def delete_notification_callback(query, context, notif_id, payload):
+    await query.message.reply_text(f"🔔 Deleted notification {notif_id}")
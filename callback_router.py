@@ -0,0 +1,126 @@
+import bisect
+import time
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+class RouteStats:
+    """Call count, error count and latency histogram for one route."""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.total_ms = 0.0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+
+    def observe(self, elapsed_ms, failed):
+        self.calls += 1
+        self.total_ms += elapsed_ms
+        if failed:
+            self.errors += 1
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def percentile(self, pct):
+        """Upper bound of the bucket containing the pct-th percentile."""
+        if not self.calls:
+            return 0.0
+        rank = self.calls * pct / 100
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else float('inf')
+        return float('inf')
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'avg_ms': self.total_ms / self.calls if self.calls else 0.0,
+            'p50_ms': self.percentile(50),
+            'p99_ms': self.percentile(99),
+            'histogram': dict(zip([*map(str, LATENCY_BUCKETS_MS), 'inf'], self.buckets)),
+        }
+
+class CallbackRouter:
+    """Dispatch callback data to handlers by exact key or longest prefix.
+
+    Handlers are called as `handler(query, context, arg, payload)` where
+    `arg` is the part of the callback data after a matched prefix ('' for
+    exact routes) and `payload` is the server-side payload, if any.
+    """
+
+    def __init__(self):
+        self._exact = {}
+        self._trie = {}
+        self._stats = {}
+        self.unmatched = 0
+
+    def exact(self, key):
+        """Decorator registering a handler for callback data equal to `key`."""
+        def decorator(handler):
+            self.add_route(key, handler)
+            return handler
+        return decorator
+
+    def prefix(self, prefix):
+        """Decorator registering a handler for callback data starting with `prefix`."""
+        def decorator(handler):
+            self.add_route(prefix, handler, prefix=True)
+            return handler
+        return decorator
+
+    def add_route(self, key, handler, prefix=False):
+        name = f"{key}*" if prefix else key
+        if name in self._stats:
+            raise ValueError(f"callback route already registered: {name}")
+        if prefix:
+            node = self._trie
+            for char in key:
+                node = node.setdefault(char, {})
+            node[None] = (name, handler)
+        else:
+            self._exact[key] = (name, handler)
+        self._stats[name] = RouteStats()
+
+    def match(self, data):
+        """Return (route_name, handler, arg) or None."""
+        route = self._exact.get(data)
+        if route:
+            return route[0], route[1], ''
+
+        best, best_len = None, 0
+        node = self._trie
+        for depth, char in enumerate(data, 1):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                best, best_len = node[None], depth
+        if best is None:
+            return None
+        return best[0], best[1], data[best_len:]
+
+    async def dispatch(self, query, context, data, payload=None):
+        """Run the matching handler; returns False if no route matched."""
+        matched = self.match(data)
+        if matched is None:
+            self.unmatched += 1
+            return False
+
+        name, handler, arg = matched
+        started = time.perf_counter()
+        failed = True
+        try:
+            await handler(query, context, arg, payload)
+            failed = False
+        finally:
+            self._stats[name].observe((time.perf_counter() - started) * 1000, failed)
+        return True
+
+    def stats(self):
+        """Per-route metrics, busiest routes first."""
+        routes = sorted(self._stats.items(), key=lambda item: item[1].calls, reverse=True)
+        return {name: stats.as_dict() for name, stats in routes}
+
+callback_router = CallbackRouter()
@@ -0,0 +1,105 @@
+import json
+import secrets
+import time
+from collections import OrderedDict
+
+# Telegram rejects callback_data longer than 64 bytes
+MAX_CALLBACK_DATA = 64
+TOKEN_SEPARATOR = '|'
+
+class CallbackPayloadStore:
+    """Bounded TTL/LRU map from short tokens to button payloads.
+
+    Buttons carry `<action>|<token>` instead of the payload itself, so user
+    text of any length (or containing underscores) survives the round trip.
+    The TTL slides: each get() extends it, which keeps the entries in
+    expiry order, so eviction only ever looks at the oldest.
+    """
+
+    def __init__(self, max_entries=50000, max_bytes=8 * 1024 * 1024, ttl=24 * 3600,
+                 clock=time.monotonic):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = OrderedDict()  # token -> (expires_at, size, payload)
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def put(self, payload):
+        """Store a JSON-serialisable payload and return its token.
+
+        Raises ValueError for a payload larger than the whole store.
+        """
+        size = len(json.dumps(payload, ensure_ascii=False).encode())
+        if size > self.max_bytes:
+            raise ValueError(f"callback payload of {size} bytes exceeds the store's {self.max_bytes}")
+        token = secrets.token_urlsafe(8)
+        while token in self._entries:
+            token = secrets.token_urlsafe(8)
+        self._entries[token] = (self.clock() + self.ttl, size, payload)
+        self.bytes_used += size
+        self._evict()
+        return token
+
+    def get(self, token):
+        """Return the payload for a token (extending its TTL), or None if unknown or expired."""
+        entry = self._entries.get(token)
+        if entry is None:
+            self.misses += 1
+            return None
+        if entry[0] < self.clock():
+            self._remove(token)
+            self.misses += 1
+            return None
+        self._entries[token] = (self.clock() + self.ttl, entry[1], entry[2])
+        self._entries.move_to_end(token)
+        self.hits += 1
+        return entry[2]
+
+    def callback_data(self, action, payload=None, token=None):
+        """Build `<action>|<token>`, storing the payload unless a token is given."""
+        if token is None:
+            token = self.put(payload)
+        data = f"{action}{TOKEN_SEPARATOR}{token}"
+        if len(data.encode()) > MAX_CALLBACK_DATA:
+            raise ValueError(f"callback action too long: {action}")
+        return data
+
+    def resolve(self, data):
+        """Split callback data into (action, payload, found).
+
+        Plain callback data without a token resolves to (data, None, True).
+        """
+        action, sep, token = data.partition(TOKEN_SEPARATOR)
+        if not sep:
+            return data, None, True
+        payload = self.get(token)
+        return action, payload, payload is not None
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes_used,
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+    def _remove(self, token):
+        _, size, _ = self._entries.pop(token)
+        self.bytes_used -= size
+
+    def _evict(self):
+        now = self.clock()
+        while self._entries and (
+            len(self._entries) > self.max_entries or self.bytes_used > self.max_bytes
+            or next(iter(self._entries.values()))[0] < now
+        ):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+callback_payloads = CallbackPayloadStore()
@@ -0,0 +1,50 @@
+import re
+from typing import NamedTuple
+from telegram import Update
+from telegram.ext import ContextTypes
+
+# /<action>_<collection>_<n>[@bot] [args...], e.g. /edit_task_2 Buy milk
+DYNAMIC_COMMAND_PATTERN = re.compile(
+    r'^/(?P<action>edit|delete)_(?P<collection>[a-z]+)_(?P<index>\d+)(?:@\w+)?(?:\s+(?P<args>.*))?$',
+    re.DOTALL
+)
+
+class DynamicCommand(NamedTuple):
+    collection: str
+    action: str
+    index: int  # zero-based position in the user's list
+    args: list
+
+_handlers = {}
+
+def dynamic_command(action, collection):
+    """Decorator registering `handler(update, context, command)` for /<action>_<collection>_<n>."""
+    def decorator(handler):
+        _handlers[(action, collection)] = handler
+        return handler
+    return decorator
+
+def parse_dynamic_command(match):
+    """Build a DynamicCommand from a DYNAMIC_COMMAND_PATTERN match."""
+    args = match.group('args')
+    return DynamicCommand(
+        collection=match.group('collection'),
+        action=match.group('action'),
+        index=int(match.group('index')) - 1,
+        args=args.split() if args else []
+    )
+
+async def handle_dynamic_commands(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Route /edit_* and /delete_* commands parsed once by the Regex filter."""
+    match = context.matches[0] if context.matches else DYNAMIC_COMMAND_PATTERN.match(update.message.text)
+    if not match:
+        return
+
+    command = parse_dynamic_command(match)
+    handler = _handlers.get((command.action, command.collection))
+    if handler is None:
+        await update.message.reply_text(
+            f"❌ /{command.action}_{command.collection} is not supported."
+        )
+        return
+    await handler(update, context, command)
@@ -0,0 +1,325 @@
+"""Per-user data export and bulk import as a ZIP of JSON Lines.
+
+An export holds one <collection>.jsonl member per collection with the
+user's entries (without user_id), and <collection>.archive.jsonl for
+what tiering and retention archived. Note bodies are inlined as
+`content` and goal progress histories as `history`. Members are written
+and read one line at a time, so only one entry is in memory on top of
+the collection files the bot already loads.
+
+An import is staged off the event loop: every entry is validated and
+written to a staging directory, each affected collection and archive is
+merged into a temp file, and only then are they all swapped in, on the
+event loop and only if none changed meanwhile. A bad file or a failure
+before the swap leaves the user's data as it was.
+"""
+import asyncio
+import gzip
+import io
+import json
+import os
+import shutil
+import tempfile
+import uuid
+import zipfile
+from dataclasses import MISSING, fields
+from datetime import date
+from typing import Union, get_args, get_origin
+from archive import archive_name, iter_archive
+from goal_store import goal_history
+from note_store import read_body, write_body, delete_body
+from records import RECORD_TYPES
+from storage import (
+    DATA_DIR, load_json, data_path, ensure_data_dir, file_lock, file_stamp, bump_version, now_epoch
+)
+
+EXPORT_COLLECTIONS = (
+    'tasks.json', 'reminders.json', 'notes.json', 'goals.json', 'expenses.json', 'calendar_events.json'
+)
+MAX_IMPORT_ENTRIES = 200000  # per member
+MAX_IMPORT_LINE = 1024 * 1024  # bytes per entry
+MAX_IMPORT_MEMBER = 256 * 1024 * 1024  # uncompressed bytes per member
+MAX_IMPORT_TOTAL = 512 * 1024 * 1024  # uncompressed bytes in all
+FORMAT_VERSION = 1
+
+# Fields an imported entry must have (user_id is always the importer's)
+_REQUIRED = {
+    filename: [f.name for f in fields(RECORD_TYPES[filename]) if f.default is MISSING and f.name != 'user_id']
+    for filename in EXPORT_COLLECTIONS
+}
+
+# Fields that must parse as ISO dates, and integer fields with a fixed range
+_ISO_DATES = {'goals.json': ('target_date',), 'calendar_events.json': ('date',)}
+_RANGES = {('tasks.json', 'priority'): (1, 3), ('goals.json', 'progress'): (0, 100)}
+_TYPE_NAMES = {int: "an integer", float: "a number", str: "text", bool: "true or false", list: "a list of text"}
+
+def _member(filename, archived=False):
+    name = filename.rsplit('.', 1)[0]
+    return f"{name}.archive.jsonl" if archived else f"{name}.jsonl"
+
+def _exported(filename, item):
+    """A stored dict as written to the export (no user_id; bodies and histories inlined)."""
+    item = {k: v for k, v in item.items() if k != 'user_id'}
+    if filename == 'notes.json':
+        item['content'] = read_body(item)
+        item.pop('size', None)
+    elif filename == 'goals.json':
+        series = goal_history.series(item['id'])
+        item['history'] = [[when, value] for when, value in zip(series.times, series.values)]
+    return item
+
+def _user_items(user_id, filename):
+    for item in load_json(filename):
+        if item['user_id'] == user_id:
+            yield item
+
+def write_export(user_id, fileobj):
+    """Write a user's data as a ZIP to a binary file object; returns {member: entries}."""
+    counts = {}
+    with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as zf:
+        for filename in EXPORT_COLLECTIONS:
+            for archived, items in (
+                (False, _user_items(user_id, filename)),
+                (True, iter_archive(user_id, filename)),
+            ):
+                member = _member(filename, archived)
+                count = 0
+                with zf.open(member, 'w') as raw, io.TextIOWrapper(raw, encoding='utf-8') as out:
+                    for item in items:
+                        out.write(json.dumps(_exported(filename, item)) + '\n')
+                        count += 1
+                counts[member] = count
+        zf.writestr('manifest.json', json.dumps({
+            'version': FORMAT_VERSION, 'exported_at': now_epoch(), 'entries': counts
+        }, indent=2))
+    return counts
+
+def _read_entries(zf, member):
+    """(entry number, parsed line) for each entry of a JSONL member."""
+    entry = 0
+    try:
+        with zf.open(member) as raw:
+            while True:
+                line = raw.readline(MAX_IMPORT_LINE + 1)
+                if not line:
+                    break
+                if len(line) > MAX_IMPORT_LINE:
+                    raise ValueError(f"{member} entry {entry + 1} is larger than {MAX_IMPORT_LINE // 1024} KB")
+                if not line.strip():
+                    continue
+                entry += 1
+                if entry > MAX_IMPORT_ENTRIES:
+                    raise ValueError(f"{member} has more than {MAX_IMPORT_ENTRIES} entries")
+                try:
+                    yield entry, json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    raise ValueError(f"{member} entry {entry} is not valid JSON")
+    except zipfile.BadZipFile:
+        raise ValueError(f"{member} is damaged")
+
+def _is_number(value):
+    return type(value) in (int, float)
+
+def _check_record(filename, record):
+    """Raise ValueError unless every field of a decoded record has its declared type and format."""
+    for f in fields(record):
+        value = getattr(record, f.name)
+        if f.name == 'extra' or value is None and f.default is None:
+            continue
+        kind = f.type
+        if get_origin(kind) is Union:
+            kind = next(arg for arg in get_args(kind) if arg is not type(None))
+        if kind is float:
+            valid = _is_number(value)
+        elif kind is list:
+            valid = type(value) is list and all(type(v) is str for v in value)
+        else:
+            valid = type(value) is kind
+        if not valid:
+            raise ValueError(f"{f.name} must be {_TYPE_NAMES[kind]}")
+        low_high = _RANGES.get((filename, f.name))
+        if low_high and not low_high[0] <= value <= low_high[1]:
+            raise ValueError(f"{f.name} must be from {low_high[0]} to {low_high[1]}")
+    for name in _ISO_DATES.get(filename, ()):
+        value = getattr(record, name)
+        try:
+            valid = date.fromisoformat(value).isoformat() == value  # 3.11 also takes YYYYMMDD
+        except ValueError:
+            valid = False
+        if not valid:
+            raise ValueError(f"{name} must be a YYYY-MM-DD date")
+
+def _imported(filename, item, user_id):
+    """Validate an exported entry and convert it to a stored dict for user_id.
+
+    Returns (stored dict, extra) where extra is a note's content or a
+    goal's history; raises ValueError for entries the bot couldn't use.
+    """
+    if not isinstance(item, dict):
+        raise ValueError("entry is not an object")
+    item = dict(item, user_id=user_id)
+    extra = item.pop('content', None) if filename == 'notes.json' else None
+    if filename == 'notes.json' and extra is not None and type(extra) is not str:
+        raise ValueError("content must be text")
+    if filename == 'goals.json':
+        extra = item.pop('history', None) or []
+        if type(extra) is not list or not all(
+            type(point) is list and len(point) == 2 and all(map(_is_number, point)) and 0 <= point[0] < 2 ** 32
+            for point in extra
+        ):
+            raise ValueError("goal history must be [time, percent] pairs")
+    cls = RECORD_TYPES[filename]
+    missing = [name for name in _REQUIRED[filename] if item.get(name) is None]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    try:
+        record = cls.from_storage(item)
+    except (TypeError, ValueError) as e:
+        raise ValueError(str(e))
+    _check_record(filename, record)
+    return record.to_storage(), extra
+
+def _store_extra(filename, stored, extra, staged):
+    """Give an imported note or goal a fresh id and write its body or history.
+
+    Bodies and histories go straight to their files under the new id,
+    where nothing refers to them until the import is swapped in; the ids
+    are recorded on `staged` so a failed import can remove them.
+    """
+    if filename == 'notes.json':
+        stored.pop('content', None)
+        stored['id'] = uuid.uuid4().hex
+        staged.note_ids.append(stored['id'])
+        stored['size'] = write_body(stored['id'], extra or '')
+    elif filename == 'goals.json':
+        stored['id'] = str(uuid.uuid4())
+        if extra:
+            staged.goal_ids.append(stored['id'])
+            goal_history.replace(stored['id'], extra)
+    return stored
+
+def _write_array(path, items):
+    """Write stored dicts as a JSON array laid out like save_json, one at a time."""
+    with open(path, 'w') as f:
+        f.write('[')
+        separator = '\n'
+        for item in items:
+            f.write(separator + '  ' + json.dumps(item, indent=2).replace('\n', '\n  '))
+            separator = ',\n'
+        f.write(']' if separator == '\n' else '\n]')
+
+class StagedImport:
+    """An import's validated entries in a staging directory, ready to be merged and swapped in."""
+
+    def __init__(self, user_id):
+        self.user_id = user_id
+        ensure_data_dir()
+        # Inside the data directory, so the final os.replace never crosses filesystems
+        self.dir = tempfile.mkdtemp(prefix='.import-', dir=DATA_DIR)
+        self.files = {}  # target (collection or archive name) -> staged JSONL path
+        self.counts = {}  # collection -> entries added
+        self.note_ids, self.goal_ids = [], []
+        self.committed = False
+
+    def _staged_path(self, target):
+        if target not in self.files:
+            self.files[target] = os.path.join(self.dir, f"{len(self.files)}.jsonl")
+        return self.files[target]
+
+    def stage(self, fileobj):
+        """Validate every entry of an export ZIP and write it to the staging directory."""
+        try:
+            zf = zipfile.ZipFile(fileobj)
+        except zipfile.BadZipFile:
+            raise ValueError("That file is not a ZIP export")
+        with zf:
+            present = {info.filename: info for info in zf.infolist()}
+            members = [
+                (filename, archived, _member(filename, archived))
+                for filename in EXPORT_COLLECTIONS for archived in (False, True)
+                if _member(filename, archived) in present
+            ]
+            if not members:
+                raise ValueError("No exported collections found in that file")
+            sizes = [present[member].file_size for _, _, member in members]
+            if max(sizes) > MAX_IMPORT_MEMBER or sum(sizes) > MAX_IMPORT_TOTAL:
+                raise ValueError("That file unpacks to more data than an import may hold")
+
+            for filename, archived, member in members:
+                target = archive_name(self.user_id, filename) if archived else filename
+                with open(self._staged_path(target), 'a') as out:
+                    for entry, item in _read_entries(zf, member):
+                        try:
+                            stored, extra = _imported(filename, item, self.user_id)
+                        except ValueError as e:
+                            raise ValueError(f"{member} entry {entry}: {e}")
+                        out.write(json.dumps(_store_extra(filename, stored, extra, self)) + '\n')
+                        self.counts[filename] = self.counts.get(filename, 0) + 1
+
+    def _staged_items(self, target):
+        with open(self.files[target]) as f:
+            for line in f:
+                yield json.loads(line)
+
+    def merge(self):
+        """Merge the staged entries with the current files into temp files.
+
+        Returns [(target, temp path, stamp of the file that was merged)].
+        """
+        merged = []
+        for number, (target, staged_path) in enumerate(self.files.items()):
+            if not os.path.getsize(staged_path):
+                continue
+            stamp = file_stamp(target)
+            tmp_path = os.path.join(self.dir, f"{number}.merged")
+            if target in EXPORT_COLLECTIONS:
+                _write_array(tmp_path, (item for source in (
+                    load_json(target), self._staged_items(target)
+                ) for item in source))
+            else:
+                if stamp is not None:
+                    shutil.copyfile(data_path(target), tmp_path)
+                with gzip.open(tmp_path, 'at', encoding='utf-8') as f:
+                    f.writelines(json.dumps(item) + '\n' for item in self._staged_items(target))
+                os.makedirs(os.path.dirname(data_path(target)), exist_ok=True)
+            merged.append((target, tmp_path, stamp))
+        return merged
+
+    def swap_in(self, merged):
+        """Replace every merged file; False (and nothing replaced) if any changed since merge()."""
+        if any(file_stamp(target) != stamp for target, _, stamp in merged):
+            return False
+        for target, tmp_path, _ in merged:
+            with file_lock(target):
+                os.replace(tmp_path, data_path(target))
+            bump_version(target, self.user_id)
+        self.committed = True
+        return True
+
+    def close(self):
+        """Remove the staging directory and, unless swapped in, the bodies and histories written for it."""
+        shutil.rmtree(self.dir, ignore_errors=True)
+        if not self.committed:
+            for note_id in self.note_ids:
+                delete_body(note_id)
+            for goal_id in self.goal_ids:
+                goal_history.discard(goal_id)
+
+async def import_user_data(user_id, fileobj):
+    """Add the entries of an export ZIP to a user's data; returns {collection: entries added}.
+
+    Validation, staging and merging run in a worker thread; the swap runs
+    on the event loop, where handlers do their load/modify/save without
+    yielding, and is redone if one of them changed a file in between.
+    A bad entry or an oversized file raises ValueError with nothing
+    imported. Imported notes and goals get new ids, so importing the same
+    file twice adds its entries twice.
+    """
+    staged = StagedImport(user_id)
+    try:
+        await asyncio.to_thread(staged.stage, fileobj)
+        while not staged.swap_in(await asyncio.to_thread(staged.merge)):
+            pass
+    finally:
+        staged.close()
+    return staged.counts
@@ -1,18 +1,31 @@
-from datetime import datetime, timedelta
+from datetime import datetime, date
 import uuid
 import json
 import os
-import requests
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import ContextTypes
-from storage import save_reminder
+from storage import now_epoch
 from extra_storage import (
-    save_auto_message, get_auto_messages, save_birthday, get_upcoming_birthdays,
-    save_timer, get_active_timers, save_calendar_event, get_calendar_events,
-    save_password, get_password, save_custom_notification, get_custom_notifications
+    save_auto_message, get_auto_messages, save_birthday, get_upcoming_birthdays, days_until_birthday,
+    save_timer, get_active_timers,
+    save_password, get_password, list_passwords, find_passwords,
+    save_custom_notification, get_custom_notifications,
+    delete_birthday
 )
-from encryption import password_encryption
-from utils import to_ist, from_ist
+from utils import format_password_services
+from calendar_store import (
+    save_calendar_event, get_events_between, update_calendar_event, delete_calendar_event, parse_span
+)
+from records import Timer, Birthday, CalendarEvent
+from dynamic_commands import dynamic_command, DynamicCommand
+from callback_store import callback_payloads
+from view_cache import view_cache, next_midnight
+from upstream import (
+    weather_api, news_api, translation_api, WEATHER_URL, NEWS_URL, TRANSLATE_URL,
+    SIMULATED_NEWS, offline_translate
+)
+from timezones import local_now, format_local, user_zone, SETTINGS_FILE
+from timeparse import parse_time, parse_leading, parse_duration
 
 async def weather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Get weather information for a location."""
@@ -23,11 +36,10 @@ async def weather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         API_KEY = os.environ.get('OPENWEATHERMAP_API_KEY')
-        BASE_URL = 'http://api.openweathermap.org/data/2.5/weather'
 
         # Make API request with metric units
-        response = requests.get(
-            BASE_URL,
+        response = await weather_api.get(
+            f"{WEATHER_URL}/weather",
             params={
                 'q': city,
                 'appid': API_KEY,
@@ -35,6 +47,12 @@ async def weather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             }
         )
 
+        if response is None:
+            await update.message.reply_text(
+                "Weather service is temporarily unavailable. Please try again in a few minutes."
+            )
+            return
+
         if response.status_code != 200:
             await update.message.reply_text(
                 "Sorry, couldn't fetch weather data. Please check the city name and try again."
@@ -43,8 +61,8 @@ async def weather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         data = response.json()
 
-        # Convert UTC to IST (UTC+5:30)
-        current_time = datetime.fromtimestamp(data['dt']) + timedelta(hours=5, minutes=30)
+        # Observation time in the user's timezone
+        current_time = format_local(data['dt'], update.effective_user.id, '%I:%M %p')
 
         weather_data = {
             'temp': round(data['main']['temp']),
@@ -54,26 +72,27 @@ async def weather_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             'humidity': data['main']['humidity'],
             'wind': round(data['wind']['speed'] * 3.6),  # Convert m/s to km/h
             'pressure': data['main']['pressure'],
-            'time': current_time.strftime('%I:%M %p')  # 12-hour format
+            'time': current_time  # 12-hour format
         }
 
         # Create inline keyboard for hourly/daily forecast
+        city_token = callback_payloads.put(city)
         keyboard = [
             [
                 InlineKeyboardButton(
                     "Hourly Forecast",
-                    callback_data=f"weather_hourly_{city}"
+                    callback_data=callback_payloads.callback_data("weather_hourly", token=city_token)
                 ),
                 InlineKeyboardButton(
                     "Daily Forecast",
-                    callback_data=f"weather_daily_{city}"
+                    callback_data=callback_payloads.callback_data("weather_daily", token=city_token)
                 )
             ]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
         await update.message.reply_text(
-            f"🌤 Weather in {city} at {weather_data['time']} (IST):\n"
+            f"🌤 Weather in {city} at {weather_data['time']}:\n"
             f"Temperature: {weather_data['temp']}°C\n"
             f"Feels like: {weather_data['feels_like']}°C\n"
             f"Condition: {weather_data['description']}\n"
@@ -101,38 +120,24 @@ async def auto_message_command(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             return
 
-        # Parse the time in IST
+        # A wall-clock time in the user's timezone; the scheduler sends it
+        # daily when the user's local time reaches it
         message_time = datetime.strptime(time, "%H:%M").time()
-        today = to_ist(datetime.now()).date()
-        message_datetime = datetime.combine(today, message_time)
-
-        # If time has passed today, schedule for tomorrow
-        if message_datetime <= to_ist(datetime.now()):
-            message_datetime = datetime.combine(today + timedelta(days=1), message_time)
-
-        # Save auto message configuration (time stored in IST)
         save_auto_message({
             'id': str(uuid.uuid4()),
-            'time': message_datetime.strftime("%H:%M"),
+            'time': message_time.strftime("%H:%M"),
             'message': message,
             'user_id': update.effective_user.id,
             'active': True
         })
 
-        # Also create a reminder for the first occurrence (convert to UTC for storage)
-        save_reminder({
-            'time': from_ist(message_datetime).isoformat(),
-            'message': f"🔄 Auto Message: {message}",
-            'user_id': update.effective_user.id
-        })
-
         keyboard = [[
             InlineKeyboardButton("Cancel Auto Message", callback_data="cancel_auto_message")
         ]]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
         await update.message.reply_text(
-            f"⏰ Auto message set for {time} IST\n"
+            f"⏰ Auto message set for {message_time.strftime('%H:%M')} {local_now(update.effective_user.id).tzname()}\n"
             f"Message: {message}\n"
             "It will be sent daily at this time.",
             reply_markup=reply_markup
@@ -151,29 +156,25 @@ async def auto_message_command(update: Update, context: ContextTypes.DEFAULT_TYP
 async def timer_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set a timer."""
     try:
-        minutes = int(context.args[0])
+        if not context.args:
+            raise IndexError
+        seconds = parse_duration(' '.join(context.args))
+        if seconds is None:
+            raise ValueError
+        minutes = seconds // 60
         if minutes <= 0:
             await update.message.reply_text("Please provide a positive number of minutes!")
             return
 
-        # Create timer end time in IST
-        timer_end = to_ist(datetime.now() + timedelta(minutes=minutes))
-
-        # Save timer data (convert back to UTC for storage)
+        # Stored as UTC epoch seconds; the scheduler notifies when it ends
+        timer_end = now_epoch() + seconds
         timer_id = str(uuid.uuid4())
-        save_timer({
-            'id': timer_id,
-            'end_time': from_ist(timer_end).isoformat(),
-            'duration': minutes,
-            'user_id': update.effective_user.id
-        })
-
-        # Create a reminder for when timer ends
-        save_reminder({
-            'time': from_ist(timer_end).isoformat(),
-            'message': "⏰ Timer finished!",
-            'user_id': update.effective_user.id
-        })
+        save_timer(Timer(
+            id=timer_id,
+            user_id=update.effective_user.id,
+            end_time=timer_end,
+            duration=minutes
+        ))
 
         # Create cancel button
         keyboard = [[
@@ -183,12 +184,15 @@ async def timer_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         await update.message.reply_text(
             f"⏲ Timer set for {minutes} minutes!\n"
-            f"Will notify you at: {timer_end.strftime('%I:%M %p')} IST",
+            f"Will notify you at: {format_local(timer_end, update.effective_user.id, '%I:%M %p')}",
             reply_markup=reply_markup
         )
 
     except (IndexError, ValueError):
-        await update.message.reply_text("Usage: /timer <minutes>")
+        await update.message.reply_text(
+            "Usage: /timer <duration>\n"
+            "Example: /timer 30, /timer 1h30m or /timer in 2 hours"
+        )
 
 async def translate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Translate text to a specified language."""
@@ -205,44 +209,46 @@ async def translate_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             return
 
         # Use MyMemory Translation API
-        MYMEMORY_URL = "https://api.mymemory.translated.net/get"
-        response = requests.get(
-            MYMEMORY_URL,
+        response = await translation_api.get(
+            TRANSLATE_URL,
             params={
                 'q': text,
                 'langpair': f'en|{target_lang}'
             }
         )
 
-        if response.status_code == 200:
+        if response is not None and response.status_code == 200:
             result = response.json()
             translated_text = result['responseData']['translatedText']
+            offline_note = ""
+        else:
+            # Fall back to the built-in phrase table
+            translated_text = offline_translate(text, target_lang)
+            offline_note = " (Offline Mode)"
 
-            # Create language selection buttons
-            keyboard = [
-                [InlineKeyboardButton(f"Translate to {lang.upper()}", callback_data=f"translate_{lang}_{text}")
-                 for lang in ['hi', 'es', 'fr', 'de']]  # Added Hindi (hi)
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        # Create language selection buttons
+        text_token = callback_payloads.put(text)
+        keyboard = [
+            [InlineKeyboardButton(f"Translate to {lang.upper()}",
+                                  callback_data=callback_payloads.callback_data(f"translate_{lang}", token=text_token))
+             for lang in ['hi', 'es', 'fr', 'de']]  # Added Hindi (hi)
+        ]
+        reply_markup = InlineKeyboardMarkup(keyboard)
 
-            # Add language names for clarity
-            lang_names = {
-                'hi': 'Hindi',
-                'es': 'Spanish',
-                'fr': 'French',
-                'de': 'German'
-            }
+        # Add language names for clarity
+        lang_names = {
+            'hi': 'Hindi',
+            'es': 'Spanish',
+            'fr': 'French',
+            'de': 'German'
+        }
 
-            await update.message.reply_text(
-                f"🌐 Translation:\n"
-                f"Original: {text}\n"
-                f"Translated to {lang_names.get(target_lang, target_lang.upper())}: {translated_text}",
-                reply_markup=reply_markup
-            )
-        else:
-            await update.message.reply_text(
-                "Sorry, translation service is currently unavailable. Please try again later."
-            )
+        await update.message.reply_text(
+            f"🌐 Translation{offline_note}:\n"
+            f"Original: {text}\n"
+            f"Translated to {lang_names.get(target_lang, target_lang.upper())}: {translated_text}",
+            reply_markup=reply_markup
+        )
 
     except IndexError:
         await update.message.reply_text(
@@ -269,11 +275,10 @@ async def news_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             category = "general"
 
         API_KEY = os.environ.get('NEWS_API_KEY')
-        BASE_URL = 'https://newsapi.org/v2/top-headlines'
 
         # Make API request with country parameter
-        response = requests.get(
-            BASE_URL,
+        response = await news_api.get(
+            NEWS_URL,
             params={
                 'apiKey': API_KEY,
                 'category': category,
@@ -283,20 +288,9 @@ async def news_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             }
         )
 
-        if response.status_code != 200:
+        if response is None or response.status_code != 200:
             # Fallback to simulated news if API fails
-            simulated_news = {
-                "general": [
-                    {"title": "Daily Update", "description": "Latest events and updates from around the world"},
-                    {"title": "Community News", "description": "Local developments and announcements"}
-                ],
-                "technology": [
-                    {"title": "Tech Innovation", "description": "Latest technological breakthroughs and updates"},
-                    {"title": "Digital Trends", "description": "Current trends in the digital world"}
-                ]
-            }
-
-            articles = simulated_news.get(category, simulated_news["general"])
+            articles = SIMULATED_NEWS.get(category, SIMULATED_NEWS["general"])
             news_text = f"📰 Latest {category.title()} News (Offline Mode):\n\n"
             for article in articles:
                 news_text += f"📌 {article['title']}\n{article['description']}\n\n"
@@ -352,46 +346,44 @@ async def birthday_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set a birthday reminder."""
     try:
         name = context.args[0]
-        date = context.args[1]
+        if len(context.args) < 2:
+            raise IndexError
 
-        # Validate date format
-        try:
-            birthday_date = datetime.strptime(date, "%m/%d")
-        except ValueError:
+        parsed = parse_time(' '.join(context.args[1:]), user_zone(update.effective_user.id))
+        if not parsed or not parsed.has_date:
             await update.message.reply_text(
                 "Invalid date format!\n"
-                "Please use MM/DD format (e.g., 12/25)"
+                "Please use MM/DD format (e.g., 12/25) or a date like dec 25"
             )
             return
+        date = parsed.when.strftime("%m/%d")
 
-        save_birthday({
-            'name': name,
-            'date': date,
-            'user_id': update.effective_user.id
-        })
+        save_birthday(Birthday(
+            user_id=update.effective_user.id,
+            name=name,
+            date=date,
+            created_at=now_epoch()
+        ))
 
         # Get upcoming birthdays
         upcoming = get_upcoming_birthdays(update.effective_user.id)
 
-        # Create response message with IST time
-        current_time = to_ist(datetime.now())
-        response = f"🎂 Birthday reminder set for {name} on {date} ({current_time.strftime('%I:%M %p')} IST)"
+        # Create response message in the user's local time
+        current_time = local_now(update.effective_user.id)
+        response = f"🎂 Birthday reminder set for {name} on {date} ({current_time.strftime('%I:%M %p %Z')})"
 
         if upcoming:
             response += "\n\n📅 Upcoming birthdays:\n"
             for bday in upcoming:
-                bday_date = datetime.strptime(bday['date'], "%m/%d")
-                bday_this_year = bday_date.replace(year=current_time.year)
-                if bday_this_year < current_time:
-                    bday_this_year = bday_date.replace(year=current_time.year + 1)
-                days_until = (bday_this_year - current_time.date()).days
+                days_until = days_until_birthday(bday, current_time.date())
 
-                response += f"🎈 {bday['name']} - {bday['date']} (in {days_until} days)\n"
+                response += f"🎈 {bday.name} - {bday.date} (in {days_until} days)\n"
 
         # Add buttons for managing birthdays
         keyboard = [
             [InlineKeyboardButton("View All Birthdays", callback_data="view_birthdays")],
-            [InlineKeyboardButton("Remove Birthday", callback_data=f"remove_birthday_{name}")]
+            [InlineKeyboardButton("Remove Birthday",
+                                  callback_data=callback_payloads.callback_data("remove_birthday", name))]
         ]
         reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -403,6 +395,14 @@ async def birthday_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Example: /birthday John 12/25"
         )
 
+@dynamic_command('delete', 'birthday')
+async def delete_birthday_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Delete a birthday reminder."""
+    if delete_birthday(update.effective_user.id, command.index):
+        await update.message.reply_text("✅ Birthday reminder deleted!")
+    else:
+        await update.message.reply_text("❌ Birthday not found!")
+
 async def email_check_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check unread emails."""
     # Simulated email data
@@ -443,12 +443,11 @@ async def password_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             service = context.args[1]
             password = ' '.join(context.args[2:])  # Allow spaces in passwords
 
-            # Save encrypted password with IST timestamp
-            save_password({
+            replaced = await save_password({
                 'service': service,
                 'password': password,  # encryption is handled in save_password
                 'user_id': update.effective_user.id,
-                'created_at': to_ist(datetime.now()).isoformat()
+                'created_at': now_epoch()
             })
 
             keyboard = [[
@@ -457,7 +456,8 @@ async def password_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             reply_markup = InlineKeyboardMarkup(keyboard)
 
             await update.message.reply_text(
-                f"🔐 Password securely encrypted and stored for {service}",
+                f"🔐 Replaced the existing password for {service}" if replaced
+                else f"🔐 Password securely encrypted and stored for {service}",
                 reply_markup=reply_markup
             )
 
@@ -466,7 +466,7 @@ async def password_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 raise IndexError
 
             service = context.args[1]
-            password_data = get_password(update.effective_user.id, service)
+            password_data = await get_password(update.effective_user.id, service)
 
             if password_data and password_data.get('password'):
                 # Send initial message
@@ -477,7 +477,8 @@ async def password_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
                 # Send password in separate message that will be deleted
                 keyboard = [[
-                    InlineKeyboardButton("Delete Password", callback_data=f"delete_password_{service}")
+                    InlineKeyboardButton("Delete Password",
+                                         callback_data=callback_payloads.callback_data("delete_password", service))
                 ]]
                 reply_markup = InlineKeyboardMarkup(keyboard)
 
@@ -505,6 +506,28 @@ async def password_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
                     f"❌ No password found for {service} or error decrypting password."
                 )
 
+        elif action == "list":
+            services = list_passwords(update.effective_user.id)
+            if not services:
+                await update.message.reply_text("🔐 No passwords stored yet!")
+                return
+            await update.message.reply_text(
+                format_password_services(services, f"🔐 Your stored passwords ({len(services)}):", update.effective_user.id)
+            )
+
+        elif action == "find":
+            if len(context.args) < 2:
+                raise IndexError
+
+            prefix = ' '.join(context.args[1:])
+            services = find_passwords(update.effective_user.id, prefix)
+            if not services:
+                await update.message.reply_text(f"🔐 No stored services start with '{prefix}'")
+                return
+            await update.message.reply_text(
+                format_password_services(services, f"🔐 Services matching '{prefix}':", update.effective_user.id)
+            )
+
         else:
             raise IndexError
 
@@ -512,7 +535,9 @@ async def password_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text(
             "Usage:\n"
             "/password store <service> <password> - Store a password\n"
-            "/password get <service> - Retrieve a password\n\n"
+            "/password get <service> - Retrieve a password\n"
+            "/password list - List stored services\n"
+            "/password find <prefix> - Search stored services\n\n"
             "Example:\n"
             "/password store gmail mySecurePass123\n"
             "/password get gmail"
@@ -523,21 +548,88 @@ async def password_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             "Please try again or contact support if the issue persists."
         )
 
+CALENDAR_SPAN_TITLES = {'today': "Today", 'tomorrow': "Tomorrow", 'week': "Next 7 Days", 'month': "Next 30 Days"}
+CALENDAR_LIMIT = 30  # events listed per reply; narrower spans show the rest
+
+def describe_days_until(days_until):
+    if days_until == 0:
+        return "Today!"
+    if days_until == 1:
+        return "Tomorrow"
+    if days_until < 0:
+        return f"{-days_until} day{'s' if days_until != -1 else ''} ago"
+    return f"In {days_until} days"
+
+def render_calendar(user_id, span='list'):
+    """Render the events in a span (upcoming ones by default) as (text, reply_markup).
+
+    span is anything parse_span accepts, or 'list'; the view is cached by
+    the dates it covers, so "/calendar today" and today's date share an
+    entry, and expires at local midnight since "today" and "In N days"
+    move with it.
+    """
+    today = local_now(user_id).date()
+    if span == 'list':
+        first, last = today.isoformat(), None
+    else:
+        first, last = parse_span(span, today)
+
+    def render():
+        current_time = local_now(user_id)
+        if last is None:
+            title = "📅 Your Upcoming Events"
+        else:
+            dates = first if first == last else f"{first} to {last}"
+            label = next((
+                label for name, label in CALENDAR_SPAN_TITLES.items() if parse_span(name, today) == (first, last)
+            ), None)
+            title = f"📅 {label} ({dates})" if label else f"📅 Events {dates}"
+        events, total = get_events_between(user_id, first, last, CALENDAR_LIMIT)
+        if not total:
+            keyboard = [[
+                InlineKeyboardButton("Add Event", callback_data="add_event")
+            ]]
+            return ("No events found!", InlineKeyboardMarkup(keyboard)), next_midnight(current_time)
+
+        events_text = f"{title}:\n\n"
+        for position, event in events:
+            i = position + 1
+            days_until = (date.fromisoformat(event.date) - today).days
+            events_text += (
+                f"{i}. 📌 {event.date}: {event.event}\n"
+                f"   {describe_days_until(days_until)}\n"
+                f"   /edit_event_{i} | /delete_event_{i}\n"
+            )
+        if total > len(events):
+            events_text += (
+                f"\n…and {total - len(events)} more. "
+                "Narrow it down with /calendar week or /calendar YYYY-MM-DD..YYYY-MM-DD\n"
+            )
+
+        keyboard = [
+            [InlineKeyboardButton("Add Event", callback_data="add_event")],
+            [InlineKeyboardButton("Delete Event", callback_data="delete_event")]
+        ]
+        return (events_text, InlineKeyboardMarkup(keyboard)), next_midnight(current_time)
+    return view_cache.get_or_render(user_id, 'calendar', (first, last), ('calendar_events.json', SETTINGS_FILE), render)
+
 async def calendar_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Manage calendar events."""
     try:
         action = context.args[0].lower()
         if action == "add":
-            date = context.args[1]
-            event = ' '.join(context.args[2:])
+            parsed, words = parse_leading(context.args[1:], user_zone(update.effective_user.id))
+            if not parsed or not parsed.has_date or not words:
+                raise IndexError
+            date = parsed.when.strftime("%Y-%m-%d")
+            event = ' '.join(words)
 
-            # Add event with IST timestamp
-            save_calendar_event({
-                'date': date,
-                'event': event,
-                'user_id': update.effective_user.id,
-                'created_at': to_ist(datetime.now()).isoformat()
-            })
+            save_calendar_event(CalendarEvent(
+                user_id=update.effective_user.id,
+                date=date,
+                event=event,
+                created_at=now_epoch()
+            ))
 
             keyboard = [[
                 InlineKeyboardButton("View All Events", callback_data="view_events"),
@@ -545,56 +637,59 @@ async def calendar_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             ]]
             reply_markup = InlineKeyboardMarkup(keyboard)
 
-            current_time = to_ist(datetime.now())
+            current_time = local_now(update.effective_user.id)
             await update.message.reply_text(
-                f"📅 Event added at {current_time.strftime('%I:%M %p')} IST:\n"
+                f"📅 Event added at {current_time.strftime('%I:%M %p %Z')}:\n"
                 f"Date: {date}\n"
                 f"Event: {event}",
                 reply_markup=reply_markup
             )
 
-        elif action == "list":
-            events = get_calendar_events(update.effective_user.id)
-            if not events:
-                keyboard = [[
-                    InlineKeyboardButton("Add Event", callback_data="add_event")
-                ]]
-                reply_markup = InlineKeyboardMarkup(keyboard)
-                await update.message.reply_text(
-                    "No events found!",
-                    reply_markup=reply_markup
-                )
-                return
-
-            events_text = "📅 Your Upcoming Events:\n\n"
-            current_time = to_ist(datetime.now())
-            for i, event in enumerate(events, 1):
-                # Convert event date to datetime for comparison
-                event_date = datetime.strptime(event['date'], "%Y-%m-%d")
-                days_until = (event_date.date() - current_time.date()).days
-                events_text += (
-                    f"{i}. 📌 {event['date']}: {event['event']}\n"
-                    f"   {'Today!' if days_until == 0 else f'In {days_until} days'}\n"
-                )
-
-            keyboard = [
-                [InlineKeyboardButton("Add Event", callback_data="add_event")],
-                [InlineKeyboardButton("Delete Event", callback_data="delete_event")]
-            ]
-            reply_markup = InlineKeyboardMarkup(keyboard)
-
-            await update.message.reply_text(events_text, reply_markup=reply_markup)
         else:
-            raise IndexError
+            span = 'list' if action == "list" else ''.join(context.args)
+            if span != 'list':
+                try:
+                    parse_span(span, local_now(update.effective_user.id).date())
+                except ValueError:
+                    raise IndexError
+            events_text, reply_markup = render_calendar(update.effective_user.id, span)
+            await update.message.reply_text(events_text, reply_markup=reply_markup)
     except IndexError:
         await update.message.reply_text(
             "Usage:\n"
             "/calendar add <date> <event> - Add an event\n"
-            "/calendar list - List upcoming events\n\n"
-            "Date format: YYYY-MM-DD\n"
+            "/calendar list - List upcoming events\n"
+            "/calendar today | tomorrow | week | month - Events today, tomorrow, in the next 7 or 30 days\n"
+            "/calendar YYYY-MM-DD..YYYY-MM-DD - Events in a date range (or on one date)\n\n"
+            "Date: YYYY-MM-DD, MM/DD, dec 25, tomorrow, next fri, ...\n"
             "Example: /calendar add 2025-12-25 Christmas Celebration"
         )
 
+@dynamic_command('edit', 'event')
+async def edit_event_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Change a calendar event's date and/or description."""
+    parsed, words = parse_leading(command.args, user_zone(update.effective_user.id))
+    if not parsed or not parsed.has_date:
+        await update.message.reply_text(
+            "Usage: /edit_event_X <YYYY-MM-DD> [new description]\n"
+            "Example: /edit_event_1 2025-12-26 Boxing Day"
+        )
+        return
+
+    date = parsed.when.strftime("%Y-%m-%d")
+    if update_calendar_event(update.effective_user.id, command.index, date, ' '.join(words)):
+        await update.message.reply_text("✅ Event updated!")
+    else:
+        await update.message.reply_text("❌ Event not found!")
+
+@dynamic_command('delete', 'event')
+async def delete_event_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Delete a calendar event."""
+    if delete_calendar_event(update.effective_user.id, command.index):
+        await update.message.reply_text("✅ Event deleted!")
+    else:
+        await update.message.reply_text("❌ Event not found!")
+
 async def custom_notification_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set custom notifications."""
     try:
@@ -609,7 +704,7 @@ async def custom_notification_command(update: Update, context: ContextTypes.DEFA
             'trigger': trigger,
             'message': message,
             'user_id': update.effective_user.id,
-            'created_at': datetime.now().isoformat(),
+            'created_at': now_epoch(),
         })
 
         keyboard = [
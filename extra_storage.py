@@ -1,105 +1,111 @@
-from datetime import datetime
 import json
 import os
-from storage import DATA_DIR, ensure_data_dir, load_json, save_json
-from encryption import password_encryption
+from storage import (
+    DATA_DIR, ensure_data_dir, load_json, save_json, delete_user_item,
+    get_user_records, append_record, now_epoch
+)
+from timezones import local_now
+from timeparse import next_month_day
+from vault import get_vault
+from vault_index import vault_index
 
 def save_auto_message(message_data):
     """Save an auto message configuration."""
     messages = load_json('auto_messages.json')
     messages.append(message_data)
-    save_json(messages, 'auto_messages.json')
+    save_json(messages, 'auto_messages.json', message_data['user_id'])
 
 def get_auto_messages(user_id):
-    """Get auto messages for a specific user."""
+    """Get active auto messages for a user (or every user if user_id is None)."""
     messages = load_json('auto_messages.json')
-    return [msg for msg in messages if msg['user_id'] == user_id and msg['active']]
+    return [msg for msg in messages if user_id in (None, msg['user_id']) and msg['active']]
 
-def save_birthday(birthday_data):
-    """Save a birthday reminder."""
-    birthdays = load_json('birthdays.json')
-    birthdays.append(birthday_data)
-    save_json(birthdays, 'birthdays.json')
+def save_birthday(birthday):
+    """Save a Birthday reminder."""
+    append_record('birthdays.json', birthday)
 
 def get_birthdays(user_id):
-    """Get birthdays for a specific user."""
-    birthdays = load_json('birthdays.json')
-    return [b for b in birthdays if b['user_id'] == user_id]
+    """Get birthdays for a user (or every user if user_id is None)."""
+    return get_user_records('birthdays.json', user_id)
 
-def get_upcoming_birthdays(user_id):
-    """Get upcoming birthdays for a user."""
-    birthdays = get_birthdays(user_id)
-    today = datetime.now()
-    upcoming = []
-
-    for birthday in birthdays:
-        bday = datetime.strptime(birthday['date'], "%m/%d")
-        bday = bday.replace(year=today.year)
-        if bday < today:
-            bday = bday.replace(year=today.year + 1)
+def delete_birthday(user_id, birthday_index):
+    """Delete a birthday reminder."""
+    return delete_user_item('birthdays.json', user_id, birthday_index)
 
-        # Add to upcoming if within next 30 days
-        if (bday - today).days <= 30:
-            upcoming.append(birthday)
+def days_until_birthday(birthday, today):
+    """Days from today (a date) to the next occurrence of an MM/DD birthday (02/29 in leap years)."""
+    month, day = map(int, birthday.date.split('/'))
+    return (next_month_day(month, day, today) - today).days
 
-    return upcoming
+def get_upcoming_birthdays(user_id):
+    """Get birthdays in the next 30 days, by each owner's local date."""
+    return [
+        b for b in get_birthdays(user_id)
+        if days_until_birthday(b, local_now(b.user_id).date()) <= 30
+    ]
 
-def save_timer(timer_data):
-    """Save a timer."""
-    timers = load_json('timers.json')
-    timers.append(timer_data)
-    save_json(timers, 'timers.json')
+def save_timer(timer):
+    """Save a Timer."""
+    append_record('timers.json', timer)
 
 def get_active_timers(user_id):
-    """Get active timers for a user."""
-    timers = load_json('timers.json')
-    now = datetime.now()
-    return [
-        t for t in timers 
-        if t['user_id'] == user_id and 
-        datetime.fromisoformat(t['end_time']) > now
-    ]
+    """Get running timers for a user (or every user if user_id is None)."""
+    now = now_epoch()
+    return [t for t in get_user_records('timers.json', user_id) if t.end_time > now]
 
-def save_calendar_event(event_data):
-    """Save a calendar event."""
-    events = load_json('calendar_events.json')
-    events.append(event_data)
-    save_json(events, 'calendar_events.json')
-
-def get_calendar_events(user_id):
-    """Get calendar events for a user."""
-    events = load_json('calendar_events.json')
-    return [e for e in events if e['user_id'] == user_id]
-
-def save_password(password_data):
-    """Save an encrypted password."""
-    passwords = load_json('passwords.json')
-    # Encrypt the password before saving
-    encrypted_password = password_encryption.encrypt(password_data['password'])
+def cancel_timer(user_id, timer_id):
+    """Delete one of the user's timers; returns False if it already finished."""
+    timers = load_json('timers.json')
+    remaining = [t for t in timers if not (t['user_id'] == user_id and t['id'] == timer_id)]
+    if len(remaining) == len(timers):
+        return False
+    save_json(remaining, 'timers.json', user_id)
+    return True
+
+async def save_password(password_data):
+    """Save a password encrypted with the user's derived key.
+
+    A user has one password per service: storing it again replaces the old
+    one, and True is returned so the caller can say so.
+    """
+    # Encrypt before touching the store so key derivation never holds it
+    encrypted_password, key_id, kdf = await get_vault().encrypt_for(
+        password_data['user_id'], password_data['password']
+    )
     password_data['password'] = encrypted_password
-    passwords.append(password_data)
-    save_json(passwords, 'passwords.json')
+    password_data['key_id'] = key_id
+    password_data['kdf'] = kdf
+    return vault_index.put(password_data)
 
-def get_password(user_id, service):
+async def get_password(user_id, service):
     """Get a decrypted password for a service."""
-    passwords = load_json('passwords.json')
-    password = next(
-        (p for p in passwords if p['user_id'] == user_id and p['service'] == service),
-        None
-    )
+    password = vault_index.get(user_id, service)
     if password:
-        # Decrypt the password before returning
-        decrypted = password_encryption.decrypt(password['password'])
+        # Decrypt a copy so the indexed record keeps its ciphertext
+        decrypted = await get_vault().decrypt_for(
+            user_id, password['password'], password.get('key_id'), password.get('kdf')
+        )
         if decrypted:
-            password['password'] = decrypted
-            return password
+            return dict(password, password=decrypted)
     return None
 
+def list_passwords(user_id):
+    """List a user's stored services (metadata only, nothing is decrypted)."""
+    return vault_index.list_services(user_id)
+
+def find_passwords(user_id, prefix):
+    """Find a user's services by prefix (metadata only, nothing is decrypted)."""
+    return vault_index.find(user_id, prefix)
+
+def delete_password(user_id, service):
+    """Delete a stored password; returns False if there was none."""
+    return vault_index.remove(user_id, service)
+
 def save_custom_notification(notification_data):
     """Save a custom notification configuration."""
     notifications = load_json('custom_notifications.json')
     notifications.append(notification_data)
-    save_json(notifications, 'custom_notifications.json')
+    save_json(notifications, 'custom_notifications.json', notification_data['user_id'])
 
 def get_custom_notifications(user_id):
     """Get custom notifications for a user."""
@@ -2,14 +2,10 @@ import os
 import logging
 import asyncio
 import json
-import base64
 import requests
 import random
 import string
 from datetime import datetime, timedelta
-from cryptography.fernet import Fernet
-from cryptography.hazmat.primitives import hashes
-from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (Application, CommandHandler, ContextTypes,
                          MessageHandler, filters, CallbackQueryHandler)
@@ -56,38 +52,6 @@ def save_json(data, filename):
     with open(f'data/{filename}.json', 'w') as f:
         json.dump(data, f, indent=2)
 
-# Password Encryption
-class PasswordEncryption:
-    def __init__(self):
-        self.key = self._get_or_create_key()
-        self.fernet = Fernet(self.key)
-
-    def _get_or_create_key(self):
-        key = os.getenv('ENCRYPTION_KEY')
-        if not key:
-            salt = os.urandom(16)
-            kdf = PBKDF2HMAC(
-                algorithm=hashes.SHA256(),
-                length=32,
-                salt=salt,
-                iterations=100000,
-            )
-            key = base64.urlsafe_b64encode(kdf.derive(os.urandom(32)))
-        else:
-            key = key.encode()
-        return key
-
-    def encrypt(self, text):
-        return self.fernet.encrypt(text.encode()).decode()
-
-    def decrypt(self, encrypted_text):
-        try:
-            return self.fernet.decrypt(encrypted_text.encode()).decode()
-        except:
-            return None
-
-password_encryption = PasswordEncryption()
-
 # Command Handlers
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     welcome_message = (
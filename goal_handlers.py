@@ -2,15 +2,27 @@ from datetime import datetime
 import uuid
 from telegram import Update
 from telegram.ext import ContextTypes
-from storage import save_goal, get_goals, update_goal_progress
+from storage import now_epoch
+from goal_store import save_goal, get_goals, resolve_goal, update_goal_progress, delete_goal, goal_history
+from dynamic_commands import dynamic_command, DynamicCommand
+from view_cache import view_cache
+from records import Goal
+from timezones import user_zone, SETTINGS_FILE
+from timeparse import parse_leading
 
 async def add_goal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Add a new goal with target date and description."""
     try:
         # Format: /addgoal <title> <target_date> <description>
         title = context.args[0]
-        target_date = context.args[1]
-        description = ' '.join(context.args[2:])
+        if len(context.args) < 2:
+            raise IndexError
+        parsed, words = parse_leading(context.args[1:], user_zone(update.effective_user.id))
+        description = ' '.join(words)
+
+        if not parsed or not parsed.has_date:
+            await update.message.reply_text("Invalid date format! Use MM/DD/YYYY or a date like dec 31")
+            return
 
         if not description:
             await update.message.reply_text(
@@ -18,21 +30,16 @@ async def add_goal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             )
             return
 
-        try:
-            target_date = datetime.strptime(target_date, "%m/%d/%Y")
-        except ValueError:
-            await update.message.reply_text("Invalid date format! Use MM/DD/YYYY")
-            return
+        target_date = datetime.combine(parsed.when.date(), datetime.min.time())
 
-        goal = {
-            'id': str(uuid.uuid4()),
-            'title': title,
-            'description': description,
-            'target_date': target_date.isoformat(),
-            'created_at': datetime.now().isoformat(),
-            'progress': 0,
-            'user_id': update.effective_user.id
-        }
+        goal = Goal(
+            id=str(uuid.uuid4()),
+            user_id=update.effective_user.id,
+            title=title,
+            description=description,
+            target_date=target_date.isoformat(),
+            created_at=now_epoch()
+        )
 
         save_goal(goal)
         await update.message.reply_text(
@@ -49,37 +56,74 @@ async def add_goal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def view_goals_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """View all goals and their progress."""
-    goals = get_goals(update.effective_user.id)
-    if not goals:
-        await update.message.reply_text("No goals found!")
-        return
-
-    goals_text = "🎯 Your Goals:\n\n"
-    for goal in goals:
-        progress_bar = generate_progress_bar(goal['progress'])
-        target_date = datetime.fromisoformat(goal['target_date']).strftime('%Y-%m-%d')
-        goals_text += (
-            f"📌 {goal['title']}\n"
-            f"{goal['description']}\n"
-            f"Target: {target_date}\n"
-            f"Progress: {progress_bar} {goal['progress']}%\n"
-            f"ID: {goal['id']}\n\n"
-        )
+    await update.message.reply_text(render_goals(update.effective_user.id))
+
+def render_goals(user_id):
+    """Render the goals view (cached until the user's goals change)."""
+    def render():
+        goals = get_goals(user_id)
+        if not goals:
+            return "No goals found!", None
 
-    await update.message.reply_text(goals_text)
+        tz = user_zone(user_id)
+        goals_text = "🎯 Your Goals:\n\n"
+        for i, goal in enumerate(goals, 1):
+            progress_bar = generate_progress_bar(goal.progress)
+            target_date = datetime.fromisoformat(goal.target_date).date()
+            goals_text += (
+                f"📌 {goal.title}\n"
+                f"{goal.description}\n"
+                f"Target: {target_date:%Y-%m-%d}\n"
+                f"Progress: {progress_bar} {goal.progress}%\n"
+                f"{describe_trend(goal, target_date, tz)}"
+                f"#{i} · ID {goal.id[:8]} · /updategoal {i} <progress>\n"
+                f"/delete_goal_{i}\n\n"
+            )
+        return goals_text, None
+    return view_cache.get_or_render(user_id, 'goals', None, ('goals.json', SETTINGS_FILE), render)
+
+def describe_trend(goal, target_date, tz):
+    """Velocity and projected completion lines from the goal's progress history."""
+    if goal.progress >= 100:
+        return ""
+    series = goal_history.series(goal.id)
+    velocity = series.velocity()
+    if velocity is None:
+        return "Trend: update progress a few times to see a projection\n"
+    eta = series.projected_completion()
+    if eta is None:
+        return f"Velocity: {velocity:+.1f}%/day (not on course to finish)\n"
+    eta_date = datetime.fromtimestamp(eta, tz).date()
+    slack = (target_date - eta_date).days
+    if slack > 0:
+        outlook = f"{slack} day{'s' if slack != 1 else ''} early ✅"
+    elif slack == 0:
+        outlook = "right on target ✅"
+    else:
+        outlook = f"{-slack} day{'s' if slack != -1 else ''} late ⚠️"
+    return f"Velocity: {velocity:+.1f}%/day\nProjected: {eta_date:%Y-%m-%d} ({outlook})\n"
 
 async def update_goal_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Update goal progress."""
     try:
-        # Format: /updategoal <goal_id> <progress>
-        goal_id = context.args[0]
+        # Format: /updategoal <goal number or id prefix> <progress>
+        ref = context.args[0]
         progress = int(context.args[1])
 
         if not (0 <= progress <= 100):
             await update.message.reply_text("Progress must be between 0 and 100!")
             return
 
-        update_goal_progress(update.effective_user.id, goal_id, progress)
+        matches = resolve_goal(update.effective_user.id, ref)
+        if len(matches) > 1:
+            await update.message.reply_text(
+                f"❌ '{ref}' matches more than one goal ({', '.join(m[:8] for m in matches)}…). "
+                "Use a longer prefix or the goal's number from /goals."
+            )
+            return
+        if not matches or not update_goal_progress(update.effective_user.id, matches[0], progress, now_epoch()):
+            await update.message.reply_text("❌ Goal not found!")
+            return
         await update.message.reply_text(
             f"✅ Goal progress updated to {progress}%\n"
             f"{generate_progress_bar(progress)}"
@@ -87,11 +131,20 @@ async def update_goal_command(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     except (IndexError, ValueError):
         await update.message.reply_text(
-            "Usage: /updategoal <goal_id> <progress>\n"
-            "Example: /updategoal abc123 75"
+            "Usage: /updategoal <goal number or ID> <progress>\n"
+            "Example: /updategoal 2 75 or /updategoal 3f2a 75\n"
+            "(use id:123 for an ID that starts with digits)"
         )
 
+@dynamic_command('delete', 'goal')
+async def delete_goal_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Delete a goal."""
+    if delete_goal(update.effective_user.id, command.index):
+        await update.message.reply_text("✅ Goal deleted!")
+    else:
+        await update.message.reply_text("❌ Goal not found!")
+
 def generate_progress_bar(progress, length=10):
     """Generate a visual progress bar."""
     filled = int(progress / 100 * length)
-    return '█' * filled + '▒' * (length - filled)
\ No newline at end of file
+    return '█' * filled + '▒' * (length - filled)
@@ -0,0 +1,256 @@
+"""Goals storage and per-goal progress history.
+
+goals.json keeps each goal's current progress. Every progress update is
+also appended to the goal's history file, data/goal_history/<goal id>.bin,
+as one packed 5-byte point (uint32 epoch seconds, uint8 percent). Loaded
+series are held as two typed arrays, so even years of daily updates cost
+a few KB per goal, on disk and in memory.
+
+Goals are addressed by their number in /goals or a unique prefix of their
+id, resolved through GoalIndex rather than by scanning goals.json. An
+all-digit ref is always a number; `id:<prefix>` addresses such ids.
+"""
+import os
+import struct
+from array import array
+from bisect import bisect_left, insort
+from statistics import linear_regression, StatisticsError
+from storage import (
+    FileIndex, load_json, save_json, data_path, append_record, get_user_records,
+    find_user_item, delete_user_item, as_epoch
+)
+
+GOALS_FILE = 'goals.json'
+HISTORY_DIR = 'goal_history'
+VELOCITY_WINDOW = 30 * 86400  # trend is fitted over the last 30 days of updates
+MAX_CACHED_SERIES = 1024
+
+DAY = 86400
+_POINT = struct.Struct('<IB')
+
+class ProgressSeries:
+    """A goal's progress updates as parallel arrays of epoch seconds and percent."""
+    __slots__ = ('times', 'values')
+
+    def __init__(self, data=b''):
+        self.times = array('I')
+        self.values = array('B')
+        for when, value in _POINT.iter_unpack(data):
+            self.times.append(when)
+            self.values.append(value)
+
+    def __len__(self):
+        return len(self.times)
+
+    def append(self, when, value):
+        self.times.append(when)
+        self.values.append(value)
+
+    def velocity(self, window=VELOCITY_WINDOW):
+        """Percent per day from a least-squares fit of the recent updates, or None.
+
+        Uses the updates in the last `window` seconds, and at least the last two.
+        """
+        if len(self.times) < 2:
+            return None
+        start = min(bisect_left(self.times, self.times[-1] - window), len(self.times) - 2)
+        base = self.times[start]
+        days = [(when - base) / DAY for when in self.times[start:]]
+        try:
+            slope, _ = linear_regression(days, self.values[start:])
+        except StatisticsError:  # every update at the same moment
+            return None
+        return slope
+
+    def projected_completion(self, window=VELOCITY_WINDOW):
+        """Epoch seconds at which the goal reaches 100% at the current velocity, or None."""
+        velocity = self.velocity(window)
+        if not velocity or velocity <= 0:
+            return None
+        return int(self.times[-1] + (100 - self.values[-1]) / velocity * DAY)
+
+class GoalHistory:
+    """Append-only progress history files with a bounded cache of loaded series."""
+
+    def __init__(self):
+        self._series = {}  # goal id -> ProgressSeries, oldest loaded first
+
+    def _path(self, goal_id):
+        return data_path(os.path.join(HISTORY_DIR, f"{goal_id}.bin"))
+
+    def series(self, goal_id):
+        series = self._series.get(goal_id)
+        if series is None:
+            try:
+                with open(self._path(goal_id), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                data = b''
+            # Drop any partial point left by an interrupted append
+            series = ProgressSeries(data[:len(data) - len(data) % _POINT.size])
+            if len(self._series) >= MAX_CACHED_SERIES:
+                del self._series[next(iter(self._series))]
+            self._series[goal_id] = series
+        return series
+
+    def record(self, goal_id, when, progress, started_at=None):
+        """Append a progress update; a goal's first one also records its 0% start."""
+        series = self.series(goal_id)
+        points = []
+        if not series and started_at is not None and started_at < when:
+            points.append((started_at, 0))
+        points.append((when, progress))
+        path = self._path(goal_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'ab') as f:
+            f.write(b''.join(_POINT.pack(*point) for point in points))
+        for point in points:
+            series.append(*point)
+
+    def replace(self, goal_id, points):
+        """Write a whole history of (epoch, percent) points, e.g. for an imported goal."""
+        series = ProgressSeries()
+        for when, progress in sorted((int(when), int(progress)) for when, progress in points):
+            series.append(when, min(100, max(0, progress)))
+        path = self._path(goal_id)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(b''.join(_POINT.pack(*point) for point in zip(series.times, series.values)))
+        self._series.pop(goal_id, None)
+
+    def discard(self, goal_id):
+        self._series.pop(goal_id, None)
+        try:
+            os.remove(self._path(goal_id))
+        except FileNotFoundError:
+            pass
+
+goal_history = GoalHistory()
+
+class _Goals:
+    """Each goal's owner, and each user's goal ids in /goals (file) order."""
+    __slots__ = ('owners', 'users', 'sorted')
+
+    def __init__(self):
+        self.owners = {}  # goal id -> user_id
+        self.users = {}  # user_id -> [goal id, ...] in file order
+        self.sorted = {}  # user_id -> sorted goal ids, built on the first prefix lookup
+
+    def add(self, goal_id, user_id):
+        self.owners[goal_id] = user_id
+        self.users.setdefault(user_id, []).append(goal_id)
+        if user_id in self.sorted:
+            insort(self.sorted[user_id], goal_id)
+
+    def remove(self, goal_id):
+        user_id = self.owners.pop(goal_id)
+        self.users[user_id].remove(goal_id)
+        if user_id in self.sorted:
+            ids = self.sorted[user_id]
+            del ids[bisect_left(ids, goal_id)]
+
+class GoalIndex(FileIndex):
+    """Goal owners and each user's goal ids over goals.json.
+
+    Like the task and notes indexes, it follows the write functions below
+    (which refresh() first) and is rebuilt if goals.json changes any other
+    way, such as tiering moving an inactive user's goals out and back.
+    """
+
+    def __init__(self, filename=GOALS_FILE):
+        super().__init__(filename, self._build)
+
+    @staticmethod
+    def _build(goals):
+        state = _Goals()
+        for goal in goals:
+            state.add(goal['id'], goal['user_id'])
+        return state
+
+    def added(self, goal_id, user_id):
+        self.state.add(goal_id, user_id)
+        self.written()
+
+    def removed(self, goal_id):
+        self.state.remove(goal_id)
+        self.written()
+
+    def number(self, user_id, goal_id):
+        """The goal's 0-based number among the user's goals, or None if they don't own it."""
+        if self.state.owners.get(goal_id) != user_id:
+            return None
+        return self.state.users[user_id].index(goal_id)
+
+    def user_goal_ids(self, user_id):
+        return self.state.users.get(user_id, [])
+
+    def resolve(self, user_id, ref, limit=5):
+        """Goal ids matching a /goals number or an id prefix: [] if none, several if ambiguous.
+
+        An all-digit ref is a number; `id:<prefix>` always means an id prefix.
+        """
+        ids = self.user_goal_ids(user_id)
+        ref = ref.lower()
+        if ref.startswith('id:'):
+            ref = ref[3:]
+            if not ref:
+                return []
+        elif ref.isdigit():
+            return [ids[int(ref) - 1]] if 1 <= int(ref) <= len(ids) else []
+        if ref in self.state.owners:
+            return [ref] if self.state.owners[ref] == user_id else []
+        if user_id not in self.state.sorted:
+            self.state.sorted[user_id] = sorted(ids)
+        candidates = self.state.sorted[user_id]
+        matches = []
+        i = bisect_left(candidates, ref)
+        while i < len(candidates) and candidates[i].startswith(ref) and len(matches) < limit:
+            matches.append(candidates[i])
+            i += 1
+        return matches
+
+goals_index = GoalIndex()
+
+def save_goal(goal):
+    """Save a Goal to goals.json."""
+    goals_index.refresh()
+    append_record(GOALS_FILE, goal)
+    goals_index.added(goal.id, goal.user_id)
+
+def get_goals(user_id):
+    """Get goals for a specific user."""
+    return get_user_records(GOALS_FILE, user_id)
+
+def resolve_goal(user_id, ref):
+    """Full ids of the user's goals matching a number from /goals or an id prefix."""
+    goals_index.refresh()
+    return goals_index.resolve(user_id, ref)
+
+def update_goal_progress(user_id, goal_id, progress, now):
+    """Update goal progress and append it to the goal's history; False if there is no such goal."""
+    goals_index.refresh()
+    number = goals_index.number(user_id, goal_id)
+    if number is None:
+        return False
+    goals = load_json(GOALS_FILE)
+    position = find_user_item(goals, user_id, number)
+    goal = goals[position]
+    goal['progress'] = min(100, max(0, progress))
+    save_json(goals, GOALS_FILE, user_id)
+    goals_index.written()
+    created_at = goal.get('created_at')
+    goal_history.record(goal_id, now, goal['progress'], as_epoch(created_at) if created_at else None)
+    return True
+
+def delete_goal(user_id, goal_index):
+    """Delete a goal and its history."""
+    goals_index.refresh()
+    ids = goals_index.user_goal_ids(user_id)
+    if not 0 <= goal_index < len(ids):
+        return False
+    goal_id = ids[goal_index]
+    if not delete_user_item(GOALS_FILE, user_id, goal_index):
+        return False
+    goals_index.removed(goal_id)
+    goal_history.discard(goal_id)
+    return True
@@ -1,12 +1,41 @@
-from datetime import datetime
+import asyncio
+import tempfile
+from datetime import time
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 from storage import (
-    save_reminder, save_task, get_tasks, update_task_status,
-    save_expense, save_note, get_notes, get_active_reminders,
-    update_task, delete_task, update_reminder, delete_reminder
+    save_reminder,
+    save_expense, get_active_reminders_page,
+    update_reminder, delete_reminder,
+    delete_expense, now_epoch, to_epoch
 )
-from utils import parse_time, format_task_list, format_reminder_list
+from task_store import (
+    save_tasks, get_tasks_page, update_task, update_tasks_status, delete_tasks,
+    split_task_attributes, parse_task_filter
+)
+from note_store import save_note, get_notes_page, update_note, delete_note, search_notes
+from records import Reminder, Task, Expense, Note
+from utils import (
+    format_task_page, format_task_history_page, format_reminder_page, format_note_page, clip,
+    parse_numbers, format_numbers,
+    PAGE_SIZE, MAX_BATCH
+)
+from timeparse import parse_leading
+from dynamic_commands import dynamic_command, DynamicCommand
+from view_cache import view_cache, next_midnight
+from callback_store import callback_payloads
+from tiering import user_tiers, get_task_history
+from export import write_export, import_user_data
+from timezones import user_zone, user_timezone_name, set_user_timezone, local_now, SETTINGS_FILE
+
+# Time of day for reminders given only a date ("/remind fri Pay rent")
+DEFAULT_REMINDER_TIME = time(9, 0)
+
+async def track_activity(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Record the user's activity, restoring their archived data before any command runs."""
+    if update.effective_user:
+        user_tiers.touch(update.effective_user.id, now_epoch())
 
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Send a message when the command /start or /help is issued."""
@@ -16,14 +45,17 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "📋 Task Management:\n"
         "/addtask - Add a new task\n"
         "/todo - View your to-do list\n"
-        "/done - Mark a task as completed\n"
+        "/done - Mark tasks as completed\n"
+        "/delete_task - Delete tasks\n"
         "/remind - Set a reminder\n"
-        "/reminders - View active reminders\n\n"
+        "/reminders - View active reminders\n"
+        "/timezone - Set your timezone\n\n"
         "💰 Financial Management:\n"
         "/spend - Log an expense\n\n"
         "📝 Notes & Goals:\n"
         "/note - Add a note\n"
         "/viewnotes - View all notes\n"
+        "/searchnotes - Search your notes\n"
         "/addgoal - Add a new goal\n"
         "/goals - View all goals\n"
         "/updategoal - Update goal progress\n\n"
@@ -38,6 +70,9 @@ async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "/password - Manage passwords\n"
         "/calendar - Manage calendar events\n"
         "/notify - Set custom notifications\n\n"
+        "📦 Your Data:\n"
+        "/export - Download all your data\n"
+        "/import - Restore data from an export\n\n"
         "Type /help to see usage examples for each command!"
     )
 
@@ -65,32 +100,42 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     help_message = (
         "📚 Command Usage Guide:\n\n"
         "Task Management:\n"
-        "/addtask <task> - Example: /addtask Buy groceries\n"
-        "/todo - Shows your task list with edit/delete buttons\n"
-        "/done <number> - Example: /done 1\n"
-        "/remind <time> <message> - Example: /remind 14:30 Call mom\n"
-        "/reminders - Shows active reminders with edit/delete buttons\n\n"
+        "/addtask <task> - Example: /addtask Buy groceries #home due:fri !high (one task per line to add several)\n"
+        "/todo [filters] - Your task list; filter with #tag, open, done, !high, due:today|week|overdue|<date> or words\n"
+        "/todo history - Completed tasks archived after 30 days\n"
+        "/done <numbers> - Example: /done 1 3 5-8\n"
+        "/delete_task <numbers> - Example: /delete_task 2,4\n"
+        "/remind <time> <message> - Example: /remind tomorrow 9am Call mom, /remind in 20m Tea\n"
+        "/reminders - Shows active reminders with edit/delete buttons\n"
+        "/timezone [Region/City] - Example: /timezone Europe/London\n\n"
         "Financial Management:\n"
         "/spend <amount> <description> - Example: /spend 25.50 Lunch\n\n"
         "Notes & Goals:\n"
         "/note <title> <content> - Example: /note Meeting Notes Discuss project timeline\n"
         "/viewnotes - View all your saved notes\n"
+        "/searchnotes <words> - Example: /searchnotes project dead* (all words must match; * matches a prefix)\n"
         "/addgoal <title> <target_date> <description> - Example: /addgoal 'Learn Python' 12/31/2025 Master programming\n"
-        "/goals - View your goals and progress\n"
-        "/updategoal <goal_id> <progress> - Example: /updategoal abc123 75\n\n"
+        "/goals - View your goals, progress, velocity and projected finish\n"
+        "/updategoal <goal number or ID prefix> <progress> - Example: /updategoal 2 75\n"
+        "/edit_note_X, /delete_note_X, /delete_goal_X, /delete_expense_X - Manage saved items\n\n"
         "Smart Features:\n"
         "/weather <city> - Example: /weather London\n"
         "/automessage <time> <message> - Example: /automessage 09:00 Good morning!\n"
-        "/timer <minutes> - Example: /timer 30\n"
+        "/timer <duration> - Example: /timer 30, /timer 1h30m\n"
         "/translate <lang> <text> - Example: /translate es Hello world\n"
         "/news [category] - Example: /news technology\n"
         "/birthday <name> <MM/DD> - Example: /birthday John 12/25\n"
         "/email - Check your unread emails\n"
         "/password store <service> <password> - Example: /password store gmail mypass123\n"
         "/password get <service> - Example: /password get gmail\n"
+        "/password list | /password find <prefix> - List or search stored services\n"
         "/calendar add <date> <event> - Example: /calendar add 2025-03-20 Team meeting\n"
-        "/calendar list - View your calendar events\n"
+        "/calendar list - View your upcoming events\n"
+        "/calendar today|tomorrow|week|month or YYYY-MM-DD..YYYY-MM-DD - Events in a span\n"
         "/notify <trigger> <message> - Example: /notify daily Good morning!\n\n"
+        "Your Data:\n"
+        "/export - A ZIP of your tasks, reminders, notes, goals, expenses and events\n"
+        "/import - Send an /export file as a document with the caption /import to add its entries\n\n"
         "Need more help? Just type any command and I'll guide you!"
     )
     await update.message.reply_text(help_message)
@@ -98,68 +143,220 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def remind_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Set a reminder."""
     try:
-        time_str = context.args[0]
-        message = ' '.join(context.args[1:])
+        if not context.args:
+            raise IndexError
 
+        parsed, words = parse_leading(
+            context.args, user_zone(update.effective_user.id), default_time=DEFAULT_REMINDER_TIME
+        )
+        if not parsed:
+            await update.message.reply_text(
+                "Invalid time format!\n"
+                "Try 14:30, 9am, in 20m, tomorrow 9am, next fri 14:30 or 12/25/2025 10:00."
+            )
+            return
+
+        message = ' '.join(words)
         if not message:
             await update.message.reply_text("Please provide both time and message!")
             return
 
-        reminder_time = parse_time(time_str)
-        if not reminder_time:
-            await update.message.reply_text(
-                "Invalid time format!\n"
-                "Use HH:MM for today or MM/DD/YYYY HH:MM for a specific date."
-            )
+        reminder_time = parsed.when
+        if reminder_time <= local_now(update.effective_user.id):
+            await update.message.reply_text("That time has already passed!")
             return
 
-        save_reminder({
-            'time': reminder_time.isoformat(),
-            'message': message,
-            'user_id': update.effective_user.id
-        })
+        save_reminder(Reminder(
+            user_id=update.effective_user.id,
+            time=to_epoch(reminder_time),
+            message=message,
+            created_at=now_epoch()
+        ))
 
         await update.message.reply_text(
-            f"⏰ Reminder set for {reminder_time.strftime('%Y-%m-%d %H:%M')}"
+            f"⏰ Reminder set for {reminder_time.strftime('%Y-%m-%d %H:%M')} {reminder_time.tzname()}"
         )
 
     except (IndexError, ValueError):
         await update.message.reply_text(
             "Usage: /remind <time> <message>\n"
             "Example: /remind 14:30 Call mom\n"
+            "Or: /remind tomorrow 9am Call mom\n"
+            "Or: /remind in 20m Take a break\n"
             "Or: /remind 12/25/2025 10:00 Christmas party"
         )
 
+async def timezone_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show or set the timezone your times are entered and shown in."""
+    user_id = update.effective_user.id
+    if not context.args:
+        now = local_now(user_id)
+        await update.message.reply_text(
+            f"🌍 Your timezone: {user_timezone_name(user_id)} (local time {now.strftime('%Y-%m-%d %I:%M %p %Z')})\n"
+            "Change it with /timezone <Region/City>, e.g. /timezone Europe/London"
+        )
+        return
+
+    try:
+        zone = set_user_timezone(user_id, context.args[0])
+    except ValueError:
+        await update.message.reply_text(
+            f"❌ Unknown timezone: {context.args[0]}\n"
+            "Use a name like Asia/Kolkata, Europe/London or America/New_York."
+        )
+        return
+    now = local_now(user_id)
+    await update.message.reply_text(
+        f"🌍 Timezone set to {zone.key} (local time {now.strftime('%Y-%m-%d %I:%M %p %Z')})"
+    )
+
+def page_keyboard(route, start, total, page_size=PAGE_SIZE, rows=(), args=()):
+    """Prev/Next buttons for a paginated list, below any extra rows; route is the callback prefix.
+
+    Extra renderer args (such as a filter) travel server-side via callback_payloads.
+    """
+    def data(page_start):
+        if args:
+            return callback_payloads.callback_data(route, [page_start, *args])
+        return f"{route}{page_start}"
+
+    buttons = []
+    if start > 0:
+        buttons.append(InlineKeyboardButton("⬅️ Prev", callback_data=data(max(0, start - page_size))))
+    if start + page_size < total:
+        buttons.append(InlineKeyboardButton("Next ➡️", callback_data=data(start + page_size)))
+    keyboard = [*rows, buttons] if buttons else list(rows)
+    return InlineKeyboardMarkup(keyboard) if keyboard else None
+
+def render_reminder_page(user_id, start=0):
+    """Render one page of active reminders as (text, reply_markup, start)."""
+    def render():
+        reminders, first, total, next_due = get_active_reminders_page(user_id, start, PAGE_SIZE)
+        text = format_reminder_page(reminders, first, total, user_id)
+        # The list shrinks by itself once the next reminder is due
+        return (text, page_keyboard("reminders_page_", first, total), first), next_due
+    return view_cache.get_or_render(user_id, 'reminders', start, ('reminders.json', SETTINGS_FILE), render)
+
+def render_task_page(user_id, start=0, query=''):
+    """Render one page of tasks, optionally filtered by a /todo query, as (text, reply_markup, start)."""
+    def render():
+        if not query:
+            tasks, first, total = get_tasks_page(user_id, start, PAGE_SIZE)
+            text = format_task_page(tasks, first, total, user_id)
+            return (text, page_keyboard("tasks_page_", first, total), first), None
+        now = local_now(user_id)
+        task_filter = parse_task_filter(query, now.tzinfo, now)
+        tasks, first, total = get_tasks_page(user_id, start, PAGE_SIZE, task_filter)
+        text = format_task_page(tasks, first, total, user_id, f"📝 Tasks matching \"{clip(query, 50)}\"")
+        if task_filter.completed:
+            text = text.rstrip('\n') + "\n\nTasks completed over 30 days ago: /todo history"
+        # "due:today" and friends shift at local midnight
+        return (text, page_keyboard("tasks_page_", first, total, args=(query,)), first), next_midnight(now)
+    return view_cache.get_or_render(user_id, 'tasks', (start, query), ('tasks.json', SETTINGS_FILE), render)
+
+def render_task_history_page(user_id, start=0):
+    """Render one page of archived completed tasks as (text, reply_markup, start)."""
+    def render():
+        tasks, first, total = get_task_history(user_id, start, PAGE_SIZE)
+        text = format_task_history_page(tasks, first, total, user_id)
+        return (text, page_keyboard("history_page_", first, total), first), None
+    # Tiering rewrites tasks.json whenever it archives tasks, which invalidates this view
+    return view_cache.get_or_render(user_id, 'task_history', start, ('tasks.json', SETTINGS_FILE), render)
+
+def render_note_page(user_id, start=0):
+    """Render one page of note titles, each with a button that opens its body."""
+    def render():
+        notes, first, total = get_notes_page(user_id, start, PAGE_SIZE)
+        rows = [
+            [InlineKeyboardButton(f"{i}. {clip(note.title, 40)}", callback_data=f"view_note_{note.id}")]
+            for i, note in enumerate(notes, first + 1)
+        ]
+        text = format_note_page(notes, first, total, user_id)
+        return (text, page_keyboard("notes_page_", first, total, rows=rows), first), None
+    return view_cache.get_or_render(user_id, 'notes', start, ('notes.json', SETTINGS_FILE), render)
+
+LIST_RENDERERS = {
+    'tasks': render_task_page,
+    'task_history': render_task_history_page,
+    'reminders': render_reminder_page,
+    'notes': render_note_page,
+}
+
+def remember_list_message(context, kind, message, start, text, args=()):
+    """Remember the list message last shown in a chat so mutations can edit it."""
+    context.user_data.setdefault('list_messages', {})[(message.chat_id, kind)] = {
+        'message_id': message.message_id, 'start': start, 'text': text, 'args': tuple(args)
+    }
+
+async def show_list(update: Update, context: ContextTypes.DEFAULT_TYPE, kind, args=()):
+    """Send the first page of a list (args go to its renderer) and remember the message."""
+    text, reply_markup, start = LIST_RENDERERS[kind](update.effective_user.id, 0, *args)
+    message = await update.message.reply_text(text, reply_markup=reply_markup)
+    remember_list_message(context, kind, message, start, text, args)
+
+async def refresh_list(update: Update, context: ContextTypes.DEFAULT_TYPE, kind, confirmation):
+    """Show a mutation's result with one API call.
+
+    The remembered list message is edited in place with the confirmation on
+    top. If the list would look the same, only the confirmation is sent;
+    when there is no remembered message, or it can no longer be edited, the
+    list is sent afresh.
+    """
+    chat_id = update.message.chat_id
+    remembered = context.user_data.get('list_messages', {}).get((chat_id, kind))
+    text, reply_markup, start = LIST_RENDERERS[kind](
+        update.effective_user.id, *((remembered['start'], *remembered['args']) if remembered else (0,))
+    )
+    text = f"{confirmation}\n\n{text}"
+
+    if remembered:
+        if text == remembered['text']:
+            await update.message.reply_text(confirmation)
+            return
+        try:
+            await context.bot.edit_message_text(
+                text, chat_id=chat_id, message_id=remembered['message_id'], reply_markup=reply_markup
+            )
+            remembered.update(start=start, text=text)
+            return
+        except BadRequest as e:
+            if 'not modified' in str(e).lower():
+                remembered.update(start=start, text=text)
+                await update.message.reply_text(confirmation)
+                return
+            # Deleted or too old to edit; fall back to a fresh message
+
+    message = await update.message.reply_text(text, reply_markup=reply_markup)
+    remember_list_message(context, kind, message, start, text, remembered['args'] if remembered else ())
+
 async def view_reminders_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """View all active reminders."""
-    reminders = get_active_reminders(update.effective_user.id)
-    formatted_list = format_reminder_list(reminders)
-    await update.message.reply_text(formatted_list)
+    """View active reminders, one page at a time."""
+    await show_list(update, context, 'reminders')
 
-async def edit_reminder_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@dynamic_command('edit', 'reminder')
+async def edit_reminder_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
     """Edit a reminder."""
     try:
-        command_parts = update.message.text.split('_')
-        if len(command_parts) != 3:
-            raise ValueError("Invalid command format")
-
-        reminder_index = int(command_parts[2]) - 1
-        time_str = context.args[0]
-        message = ' '.join(context.args[1:])
+        reminder_index = command.index
+        if not command.args:
+            raise IndexError
 
-        reminder_time = parse_time(time_str)
-        if not reminder_time:
+        parsed, words = parse_leading(
+            command.args, user_zone(update.effective_user.id), default_time=DEFAULT_REMINDER_TIME
+        )
+        if not parsed:
             await update.message.reply_text("Invalid time format!")
             return
+        reminder_time = parsed.when
+        message = ' '.join(words)
 
         if update_reminder(
             update.effective_user.id,
             reminder_index,
-            reminder_time.isoformat(),
+            to_epoch(reminder_time),
             message
         ):
-            await update.message.reply_text("✅ Reminder updated!")
-            await view_reminders_command(update, context)
+            await refresh_list(update, context, 'reminders', "✅ Reminder updated!")
         else:
             await update.message.reply_text("❌ Reminder not found!")
 
@@ -169,100 +366,125 @@ async def edit_reminder_command(update: Update, context: ContextTypes.DEFAULT_TY
             "Example: /edit_reminder_1 14:30 Updated reminder message"
         )
 
-async def delete_reminder_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@dynamic_command('delete', 'reminder')
+async def delete_reminder_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
     """Delete a reminder."""
-    try:
-        command_parts = update.message.text.split('_')
-        if len(command_parts) != 3:
-            raise ValueError("Invalid command format")
-
-        reminder_index = int(command_parts[2]) - 1
-        if delete_reminder(update.effective_user.id, reminder_index):
-            await update.message.reply_text("✅ Reminder deleted!")
-            await view_reminders_command(update, context)
-        else:
-            await update.message.reply_text("❌ Reminder not found!")
-
-    except (IndexError, ValueError):
-        await update.message.reply_text("Invalid reminder number!")
+    if delete_reminder(update.effective_user.id, command.index):
+        await refresh_list(update, context, 'reminders', "✅ Reminder deleted!")
+    else:
+        await update.message.reply_text("❌ Reminder not found!")
 
 async def add_task_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Add a new task."""
-    try:
-        task = ' '.join(context.args)
-        if not task:
-            await update.message.reply_text("Please provide a task!")
-            return
-
-        save_task({
-            'task': task,
-            'created_at': datetime.now().isoformat(),
-            'completed': False,
-            'user_id': update.effective_user.id
-        })
+    """Add a new task, or one task per line of the message, in a single write."""
+    user_id = update.effective_user.id
+    body = update.message.text.split(None, 1)[1:]
+    lines = [line.strip() for line in body[0].splitlines() if line.strip()] if body else []
+    if not lines:
+        await update.message.reply_text("Please provide a task!")
+        return
+    if len(lines) > MAX_BATCH:
+        await update.message.reply_text(f"❌ That's more than {MAX_BATCH} tasks at once.")
+        return
 
-        await update.message.reply_text(f"✅ Task added: {task}")
+    tz, created_at, tasks = user_zone(user_id), now_epoch(), []
+    for number, line in enumerate(lines, 1):
+        try:
+            task, tags, due, priority = split_task_attributes(line, tz)
+        except ValueError as e:
+            # All or nothing, so fixing the line and resending adds no duplicates
+            prefix = f"Line {number}: " if len(lines) > 1 else ""
+            await update.message.reply_text(f"❌ {prefix}{e}")
+            return
+        if task:
+            tasks.append(Task(
+                user_id=user_id, task=task, created_at=created_at,
+                tags=tags or None, due=due, priority=priority
+            ))
+    if not tasks:
+        await update.message.reply_text("Please provide a task!")
+        return
 
-    except IndexError:
-        await update.message.reply_text("Usage: /addtask <task description>")
+    save_tasks(tasks)
+    if len(tasks) == 1:
+        await update.message.reply_text(f"✅ Task added: {tasks[0].task}")
+    else:
+        added = "\n".join(f"• {clip(task.task, 100)}" for task in tasks)
+        await update.message.reply_text(f"✅ Added {len(tasks)} tasks:\n{added}")
 
 async def todo_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Show todo list."""
-    tasks = get_tasks(update.effective_user.id)
-    formatted_list = format_task_list(tasks)
-    await update.message.reply_text(formatted_list)
+    """Show the todo list, one page at a time, optionally filtered (/todo #work open due:week)."""
+    query = ' '.join(context.args)
+    if query.lower() == 'history':
+        await show_list(update, context, 'task_history')
+        return
+    if query:
+        try:
+            parse_task_filter(query, user_zone(update.effective_user.id))
+        except ValueError as e:
+            await update.message.reply_text(f"❌ {e}")
+            return
+    await show_list(update, context, 'tasks', (query,) if query else ())
+
+async def report_task_batch(update: Update, context: ContextTypes.DEFAULT_TYPE, requested, applied, done):
+    """Confirm a batch task change with one list refresh, naming any numbers that didn't exist."""
+    if not applied:
+        await update.message.reply_text("❌ Task not found!" if len(requested) == 1 else "❌ None of those tasks exist!")
+        return
+    confirmation = f"✅ Task {done}!" if len(applied) == 1 else f"✅ {len(applied)} tasks {done}!"
+    missing = sorted(set(requested) - set(applied))
+    if missing:
+        confirmation += f"\n❌ Not found: {format_numbers(missing)}"
+    await refresh_list(update, context, 'tasks', confirmation)
 
 async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Mark a task as completed."""
+    """Mark one or more tasks as completed (/done 1 3 5-8) in a single write."""
     try:
-        task_number = int(context.args[0]) - 1
-        update_task_status(update.effective_user.id, task_number, True)
-        await update.message.reply_text("✅ Task marked as completed!")
-
-        # Show updated task list
-        await todo_command(update, context)
+        indexes = parse_numbers(context.args)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\nUsage: /done <task numbers>, e.g. /done 1 3 5-8")
+        return
+    done = update_tasks_status(update.effective_user.id, indexes, True)
+    await report_task_batch(update, context, indexes, done, "marked as completed")
 
-    except (IndexError, ValueError):
-        await update.message.reply_text("Usage: /done <task_number>")
+async def delete_tasks_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Delete one or more tasks (/delete_task 2,4) in a single write."""
+    try:
+        indexes = parse_numbers(context.args)
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}\nUsage: /delete_task <task numbers>, e.g. /delete_task 2,4")
+        return
+    deleted = delete_tasks(update.effective_user.id, indexes)
+    await report_task_batch(update, context, indexes, deleted, "deleted")
 
-async def edit_task_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+@dynamic_command('edit', 'task')
+async def edit_task_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
     """Edit a task."""
     try:
-        command_parts = update.message.text.split('_')
-        if len(command_parts) != 3:
-            raise ValueError("Invalid command format")
-
-        task_index = int(command_parts[2]) - 1
-        new_task = ' '.join(context.args)
-
-        if update_task(update.effective_user.id, task_index, new_task):
-            await update.message.reply_text("✅ Task updated!")
-            await todo_command(update, context)
-        else:
-            await update.message.reply_text("❌ Task not found!")
-
-    except (IndexError, ValueError):
+        new_task, tags, due, priority = split_task_attributes(
+            ' '.join(command.args), user_zone(update.effective_user.id)
+        )
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
+    if not (new_task or due or priority):
         await update.message.reply_text(
-            "Usage: /edit_task_X <new task description>\n"
-            "Example: /edit_task_1 Updated task description"
+            "Usage: /edit_task_X <new task description> [due:<date>] [!high|!medium|!low]\n"
+            "Example: /edit_task_1 Updated task description #work due:fri"
         )
+        return
 
-async def delete_task_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Delete a task."""
-    try:
-        command_parts = update.message.text.split('_')
-        if len(command_parts) != 3:
-            raise ValueError("Invalid command format")
-
-        task_index = int(command_parts[2]) - 1
-        if delete_task(update.effective_user.id, task_index):
-            await update.message.reply_text("✅ Task deleted!")
-            await todo_command(update, context)
-        else:
-            await update.message.reply_text("❌ Task not found!")
+    if update_task(update.effective_user.id, command.index, new_task, tags, due, priority):
+        await refresh_list(update, context, 'tasks', "✅ Task updated!")
+    else:
+        await update.message.reply_text("❌ Task not found!")
 
-    except (IndexError, ValueError):
-        await update.message.reply_text("Invalid task number!")
+@dynamic_command('delete', 'task')
+async def delete_task_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Delete a task."""
+    if delete_tasks(update.effective_user.id, [command.index]):
+        await refresh_list(update, context, 'tasks', "✅ Task deleted!")
+    else:
+        await update.message.reply_text("❌ Task not found!")
 
 async def spend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Log an expense."""
@@ -274,18 +496,26 @@ async def spend_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Please provide both amount and description!")
             return
 
-        save_expense({
-            'amount': amount,
-            'description': description,
-            'date': datetime.now().isoformat(),
-            'user_id': update.effective_user.id
-        })
+        save_expense(Expense(
+            user_id=update.effective_user.id,
+            amount=amount,
+            description=description,
+            date=now_epoch()
+        ))
 
         await update.message.reply_text(f"💰 Expense logged: ${amount:.2f} - {description}")
 
     except (IndexError, ValueError):
         await update.message.reply_text("Usage: /spend <amount> <description>")
 
+@dynamic_command('delete', 'expense')
+async def delete_expense_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Delete a logged expense."""
+    if delete_expense(update.effective_user.id, command.index):
+        await update.message.reply_text("✅ Expense deleted!")
+    else:
+        await update.message.reply_text("❌ Expense not found!")
+
 async def note_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Save a note."""
     try:
@@ -296,12 +526,12 @@ async def note_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
             await update.message.reply_text("Please provide both title and content!")
             return
 
-        save_note({
-            'title': title,
-            'content': content,
-            'created_at': datetime.now().isoformat(),
-            'user_id': update.effective_user.id
-        })
+        save_note(Note(
+            user_id=update.effective_user.id,
+            title=title,
+            content=content,
+            created_at=now_epoch()
+        ))
 
         await update.message.reply_text(f"📝 Note saved: {title}")
 
@@ -309,14 +539,92 @@ async def note_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await update.message.reply_text("Usage: /note <title> <content>")
 
 async def view_notes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """View all notes."""
-    notes = get_notes(update.effective_user.id)
-    if not notes:
-        await update.message.reply_text("No notes found!")
+    """List note titles, one page at a time; the buttons open a note."""
+    await show_list(update, context, 'notes')
+
+async def search_notes_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Find notes containing every query word, best matches first."""
+    query = ' '.join(context.args)
+    if not query:
+        await update.message.reply_text(
+            "Usage: /searchnotes <words>\n"
+            "Example: /searchnotes project dead*"
+        )
         return
 
-    notes_text = "📝 Your Notes:\n\n"
-    for note in notes:
-        notes_text += f"📌 {note['title']}\n{note['content']}\n\n"
+    results = search_notes(update.effective_user.id, query)
+    if not results:
+        await update.message.reply_text(f"🔍 No notes match \"{clip(query, 50)}\"")
+        return
+
+    text = f"🔍 Notes matching \"{clip(query, 50)}\":\n\n"
+    for position, title, _ in results:
+        text += f"📌 {clip(title, 100)}\n   /edit_note_{position + 1} | /delete_note_{position + 1}\n"
+    await update.message.reply_text(text)
+
+MAX_IMPORT_BYTES = 20 * 1024 * 1024  # the most a bot may download from Telegram
+
+async def export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Send the user's data as a ZIP of JSON Lines, built in a temp file rather than in memory."""
+    user_id = update.effective_user.id
+    with tempfile.TemporaryFile() as f:
+        counts = await asyncio.to_thread(write_export, user_id, f)
+        if not any(counts.values()):
+            await update.message.reply_text("📦 You have no data to export yet.")
+            return
+        f.seek(0)
+        await update.message.reply_document(
+            document=f, filename=f"export-{user_id}.zip",
+            caption=f"📦 Your data: {sum(counts.values())} entries. Send it back with the caption /import to restore it."
+        )
+
+async def import_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Explain how to import; the export file itself arrives as a captioned document."""
+    await update.message.reply_text(
+        "📥 To import, send a file made by /export as a document with the caption /import.\n"
+        "Its entries are added to your current data."
+    )
+
+async def import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Import an /export ZIP sent as a document captioned /import."""
+    document = update.message.document
+    if document.file_size and document.file_size > MAX_IMPORT_BYTES:
+        await update.message.reply_text("❌ That file is too large to import (20 MB at most).")
+        return
+    telegram_file = await document.get_file()
+    with tempfile.TemporaryFile() as f:
+        await telegram_file.download_to_memory(f)
+        f.seek(0)
+        try:
+            added = await import_user_data(update.effective_user.id, f)
+        except ValueError as e:
+            await update.message.reply_text(f"❌ Nothing was imported: {e}")
+            return
+    summary = "\n".join(
+        f"• {filename.rsplit('.', 1)[0].replace('_', ' ')}: {count}" for filename, count in added.items() if count
+    )
+    await update.message.reply_text(f"✅ Imported {sum(added.values())} entries:\n{summary}")
+
+@dynamic_command('edit', 'note')
+async def edit_note_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Replace a note's content."""
+    new_content = ' '.join(command.args)
+    if not new_content:
+        await update.message.reply_text(
+            "Usage: /edit_note_X <new content>\n"
+            "Example: /edit_note_1 Updated meeting notes"
+        )
+        return
 
-    await update.message.reply_text(notes_text)
\ No newline at end of file
+    if update_note(update.effective_user.id, command.index, new_content):
+        await refresh_list(update, context, 'notes', "✅ Note updated!")
+    else:
+        await update.message.reply_text("❌ Note not found!")
+
+@dynamic_command('delete', 'note')
+async def delete_note_command(update: Update, context: ContextTypes.DEFAULT_TYPE, command: DynamicCommand):
+    """Delete a note."""
+    if delete_note(update.effective_user.id, command.index):
+        await refresh_list(update, context, 'notes', "✅ Note deleted!")
+    else:
+        await update.message.reply_text("❌ Note not found!")
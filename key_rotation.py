@@ -0,0 +1,222 @@
+"""Background re-encryption of stored passwords under the active master key.
+
+Records are streamed out of passwords.json in bounded batches, rotated with
+MultiFernet (new per-user key first, old per-user or legacy master keys
+after) and staged to a JSONL file. Progress is checkpointed after every
+batch so an interrupted rotation resumes where it stopped. When the stream
+is exhausted the staged records are merged with the live file and swapped
+in atomically; records changed in the meantime are left for the next pass.
+
+The old keys stay in the keyring throughout, so get_password keeps working
+for every record whether or not it has been rotated yet.
+
+    python key_rotation.py --new-key          # add a key and rotate now
+
+Run the command-line tool with the bot stopped. A running bot re-reads the
+keyring and would run its own hourly pass against the same staging and
+checkpoint files. To rotate while the bot is up, set ENCRYPTION_KEY and
+restart it; the bot rotates on its own. --retire-old-keys keeps every key
+that a stored record still names.
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from itertools import islice
+from cryptography.fernet import InvalidToken, MultiFernet
+from storage import load_json, save_json, data_path, ensure_data_dir, iter_json_array, bump_version
+from vault import get_vault, USER_KDF
+
+logger = logging.getLogger(__name__)
+
+PASSWORDS_FILE = 'passwords.json'
+CHECKPOINT_FILE = 'vault_rotation.json'
+STAGED_FILE = 'passwords.rotating.jsonl'
+
+def _fingerprint(token):
+    return hashlib.blake2b(token.encode(), digest_size=8).hexdigest()
+
+class KeyRotation:
+    """Resumable, throttled rotation of passwords.json to the active key."""
+
+    def __init__(self, vault=None, batch_size=500, max_records_per_sec=2000):
+        self.vault = vault or get_vault()
+        self.batch_size = batch_size
+        self.max_records_per_sec = max_records_per_sec
+
+    def load_checkpoint(self):
+        checkpoint = load_json(CHECKPOINT_FILE)
+        return checkpoint if isinstance(checkpoint, dict) else {}
+
+    def needs_rotation(self):
+        """True unless the last completed pass targeted the current active key."""
+        self.vault.refresh()
+        checkpoint = self.load_checkpoint()
+        return not (checkpoint.get('target') == self.vault.active_key_id and checkpoint.get('complete'))
+
+    def keys_in_use(self):
+        """Ids of the master keys stored records need; a record without a key id may need any."""
+        used = set()
+        for record in iter_json_array(PASSWORDS_FILE):
+            if record.get('key_id') is None:
+                return set(self.vault.keys)
+            used.add(record['key_id'])
+        return used
+
+    def _is_current(self, record, target):
+        return record.get('kdf') == USER_KDF and record.get('key_id') == target
+
+    async def _rotate_batch(self, batch, target):
+        """Rotate one batch; KDF misses and the Fernet work both run off-loop."""
+        vault = self.vault
+        jobs = []
+        for record in batch:
+            if self._is_current(record, target):
+                jobs.append((record, None))
+                continue
+            user_id = record['user_id']
+            fernets = [await vault.user_fernet(user_id, target)]
+            if record.get('kdf') == USER_KDF and record.get('key_id') in vault.keys:
+                fernets.append(await vault.user_fernet(user_id, record['key_id']))
+            else:
+                # Legacy record encrypted directly with a master key
+                fernets.extend(vault.fernet(kid) for kid in vault.keys)
+            jobs.append((record, MultiFernet(fernets)))
+
+        def apply():
+            lines, rotated, failed = [], 0, 0
+            for record, multi in jobs:
+                old_token = record['password']
+                if multi is not None:
+                    try:
+                        new_token = multi.rotate(old_token.encode()).decode()
+                        record = dict(record, password=new_token, key_id=target, kdf=USER_KDF)
+                        rotated += 1
+                    except InvalidToken:
+                        failed += 1  # Unreadable with any known key; leave untouched
+                lines.append(json.dumps({'h': _fingerprint(old_token), 'r': record}) + '\n')
+            return lines, rotated, failed
+
+        return await asyncio.get_running_loop().run_in_executor(None, apply)
+
+    def _merge(self, target):
+        """Write live records with staged replacements to a temp file (worker thread).
+
+        Returns (temp_path, source_stat, stale) where stale counts records that
+        still need rotation because they changed after being staged.
+        """
+        source = data_path(PASSWORDS_FILE)
+        source_stat = os.stat(source)
+        tmp_path = f"{source}.rotated"
+        stale = 0
+        with open(tmp_path, 'w') as out, open(data_path(STAGED_FILE), 'r') as staged:
+            out.write('[')
+            for i, record in enumerate(iter_json_array(PASSWORDS_FILE)):
+                line = staged.readline()
+                entry = json.loads(line) if line else None
+                if (entry and entry['h'] == _fingerprint(record['password'])
+                        and entry['r']['user_id'] == record['user_id']):
+                    record = entry['r']
+                if not self._is_current(record, target):
+                    stale += 1
+                out.write((',\n  ' if i else '\n  ') + json.dumps(record))
+            out.write('\n]')
+        return tmp_path, source_stat, stale
+
+    async def run(self):
+        """Run (or resume) a rotation pass; returns the final checkpoint."""
+        self.vault.refresh()
+        target = self.vault.active_key_id
+        checkpoint = self.load_checkpoint()
+        if checkpoint.get('target') != target:
+            checkpoint = {
+                'target': target, 'processed': 0, 'rotated': 0, 'failed': 0,
+                'offset': 0, 'complete': False, 'started_at': datetime.now().isoformat()
+            }
+        if checkpoint['complete']:
+            return checkpoint
+
+        ensure_data_dir()
+        staged_path = data_path(STAGED_FILE)
+        with open(staged_path, 'a') as staged:
+            if staged.tell() < checkpoint['offset']:
+                # Staged output went missing; this pass has to start over
+                checkpoint.update(processed=0, offset=0)
+            # Drop anything staged after the last checkpoint
+            staged.truncate(checkpoint['offset'])
+
+        records = islice(iter_json_array(PASSWORDS_FILE), checkpoint['processed'], None)
+        loop = asyncio.get_running_loop()
+        while True:
+            started = time.monotonic()
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            lines, rotated, failed = await self._rotate_batch(batch, target)
+            with open(staged_path, 'a') as staged:
+                staged.writelines(lines)
+                checkpoint['offset'] = staged.tell()
+            checkpoint['processed'] += len(batch)
+            checkpoint['rotated'] += rotated
+            checkpoint['failed'] += failed
+            checkpoint['updated_at'] = datetime.now().isoformat()
+            save_json(checkpoint, CHECKPOINT_FILE)
+
+            # Throttle to max_records_per_sec
+            await asyncio.sleep(max(0.0, len(batch) / self.max_records_per_sec - (time.monotonic() - started)))
+
+        if not os.path.exists(data_path(PASSWORDS_FILE)):
+            checkpoint['complete'] = True
+            save_json(checkpoint, CHECKPOINT_FILE)
+            return checkpoint
+
+        while True:
+            tmp_path, source_stat, stale = await loop.run_in_executor(None, self._merge, target)
+            # The swap runs on the event loop, where handlers do their
+            # load/modify/save without yielding, so it can't split one.
+            current = os.stat(data_path(PASSWORDS_FILE))
+            if (current.st_mtime_ns, current.st_size) == (source_stat.st_mtime_ns, source_stat.st_size):
+                os.replace(tmp_path, data_path(PASSWORDS_FILE))
+                bump_version(PASSWORDS_FILE)
+                break
+            logger.info("passwords.json changed during merge; merging again")
+
+        os.remove(staged_path)
+        checkpoint['stale'] = stale - checkpoint['failed']
+        checkpoint['complete'] = checkpoint['stale'] <= 0
+        if not checkpoint['complete']:
+            # Start a fresh pass for records written or changed mid-rotation
+            checkpoint.update(processed=0, offset=0, failed=0)
+        checkpoint['updated_at'] = datetime.now().isoformat()
+        save_json(checkpoint, CHECKPOINT_FILE)
+        logger.info("Key rotation to %s: %s", target, checkpoint)
+        return checkpoint
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--new-key', action='store_true', help="Generate and activate a new master key first")
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--rate', type=int, default=2000, help="Max records re-encrypted per second")
+    parser.add_argument('--retire-old-keys', action='store_true',
+                        help="Remove inactive master keys after a clean, complete pass")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    vault = get_vault()
+    if args.new_key:
+        print(f"Activated new key {vault.add_key()}")
+    rotation = KeyRotation(vault, args.batch_size, args.rate)
+    result = asyncio.run(rotation.run())
+    if not result['complete']:
+        # Records changed mid-pass; one more pass picks them up
+        result = asyncio.run(rotation.run())
+    print(json.dumps(result, indent=2))
+    if args.retire_old_keys and result['complete'] and not result['failed']:
+        vault.refresh()
+        kept = rotation.keys_in_use() - {vault.active_key_id}
+        vault.retire_keys(kept | {vault.active_key_id})
+        print("Retired inactive keys" + (f"; kept {', '.join(sorted(kept))}, still in use" if kept else ""))
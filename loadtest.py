@@ -0,0 +1,185 @@
+"""Offline load generator for the external API handlers.
+
+Starts stub_upstream.py on a free port, points upstream.py at it and drives
+weather_command, news_command, translate_command and the matching callback
+buttons with synthetic updates:
+
+    python loadtest.py --requests 500 --concurrency 50 --latency 0.05 --error-rate 0.1
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from itertools import count
+
+from stub_upstream import StubUpstreamServer
+
+_ids = count(1)
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+
+class FakeMessage:
+    """Records replies instead of sending them to Telegram."""
+
+    def __init__(self, text='', chat_id=1):
+        self.text = text
+        self.chat_id = chat_id
+        self.message_id = next(_ids)
+        self.replies = []
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        self.replies.append(text)
+        return FakeMessage(text, self.chat_id)
+
+    async def edit_text(self, text, reply_markup=None, **kwargs):
+        self.text = text
+        return self
+
+    async def delete(self):
+        return True
+
+class FakeCallbackQuery:
+    def __init__(self, data, user):
+        self.data = data
+        self.from_user = user
+        self.message = FakeMessage()
+        self.edits = []
+
+    async def answer(self, *args, **kwargs):
+        return True
+
+    async def edit_message_text(self, text, reply_markup=None, **kwargs):
+        self.edits.append(text)
+        return self.message
+
+class FakeUpdate:
+    def __init__(self, user_id, text='', callback_data=None):
+        self.effective_user = FakeUser(user_id)
+        self.message = None if callback_data else FakeMessage(text, user_id)
+        self.effective_message = self.message
+        self.effective_chat = self.message
+        self.callback_query = FakeCallbackQuery(callback_data, self.effective_user) if callback_data else None
+
+class FakeContext:
+    def __init__(self, args=None):
+        self.args = args or []
+        self.user_data = {}
+        self.chat_data = {}
+        self.bot = None
+
+def command_update(user_id, command, args):
+    return FakeUpdate(user_id, ' '.join([f"/{command}"] + args)), FakeContext(args)
+
+def callback_update(user_id, data):
+    return FakeUpdate(user_id, callback_data=data), FakeContext()
+
+def build_scenarios():
+    """(name, coroutine factory) pairs covering every upstream-backed entry point."""
+    # Imported late so upstream.py picks up the stub server's URLs
+    from extra_handlers import weather_command, news_command, translate_command
+    from callback_handlers import handle_callback_query
+    from callback_store import callback_payloads
+
+    def run(handler, make_update):
+        async def scenario(user_id):
+            update, context = make_update(user_id)
+            await handler(update, context)
+        return scenario
+
+    return [
+        ('weather', run(weather_command, lambda u: command_update(u, 'weather', ['London']))),
+        ('news', run(news_command, lambda u: command_update(u, 'news', ['technology']))),
+        ('translate', run(translate_command, lambda u: command_update(u, 'translate', ['es', 'hello', 'world']))),
+        ('weather_hourly', run(handle_callback_query, lambda u: callback_update(
+            u, callback_payloads.callback_data('weather_hourly', 'London')))),
+        ('news_button', run(handle_callback_query, lambda u: callback_update(u, 'news_science'))),
+    ]
+
+def percentile(samples, pct):
+    if len(samples) < 2:
+        return samples[0] if samples else 0.0
+    return statistics.quantiles(samples, n=100, method='inclusive')[pct - 1]
+
+async def drive(scenario, total, concurrency):
+    """Run `total` invocations with at most `concurrency` in flight."""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await scenario(1000 + i % concurrency)
+            except Exception:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return latencies, errors, time.perf_counter() - started
+
+async def run_load_test(total=200, concurrency=20, latency=0.0, jitter=0.0, error_rate=0.0, only=None):
+    stub = StubUpstreamServer(latency=latency, jitter=jitter, error_rate=error_rate).start()
+    os.environ.update(stub.env())
+    try:
+        import upstream
+        results = []
+        for name, scenario in build_scenarios():
+            if only and name not in only:
+                continue
+            before = sum(stub.calls.values())
+            latencies, errors, elapsed = await drive(scenario, total, concurrency)
+            results.append({
+                'scenario': name,
+                'requests': total,
+                'errors': errors,
+                'throughput': total / elapsed,
+                'p50_ms': percentile(latencies, 50) * 1000,
+                'p99_ms': percentile(latencies, 99) * 1000,
+                'upstream_calls': sum(stub.calls.values()) - before,
+            })
+        breakers = {
+            api.name: (api.breaker.state, dict(api.stats))
+            for api in (upstream.weather_api, upstream.news_api, upstream.translation_api)
+        }
+        from callback_router import callback_router
+        return results, breakers, callback_router.stats()
+    finally:
+        stub.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=200, help="Requests per scenario")
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--only', nargs='*', help="Scenario names to run")
+    args = parser.parse_args()
+
+    # Injected errors would otherwise flood stderr with retry warnings
+    logging.getLogger('upstream').setLevel(logging.ERROR)
+    results, breakers, routes = asyncio.run(run_load_test(
+        args.requests, args.concurrency, args.latency, args.jitter, args.error_rate, args.only
+    ))
+
+    print(f"{'scenario':<16}{'req':>6}{'err':>5}{'req/s':>10}{'p50 ms':>10}{'p99 ms':>10}{'upstream':>10}")
+    for r in results:
+        print(f"{r['scenario']:<16}{r['requests']:>6}{r['errors']:>5}{r['throughput']:>10.1f}"
+              f"{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}{r['upstream_calls']:>10}")
+    print()
+    for name, (state, stats) in breakers.items():
+        print(f"{name}: breaker={state} {stats}")
+    for name, stats in routes.items():
+        if stats['calls']:
+            print(f"route {name}: calls={stats['calls']} errors={stats['errors']} "
+                  f"p50<={stats['p50_ms']}ms p99<={stats['p99_ms']}ms")
+
+if __name__ == '__main__':
+    main()
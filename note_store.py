@@ -0,0 +1,368 @@
+"""Notes storage and its full-text search index.
+
+notes.json holds only small metadata records (id, title, size, created_at);
+each body is a separate file under data/note_bodies/, gzipped when large.
+Listing notes never reads a body, and showing one reads exactly one file.
+Next to each body is its term weights file (<id>.terms.json), the note's
+share of the search postings, so the search index is rebuilt from those
+without reading bodies; it is built on the first search (or by the
+scheduler), never by listing. Notes from before the split, with their
+content inline, are moved out when the index loads them or the next
+time notes.json is rewritten.
+"""
+import gzip
+import json
+import math
+import os
+import re
+import threading
+import uuid
+from bisect import bisect_left
+from collections import Counter
+from storage import (
+    FileIndex, load_json, save_json, data_path, ensure_data_dir, append_record,
+    get_user_records, get_user_page, find_user_item
+)
+
+NOTES_FILE = 'notes.json'
+BODY_DIR = 'note_bodies'
+COMPRESS_OVER = 1024  # bytes; smaller bodies are stored as plain text
+TITLE_WEIGHT = 3  # a term in the title counts as much as three in the body
+
+_TOKEN = re.compile(r'\w+')
+
+def tokenize(text):
+    return _TOKEN.findall(text.casefold())
+
+def _terms(title, content):
+    terms = Counter(tokenize(content))
+    for term in tokenize(title):
+        terms[term] += TITLE_WEIGHT
+    return terms
+
+def _body_path(note_id, compressed):
+    return data_path(os.path.join(BODY_DIR, note_id[:2], f"{note_id}.txt{'.gz' if compressed else ''}"))
+
+def _terms_path(note_id):
+    return data_path(os.path.join(BODY_DIR, note_id[:2], f"{note_id}.terms.json"))
+
+def _write_file(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.{threading.get_ident()}"
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+def write_body(note_id, content):
+    """Store a note body (atomically); returns its size in bytes."""
+    encoded = content.encode('utf-8')
+    compressed = len(encoded) > COMPRESS_OVER
+    _write_file(_body_path(note_id, compressed), gzip.compress(encoded) if compressed else encoded)
+    _remove_body(note_id, not compressed)  # an edit may change which form is used
+    return len(encoded)
+
+def write_terms(note_id, terms):
+    """Store a note's term weights for rebuilding the search index."""
+    _write_file(_terms_path(note_id), json.dumps(terms).encode('utf-8'))
+
+def _read_terms(note):
+    """A stored note's term weights, from its terms file or (written then) its body."""
+    try:
+        with open(_terms_path(note['id']), 'rb') as f:
+            return Counter(json.loads(f.read()))
+    except (FileNotFoundError, ValueError):
+        terms = _terms(note['title'], read_body(note))
+        write_terms(note['id'], terms)
+        return terms
+
+def read_body(note):
+    """A note's body from its stored dict or Note record."""
+    if isinstance(note, dict):
+        note_id, content = note.get('id'), note.get('content')
+    else:
+        note_id, content = note.id, note.content
+    if content is not None:
+        return content  # not moved out yet
+    try:
+        with open(_body_path(note_id, True), 'rb') as f:
+            return gzip.decompress(f.read()).decode('utf-8')
+    except FileNotFoundError:
+        pass
+    try:
+        with open(_body_path(note_id, False), 'rb') as f:
+            return f.read().decode('utf-8')
+    except FileNotFoundError:
+        return ''
+
+def _remove_body(note_id, compressed):
+    try:
+        os.remove(_body_path(note_id, compressed))
+    except FileNotFoundError:
+        pass
+
+def delete_body(note_id):
+    _remove_body(note_id, True)
+    _remove_body(note_id, False)
+    try:
+        os.remove(_terms_path(note_id))
+    except FileNotFoundError:
+        pass
+
+def _move_out_bodies(notes):
+    """Move inline contents of legacy notes to body files; returns True if any moved."""
+    moved = False
+    for note in notes:
+        if 'content' in note:
+            note.setdefault('id', uuid.uuid4().hex)
+            note['size'] = write_body(note['id'], note.pop('content'))
+            moved = True
+    return moved
+
+class _UserPostings:
+    """One user's notes as term weights.
+
+    Notes get increasing internal ids as they are added, so `ids` (in
+    notes.json order) stays sorted and a note's position, as numbered by
+    /viewnotes, is a bisect away; deletes never renumber the postings.
+    """
+    __slots__ = ('ids', 'docs', 'postings', 'next_id', 'removals', '_sorted_terms')
+
+    def __init__(self):
+        self.ids = []
+        self.docs = {}  # id -> (title, Counter(term -> weight))
+        self.postings = {}  # term -> {id: weight}
+        self.next_id = 0
+        self.removals = 0  # since the postings were last built from scratch
+        self._sorted_terms = None
+
+    def add(self, title, terms):
+        doc_id = self.next_id
+        self.next_id += 1
+        self.ids.append(doc_id)
+        self._index(doc_id, title, terms)
+
+    def _index(self, doc_id, title, terms):
+        self.docs[doc_id] = (title, terms)
+        for term, weight in terms.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                self._sorted_terms = None
+            postings[doc_id] = weight
+
+    def _unindex(self, doc_id):
+        for term in self.docs.pop(doc_id)[1]:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                self._sorted_terms = None
+
+    def replace(self, position, terms):
+        doc_id = self.ids[position]
+        title = self.docs[doc_id][0]
+        self._unindex(doc_id)
+        self._index(doc_id, title, terms)
+
+    def remove(self, position):
+        self._unindex(self.ids.pop(position))
+        self.removals += 1
+
+    def position(self, doc_id):
+        return bisect_left(self.ids, doc_id)
+
+    def compacted(self):
+        """A copy with freshly built postings (dicts don't shrink after deletes)."""
+        fresh = _UserPostings()
+        for doc_id in self.ids:
+            title, terms = self.docs[doc_id]
+            fresh.add(title, terms)
+        return fresh
+
+    def expand(self, prefix):
+        """Indexed terms starting with prefix."""
+        if self._sorted_terms is None:
+            self._sorted_terms = sorted(self.postings)
+        terms = self._sorted_terms
+        i = bisect_left(terms, prefix)
+        matches = []
+        while i < len(terms) and terms[i].startswith(prefix):
+            matches.append(terms[i])
+            i += 1
+        return matches
+
+    def idf(self, term):
+        return math.log(1 + len(self.ids) / len(self.postings[term]))
+
+class NotesIndex(FileIndex):
+    """Inverted index over every user's note titles and content.
+
+    Built from the stored term weights on the first search. The write
+    functions below apply their change to it if it still matches the file
+    and otherwise leave it to be rebuilt; if notes.json is changed some
+    other way (archiving, restores) it is rebuilt on next search, or ahead
+    of it by the scheduler.
+    """
+
+    def __init__(self, filename=NOTES_FILE):
+        super().__init__(filename, self._build, self._load_moving_bodies)
+
+    @staticmethod
+    def _load_moving_bodies(filename):
+        ensure_data_dir()
+        notes = load_json(filename)
+        if _move_out_bodies(notes):
+            save_json(notes, filename)
+        return notes
+
+    @staticmethod
+    def _build(notes):
+        users = {}  # user_id -> _UserPostings
+        for note in notes:
+            users.setdefault(note['user_id'], _UserPostings()).add(note['title'], _read_terms(note))
+        return users
+
+    def compact(self, min_removals=32):
+        """Rebuild the postings of users with many deletes since their last build."""
+        if self.state is None:
+            return
+        for user_id, user in self.state.items():
+            if user.removals >= min_removals:
+                self.state[user_id] = user.compacted()
+
+    def _user(self, user_id):
+        return self.state.setdefault(user_id, _UserPostings())
+
+    def added(self, user_id, title, terms):
+        if self.state is not None:
+            self._user(user_id).add(title, terms)
+            self.written()
+
+    def replaced(self, user_id, position, terms):
+        if self.state is not None:
+            self._user(user_id).replace(position, terms)
+            self.written()
+
+    def removed(self, user_id, position):
+        if self.state is not None:
+            self._user(user_id).remove(position)
+            self.written()
+
+    def search(self, user_id, query, limit=10):
+        """Rank a user's notes containing every query term (`term*` matches a prefix).
+
+        Returns [(position, title, score)], best first; scores are summed
+        term weights scaled by how rare each term is among the user's notes.
+        Exact terms are intersected rarest first, and prefix terms are then
+        only checked against the notes still in the running.
+        """
+        self.refresh()
+        user = self._user(user_id)
+        exact, prefixes = [], []
+        for word in query.split():
+            tokens = tokenize(word)
+            if word.endswith('*') and tokens:
+                exact.extend(tokens[:-1])
+                prefixes.append(tokens[-1])
+            else:
+                exact.extend(tokens)
+        if not exact and not prefixes:
+            return []
+
+        scores = None
+        for term in sorted(set(exact), key=lambda t: len(user.postings.get(t, ()))):
+            postings = user.postings.get(term)
+            if not postings:
+                return []
+            idf = user.idf(term)
+            if scores is None:
+                scores = {doc_id: weight * idf for doc_id, weight in postings.items()}
+            else:
+                scores = {d: s + postings[d] * idf for d, s in scores.items() if d in postings}
+            if not scores:
+                return []
+
+        for prefix in prefixes:
+            if scores is None:
+                # Prefix-only query: expand it over the term dictionary
+                scores = {}
+                for term in user.expand(prefix):
+                    idf = user.idf(term)
+                    for doc_id, weight in user.postings[term].items():
+                        scores[doc_id] = max(scores.get(doc_id, 0), weight * idf)
+            else:
+                narrowed = {}
+                for doc_id, score in scores.items():
+                    best = max((weight * user.idf(term) for term, weight in user.docs[doc_id][1].items()
+                                if term.startswith(prefix)), default=None)
+                    if best is not None:
+                        narrowed[doc_id] = score + best
+                scores = narrowed
+            if not scores:
+                return []
+
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+        return [(user.position(doc_id), user.docs[doc_id][0], score) for doc_id, score in ranked]
+
+notes_index = NotesIndex()
+
+def save_note(note):
+    """Save a Note: its body and terms next to each other and its metadata to notes.json."""
+    notes_index.current()
+    content = note.content
+    note.id = note.id or uuid.uuid4().hex
+    note.size = write_body(note.id, content)
+    terms = _terms(note.title, content)
+    write_terms(note.id, terms)
+    note.content = None
+    append_record(NOTES_FILE, note)
+    notes_index.added(note.user_id, note.title, terms)
+
+def get_notes(user_id):
+    """A user's notes as metadata only (no bodies)."""
+    return get_user_records(NOTES_FILE, user_id)
+
+def get_notes_page(user_id, start, limit):
+    """One page of a user's note metadata as (notes, start, total)."""
+    return get_user_page(NOTES_FILE, user_id, start, limit)
+
+def get_note_body(user_id, note_id):
+    """(Note, body) for one of the user's notes, or None if it is gone."""
+    for note in get_notes(user_id):
+        if note.id == note_id:
+            return note, read_body(note)
+    return None
+
+def update_note(user_id, note_index, new_content):
+    """Replace a note's body."""
+    notes_index.current()
+    notes = load_json(NOTES_FILE)
+    _move_out_bodies(notes)
+    position = find_user_item(notes, user_id, note_index)
+    if position is None:
+        return False
+    note = notes[position]
+    note['size'] = write_body(note['id'], new_content)
+    terms = _terms(note['title'], new_content)
+    write_terms(note['id'], terms)
+    save_json(notes, NOTES_FILE, user_id)
+    notes_index.replaced(user_id, note_index, terms)
+    return True
+
+def delete_note(user_id, note_index):
+    """Delete a note and its body."""
+    notes_index.current()
+    notes = load_json(NOTES_FILE)
+    _move_out_bodies(notes)
+    position = find_user_item(notes, user_id, note_index)
+    if position is None:
+        return False
+    note = notes.pop(position)
+    save_json(notes, NOTES_FILE, user_id)
+    delete_body(note['id'])
+    notes_index.removed(user_id, note_index)
+    return True
+
+def search_notes(user_id, query, limit=10):
+    """Best matches for a query among a user's notes as [(position, title, score)]."""
+    return notes_index.search(user_id, query, limit)
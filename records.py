@@ -0,0 +1,161 @@
+"""Typed record classes for the JSON collections.
+
+Records are slotted dataclasses, so a list of them carries no per-record
+__dict__ and far fewer objects than the dicts they are decoded from, and
+timestamps are held as epoch integers. from_storage()/to_storage() convert
+to and from the dicts on disk by looping over the class's fields; keys a
+class does not know about are kept in `extra` and written back unchanged.
+"""
+from dataclasses import MISSING, dataclass, fields
+from datetime import datetime, timezone
+from typing import Optional
+from zoneinfo import ZoneInfo
+
+# Naive timestamps the bot wrote as IST wall-clock time (the rest were server UTC)
+IST = ZoneInfo('Asia/Kolkata')
+
+def as_epoch(value, zone=timezone.utc):
+    """Epoch seconds from a stored timestamp.
+
+    Records written before timestamps were epoch integers hold naive ISO
+    strings, read here as wall-clock time in zone. Most were server (UTC)
+    time; /remind times and password and calendar created_at were IST, as
+    listed in each class's legacy_zones and storage.migrate_timestamps().
+    """
+    if isinstance(value, (int, float)):
+        return int(value)
+    return int(datetime.fromisoformat(value).replace(tzinfo=zone).timestamp())
+
+def _epoch(value, zone=timezone.utc):
+    return value if value is None or type(value) is int else as_epoch(value, zone)
+
+class Record:
+    """Base of the record classes; _codec() sets up the field tables the codecs loop over."""
+    __slots__ = ()
+
+    @classmethod
+    def from_storage(cls, data):
+        """Decode a stored dict."""
+        get = data.get
+        record = cls(*[
+            get(name, default) if zone is None else _epoch(get(name, default), zone)
+            for name, default, zone in cls._decode_fields
+        ])
+        if not cls._names.issuperset(data):
+            record.extra = {k: v for k, v in data.items() if k not in cls._names}
+        return record
+
+    def to_storage(self):
+        """Encode as the dict written to disk (unset optional fields are omitted)."""
+        data = {}
+        for name, optional in self._encode_fields:
+            value = getattr(self, name)
+            if value is not None or not optional:
+                data[name] = value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+def _codec(*timestamps, ist=()):
+    """Class decorator: slotted dataclass with storage codecs.
+
+    timestamps names the fields decoded with as_epoch; those also in ist
+    held IST wall-clock strings before they were epoch integers.
+    """
+    def wrap(cls):
+        cls = dataclass(slots=True)(cls)
+        cls.legacy_zones = {name: IST if name in ist else timezone.utc for name in timestamps}
+        declared = [f for f in fields(cls) if f.name != 'extra']
+        # (name, default, legacy zone if a timestamp), in constructor order
+        cls._decode_fields = tuple(
+            (f.name, None if f.default is MISSING else f.default, cls.legacy_zones.get(f.name))
+            for f in declared
+        )
+        cls._encode_fields = tuple((f.name, f.default is None) for f in declared)
+        cls._names = frozenset(f.name for f in declared)
+        return cls
+    return wrap
+
+@_codec('created_at', 'completed_at', 'due')
+class Task(Record):
+    user_id: int
+    task: str
+    completed: bool = False
+    created_at: Optional[int] = None
+    completed_at: Optional[int] = None
+    tags: Optional[list] = None
+    due: Optional[int] = None
+    priority: Optional[int] = None  # 1 high, 2 medium, 3 low
+    extra: Optional[dict] = None
+
+@_codec('time', 'created_at', ist=('time',))
+class Reminder(Record):
+    user_id: int
+    time: int
+    message: str
+    created_at: Optional[int] = None
+    extra: Optional[dict] = None
+
+@_codec('end_time')
+class Timer(Record):
+    id: str
+    user_id: int
+    end_time: int
+    duration: int
+    extra: Optional[dict] = None
+
+@_codec('created_at')
+class Goal(Record):
+    id: str
+    user_id: int
+    title: str
+    description: str
+    target_date: str  # ISO date (local, no time zone)
+    progress: int = 0
+    created_at: Optional[int] = None
+    extra: Optional[dict] = None
+
+@_codec('date')
+class Expense(Record):
+    user_id: int
+    amount: float
+    description: str
+    date: Optional[int] = None
+    extra: Optional[dict] = None
+
+@_codec('created_at')
+class Note(Record):
+    user_id: int
+    title: str
+    content: Optional[str] = None  # only before the body is moved to its own file
+    id: Optional[str] = None
+    size: Optional[int] = None  # body size in bytes
+    created_at: Optional[int] = None
+    extra: Optional[dict] = None
+
+@_codec('created_at')
+class Birthday(Record):
+    user_id: int
+    name: str
+    date: str  # MM/DD
+    created_at: Optional[int] = None
+    extra: Optional[dict] = None
+
+@_codec('created_at', ist=('created_at',))
+class CalendarEvent(Record):
+    user_id: int
+    date: str  # YYYY-MM-DD
+    event: str
+    created_at: Optional[int] = None
+    extra: Optional[dict] = None
+
+RECORD_TYPES = {
+    'tasks.json': Task,
+    'reminders.json': Reminder,
+    'timers.json': Timer,
+    'goals.json': Goal,
+    'expenses.json': Expense,
+    'notes.json': Note,
+    'birthdays.json': Birthday,
+    'calendar_events.json': CalendarEvent,
+}
@@ -0,0 +1,92 @@
+"""TTL retention for collections whose entries expire.
+
+Each policy says when an entry expires and how long it is kept afterwards;
+sweeps then move (or drop) the expired entries, so the hot files track live
+data rather than lifetime history.
+"""
+import asyncio
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Callable, NamedTuple
+from archive import append_archive
+from storage import load_json, stage_json, swap_json, as_epoch, file_stamp
+
+DAY = 86400
+
+class RetentionPolicy(NamedTuple):
+    filename: str
+    expires_at: Callable[[dict], int]  # stored dict -> epoch seconds
+    ttl: int  # seconds an entry is kept after it expires
+    archive: bool  # move to the user's archive instead of dropping
+
+def _end_of_date(item):
+    # Calendar dates are local; a day of slack covers every timezone
+    day = datetime.strptime(item['date'], "%Y-%m-%d").replace(tzinfo=timezone.utc)
+    return int(day.timestamp()) + 2 * DAY
+
+POLICIES = [
+    RetentionPolicy('reminders.json', lambda r: as_epoch(r['time']), 7 * DAY, archive=True),
+    RetentionPolicy('timers.json', lambda t: as_epoch(t['end_time']), DAY, archive=False),
+    RetentionPolicy('calendar_events.json', _end_of_date, 30 * DAY, archive=True),
+]
+
+class RetentionSweeper:
+    """Sweeps over the POLICIES collections, off the event loop.
+
+    A collection is re-read only if its file changed or its earliest
+    remaining expiry has passed since the last sweep. Each sweep removes
+    every expired entry with one load and one save: the file is read and
+    the kept entries staged on a worker thread, then swapped in on the
+    event loop only if no handler wrote the file in the meantime.
+    """
+
+    def __init__(self, policies=POLICIES):
+        self.policies = policies
+        self._next_due = {}  # filename -> (file stamp, earliest remaining removal time)
+        self.removed = defaultdict(int)
+
+    def _plan(self, policy, now):
+        """Split a collection into expired and kept entries, staging the kept ones (worker thread)."""
+        stamp = file_stamp(policy.filename)
+        expired, kept, next_due = [], [], None
+        for item in load_json(policy.filename):
+            remove_at = policy.expires_at(item) + policy.ttl
+            if remove_at <= now:
+                expired.append(item)
+                continue
+            kept.append(item)
+            if next_due is None or remove_at < next_due:
+                next_due = remove_at
+        staged = stage_json(kept, policy.filename) if expired else None
+        return stamp, staged, expired, next_due
+
+    @staticmethod
+    def _archive(policy, expired):
+        by_user = defaultdict(list)
+        for item in expired:
+            by_user[item['user_id']].append(item)
+        for user_id, items in by_user.items():
+            append_archive(user_id, policy.filename, items)
+
+    async def sweep(self, policy, now):
+        """Remove every expired entry of one collection; returns how many, or None if a write got in first."""
+        stamp = file_stamp(policy.filename)
+        known = self._next_due.get(policy.filename)
+        if stamp is None or (known and known[0] == stamp and (known[1] is None or now < known[1])):
+            return 0
+
+        stamp, staged, expired, next_due = await asyncio.to_thread(self._plan, policy, now)
+        if expired:
+            if not swap_json(staged, policy.filename, stamp):
+                return None
+            if policy.archive:
+                # Archived only after the save, so a crash in between can
+                # lose these archive copies but never archive them twice
+                await asyncio.to_thread(self._archive, policy, expired)
+            self.removed[policy.filename] += len(expired)
+        self._next_due[policy.filename] = (file_stamp(policy.filename), next_due)
+        return len(expired)
+
+    async def run_once(self, now):
+        """One sweep of every policy; returns True if any was pre-empted by a write and should be retried."""
+        return None in [await self.sweep(policy, now) for policy in self.policies]
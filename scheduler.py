@@ -1,76 +1,144 @@
 import asyncio
-from datetime import datetime
-from extra_storage import (
-    get_auto_messages, get_active_timers,
-    get_upcoming_birthdays, get_calendar_events
-)
-from utils import to_ist, from_ist
+import time
+from array import array
+from bisect import bisect_right
+from datetime import date, timedelta
+from telegram.error import BadRequest, Forbidden
+from storage import FileIndex, as_epoch, now_epoch, get_due, remove_records
+from extra_storage import get_auto_messages, get_birthdays, days_until_birthday
+from calendar_store import get_event_users, get_events_between
+from timezones import local_now, format_local
+from key_rotation import KeyRotation
+from retention import RetentionSweeper
+from tiering import user_tiers
+from note_store import notes_index
+
+class DueIndex(FileIndex):
+    """Sorted due times of one collection, rebuilt only when its file changes.
+
+    Each tick is then a bisect over a packed array of epoch seconds instead
+    of parsing and comparing every record.
+    """
+
+    def __init__(self, filename, field):
+        super().__init__(filename, lambda items: array('q', sorted(as_epoch(r[field]) for r in items)))
+
+    def due_count(self, now):
+        """Number of records due at or before now (epoch seconds)."""
+        return bisect_right(self.refresh(), now)
 
 class BackgroundTasks:
     def __init__(self, bot):
         self.bot = bot
         self.tasks = []
         self.running = False
+        self.reminders_due = DueIndex('reminders.json', 'time')
+        self.timers_due = DueIndex('timers.json', 'end_time')
+        self._notified = {}  # notification key -> local date it was last sent
+        self._pruned_on = date.min
+
+    async def _send(self, chat_id, text):
+        """Send a message; False (after logging) if it failed in a way worth retrying.
+
+        A blocked bot (Forbidden) or a rejected message or chat (BadRequest,
+        e.g. chat not found) fails the same way every time, so it counts as
+        done; network errors, timeouts and flood limits are retried.
+        """
+        try:
+            await self.bot.send_message(chat_id=chat_id, text=text)
+            return True
+        except (Forbidden, BadRequest) as e:  # BadRequest before NetworkError, its base class
+            print(f"Dropping message to {chat_id}: {e}")
+            return True
+        except Exception as e:
+            print(f"Error sending to {chat_id}: {e}")
+            return False
+
+    def _first_today(self, key, today):
+        """True the first time key is seen on a given local date."""
+        if self._notified.get(key) == today:
+            return False
+        if today > self._pruned_on:
+            # Users' local dates are at most a day apart, so older entries can't match again
+            cutoff = today - timedelta(days=1)
+            self._notified = {k: day for k, day in self._notified.items() if day >= cutoff}
+            self._pruned_on = today
+        self._notified[key] = today
+        return True
+
+    async def _deliver(self, filename, field, now, message):
+        """Send every due entry of a collection; entries that hit a transient error retry next tick.
+
+        Retention drops entries that keep failing (reminders after 7 days, timers after one).
+        """
+        done = []
+        for record in get_due(filename, field, now):
+            if await self._send(record.user_id, message(record)):
+                done.append(record)
+        remove_records(filename, done)
+
+    async def check_reminders(self):
+        """Send reminders as they fall due."""
+        while self.running:
+            try:
+                now = now_epoch()
+                if self.reminders_due.due_count(now):
+                    await self._deliver('reminders.json', 'time', now, lambda reminder: (
+                        f"⏰ Reminder: {reminder.message}\n"
+                        f"Time: {format_local(reminder.time, reminder.user_id, '%I:%M %p')}"
+                    ))
+            except Exception as e:
+                print(f"Error in check_reminders: {e}")
+            await asyncio.sleep(30)
 
     async def check_timers(self):
         """Check for expired timers and send notifications."""
         while self.running:
             try:
-                now = datetime.now()
-                now_ist = to_ist(now)
-                # For timers, we'll check all users since they're time-sensitive
-                all_timers = get_active_timers(None)  # None to get all timers
-                for timer in all_timers:
-                    end_time = datetime.fromisoformat(timer['end_time'])
-                    end_time_ist = to_ist(end_time)
-                    if end_time <= now:
-                        await self.bot.send_message(
-                            chat_id=timer['user_id'],
-                            text=f"⏰ Timer finished!\n"
-                                 f"Duration: {timer['duration']} minutes\n"
-                                 f"Time: {end_time_ist.strftime('%I:%M %p')} IST"
-                        )
+                now = now_epoch()
+                if self.timers_due.due_count(now):
+                    await self._deliver('timers.json', 'end_time', now, lambda timer: (
+                        f"⏰ Timer finished!\n"
+                        f"Duration: {timer.duration} minutes\n"
+                        f"Time: {format_local(timer.end_time, timer.user_id, '%I:%M %p')}"
+                    ))
             except Exception as e:
                 print(f"Error in check_timers: {e}")
-            await asyncio.sleep(60)  # Check every minute
+            await asyncio.sleep(15)
 
     async def send_auto_messages(self):
-        """Send scheduled auto messages."""
+        """Send daily auto messages at each user's local HH:MM."""
         while self.running:
             try:
-                current_time = to_ist(datetime.now()).strftime("%H:%M")
-                # For auto messages, check all users
-                all_messages = get_auto_messages(None)  # None to get all messages
-                for msg in all_messages:
-                    if msg['time'] == current_time and msg['active']:
-                        await self.bot.send_message(
-                            chat_id=msg['user_id'],
-                            text=f"🔄 Auto Message:\n{msg['message']}\n"
-                                 f"Time: {current_time} IST"
+                for msg in get_auto_messages(None):  # None to get all messages
+                    local = local_now(msg['user_id'])
+                    current_time = local.strftime("%H:%M")
+                    if msg['time'] == current_time and self._first_today(('auto', msg['id']), local.date()):
+                        await self._send(
+                            msg['user_id'],
+                            f"🔄 Auto Message:\n{msg['message']}\n"
+                            f"Time: {current_time} {local.tzname()}"
                         )
             except Exception as e:
                 print(f"Error in send_auto_messages: {e}")
-            await asyncio.sleep(60)  # Check every minute
+            await asyncio.sleep(60 - time.time() % 60)  # Wake at the start of each minute
 
     async def check_birthdays(self):
         """Check for upcoming birthdays and send notifications."""
         while self.running:
             try:
-                today = to_ist(datetime.now())
-                # For birthdays, check all users
-                all_birthdays = get_upcoming_birthdays(None)  # None to get all birthdays
-                for birthday in all_birthdays:
-                    bday_date = datetime.strptime(birthday['date'], "%m/%d")
-                    bday_date = bday_date.replace(year=today.year)
-                    days_until = (bday_date - today.date()).days
-
-                    if days_until in [7, 3, 1, 0]:  # Notify 7 days, 3 days, 1 day before and on the day
-                        time_str = today.strftime("%I:%M %p")
-                        await self.bot.send_message(
-                            chat_id=birthday['user_id'],
-                            text=f"🎂 Birthday Reminder! ({time_str} IST)\n"
-                                 f"{birthday['name']}'s birthday "
-                                 f"{'is today' if days_until == 0 else f'is in {days_until} days'}!"
+                for birthday in get_birthdays(None):  # None to get all birthdays
+                    local = local_now(birthday.user_id)
+                    days_until = days_until_birthday(birthday, local.date())
+                    key = ('birthday', birthday.user_id, birthday.name, birthday.date)
+
+                    # Notify 7 days, 3 days, 1 day before and on the day
+                    if days_until in [7, 3, 1, 0] and self._first_today(key, local.date()):
+                        await self._send(
+                            birthday.user_id,
+                            f"🎂 Birthday Reminder! ({local.strftime('%I:%M %p %Z')})\n"
+                            f"{birthday.name}'s birthday "
+                            f"{'is today' if days_until == 0 else f'is in {days_until} days'}!"
                         )
             except Exception as e:
                 print(f"Error in check_birthdays: {e}")
@@ -80,33 +148,80 @@ class BackgroundTasks:
         """Check for upcoming calendar events and send notifications."""
         while self.running:
             try:
-                today = to_ist(datetime.now())
-                # For calendar events, check all users
-                all_events = get_calendar_events(None)  # None to get all events
-                for event in all_events:
-                    event_date = datetime.strptime(event['date'], "%Y-%m-%d").date()
-                    days_until = (event_date - today.date()).days
-
-                    if days_until in [7, 1, 0]:  # Notify 7 days, 1 day before and on the day
-                        time_str = today.strftime("%I:%M %p")
-                        await self.bot.send_message(
-                            chat_id=event['user_id'],
-                            text=f"📅 Calendar Reminder! ({time_str} IST)\n"
-                                 f"Event: {event['event']}\n"
-                                 f"{'Today!' if days_until == 0 else f'In {days_until} days'}"
-                        )
+                for user_id in get_event_users():
+                    local = local_now(user_id)
+                    # Notify 7 days, 1 day before and on the day: three date lookups per user
+                    for days_until in [7, 1, 0]:
+                        day = (local.date() + timedelta(days=days_until)).isoformat()
+                        events, _ = get_events_between(user_id, day, day)
+                        for _, event in events:
+                            key = ('event', user_id, event.date, event.event)
+                            if self._first_today(key, local.date()):
+                                await self._send(
+                                    user_id,
+                                    f"📅 Calendar Reminder! ({local.strftime('%I:%M %p %Z')})\n"
+                                    f"Event: {event.event}\n"
+                                    f"{'Today!' if days_until == 0 else f'In {days_until} days'}"
+                                )
             except Exception as e:
                 print(f"Error in check_calendar_events: {e}")
             await asyncio.sleep(3600)  # Check every hour
 
+    async def rotate_vault_keys(self):
+        """Re-encrypt stored passwords whenever the active vault key changes."""
+        rotation = KeyRotation()
+        while self.running:
+            try:
+                if rotation.needs_rotation():
+                    await rotation.run()
+            except Exception as e:
+                print(f"Error in rotate_vault_keys: {e}")
+            await asyncio.sleep(3600)  # Check every hour
+
+    async def prune_expired(self):
+        """Archive or drop expired entries."""
+        sweeper = RetentionSweeper()
+        while self.running:
+            retry = False
+            try:
+                retry = await sweeper.run_once(now_epoch())
+            except Exception as e:
+                print(f"Error in prune_expired: {e}")
+            await asyncio.sleep(5 if retry else 3600)  # Retry soon if a write got in first
+
+    async def tier_cold_data(self):
+        """Move old completed tasks and inactive users' data to the archives."""
+        while self.running:
+            moved = 0
+            try:
+                moved = await user_tiers.tier_out(now_epoch())
+            except Exception as e:
+                print(f"Error in tier_cold_data: {e}")
+            await asyncio.sleep(60 if moved is None else 3600)  # Retry soon if a write got in first
+
+    async def maintain_notes_index(self):
+        """Rebuild the notes search index after outside changes and compact it."""
+        while self.running:
+            try:
+                notes_index.refresh()
+                notes_index.compact()
+            except Exception as e:
+                print(f"Error in maintain_notes_index: {e}")
+            await asyncio.sleep(600)  # Every 10 minutes
+
     async def start(self):
         """Start all background tasks."""
         self.running = True
         self.tasks = [
+            asyncio.create_task(self.check_reminders()),
             asyncio.create_task(self.check_timers()),
             asyncio.create_task(self.send_auto_messages()),
             asyncio.create_task(self.check_birthdays()),
-            asyncio.create_task(self.check_calendar_events())
+            asyncio.create_task(self.check_calendar_events()),
+            asyncio.create_task(self.rotate_vault_keys()),
+            asyncio.create_task(self.prune_expired()),
+            asyncio.create_task(self.tier_cold_data()),
+            asyncio.create_task(self.maintain_notes_index())
         ]
         print("Background tasks started successfully")
 
@@ -117,6 +232,7 @@ class BackgroundTasks:
             task.cancel()
         await asyncio.gather(*self.tasks, return_exceptions=True)
         self.tasks = []
+        user_tiers.flush()
         print("Background tasks stopped successfully")
 
 background_tasks = None
@@ -1,161 +1,382 @@
 import json
 import os
-from datetime import datetime
+import threading
+import time
+from collections import defaultdict
+from datetime import timezone
+from records import IST, RECORD_TYPES, as_epoch
 
 DATA_DIR = "data"
 
+# Held only while a file is swapped into place, never across a whole job
+_file_locks = defaultdict(threading.Lock)
+
+# Write counters that let cached views tell whether a collection changed:
+# per (filename, user_id) for a user's own writes, per filename for
+# writes that can touch anyone (sweeps, migrations, swaps)
+_collection_versions = defaultdict(int)
+_user_versions = defaultdict(int)
+
 def ensure_data_dir():
     """Ensure data directory exists."""
     if not os.path.exists(DATA_DIR):
         os.makedirs(DATA_DIR)
 
+def data_path(filename):
+    """Path of a file inside the data directory."""
+    return os.path.join(DATA_DIR, filename)
+
+def file_lock(filename):
+    """Lock serialising replacement of a data file."""
+    return _file_locks[filename]
+
+def path_stamp(path):
+    """(mtime_ns, size) of a file, or None if it doesn't exist; changes whenever it is rewritten."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def file_stamp(filename):
+    """path_stamp of a file in the data directory."""
+    return path_stamp(data_path(filename))
+
+class FileIndex:
+    """In-memory state derived from one data file, rebuilt when the file changes.
+
+    build(items) makes the state from the file's contents (read with
+    load(filename), load_json by default). Write functions call refresh()
+    before writing, update the state to match, then call written(), so the
+    index follows its own writes without re-reading the file; any other
+    change to the file (sweeps, tiering, imports) triggers a rebuild on the
+    next refresh().
+    """
+
+    def __init__(self, filename, build, load=None):
+        self.filename = filename
+        self._build = build
+        self._load = load or load_json
+        self.state = None
+        self._stamp = None
+
+    def refresh(self):
+        """The current state, rebuilt first if the file changed behind the index's back."""
+        stamp = file_stamp(self.filename)
+        if self.state is None or stamp != self._stamp:
+            items = self._load(self.filename)
+            # load() may itself rewrite the file (migrations); stamp what was read
+            self._stamp = file_stamp(self.filename)
+            self.state = self._build(items)
+        return self.state
+
+    def current(self):
+        """The state if it still matches the file, else None; never rebuilds."""
+        if self.state is not None and file_stamp(self.filename) != self._stamp:
+            self.state = None
+        return self.state
+
+    def written(self):
+        """Record that the state already reflects the file as just written."""
+        self._stamp = file_stamp(self.filename)
+
 def load_json(filename):
     """Load data from JSON file."""
     ensure_data_dir()
-    filepath = os.path.join(DATA_DIR, filename)
+    filepath = data_path(filename)
     if not os.path.exists(filepath):
         return []
     with open(filepath, 'r') as f:
         return json.load(f)
 
-def save_json(data, filename):
-    """Save data to JSON file."""
+def collection_version(filename, user_id):
+    """Version of a user's view of a collection; changes on every relevant write."""
+    return _collection_versions[filename], _user_versions[(filename, user_id)]
+
+def bump_version(filename, user_id=None):
+    """Record a write to a collection, by one user or (user_id=None) anyone."""
+    if user_id is None:
+        _collection_versions[filename] += 1
+    else:
+        _user_versions[(filename, user_id)] += 1
+
+def save_json(data, filename, user_id=None):
+    """Save data to JSON file (written to a temp file, then atomically swapped in).
+
+    Pass the user_id when only that user's entries changed so cached views
+    of other users stay valid.
+    """
+    ensure_data_dir()
+    filepath = data_path(filename)
+    tmp_path = f"{filepath}.tmp.{threading.get_ident()}"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    with file_lock(filename):
+        os.replace(tmp_path, filepath)
+    bump_version(filename, user_id)
+
+def stage_json(data, filename):
+    """Write data to a temp file beside filename for a later swap_json; returns its path."""
     ensure_data_dir()
-    filepath = os.path.join(DATA_DIR, filename)
-    with open(filepath, 'w') as f:
+    tmp_path = f"{data_path(filename)}.staged.{threading.get_ident()}"
+    with open(tmp_path, 'w') as f:
         json.dump(data, f, indent=2)
+    return tmp_path
+
+def swap_json(tmp_path, filename, stamp, user_id=None):
+    """Replace filename with a staged file unless it changed since `stamp` was taken.
+
+    Background jobs load and stage on a worker thread, then swap on the
+    event loop, where handlers do their load/modify/save without yielding.
+    Returns False, discarding the staged file, if the file was written
+    meanwhile; the caller retries later.
+    """
+    with file_lock(filename):
+        if file_stamp(filename) != stamp:
+            os.remove(tmp_path)
+            return False
+        os.replace(tmp_path, data_path(filename))
+    bump_version(filename, user_id)
+    return True
+
+def iter_json_array(filename, chunk_size=64 * 1024):
+    """Yield the objects of a JSON array file one by one without loading it whole."""
+    filepath = data_path(filename)
+    if not os.path.exists(filepath):
+        return
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r') as f:
+        buffer = f.read(chunk_size).lstrip()
+        if not buffer:
+            return
+        if not buffer.startswith('['):
+            raise ValueError(f"{filename} is not a JSON array")
+        buffer = buffer[1:]
+        eof = False
+        while True:
+            buffer = buffer.lstrip().lstrip(',').lstrip()
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+                continue
+            yield item
+            buffer = buffer[end:]
+            if len(buffer) < chunk_size and not eof:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                buffer += chunk
+
+def migrate_timestamps():
+    """Rewrite naive ISO timestamps from before epoch integers, each in the zone it was written in.
+
+    Run once at startup, so code reading the raw dicts (due indexes,
+    retention, tiering) sees integers. Returns how many values changed.
+    """
+    collections = {filename: cls.legacy_zones for filename, cls in RECORD_TYPES.items()}
+    collections['passwords.json'] = {'created_at': IST}
+    changed = 0
+    for filename, zones in collections.items():
+        items = load_json(filename)
+        before = changed
+        for item in items:
+            for field, zone in zones.items():
+                if isinstance(item.get(field), str):
+                    if filename == 'reminders.json' and item.get('message', '').startswith("🔄 Auto Message:"):
+                        zone = timezone.utc  # /automessage converted its first reminder to UTC itself
+                    item[field] = as_epoch(item[field], zone)
+                    changed += 1
+        if changed > before:
+            save_json(items, filename)
+    return changed
+
+def now_epoch():
+    """Current UTC time as integer seconds since the epoch (the timestamp format on disk)."""
+    return int(time.time())
+
+def to_epoch(dt):
+    """Epoch seconds for an aware datetime."""
+    return int(dt.timestamp())
+
+def get_user_records(filename, user_id):
+    """A user's entries (every user's if user_id is None) as typed records."""
+    decode = RECORD_TYPES[filename].from_storage
+    return [decode(item) for item in load_json(filename) if user_id in (None, item['user_id'])]
+
+def append_record(filename, record):
+    """Append a typed record to its collection."""
+    append_records(filename, [record])
+
+def append_records(filename, records):
+    """Append typed records to their collection in one write."""
+    if not records:
+        return
+    items = load_json(filename)
+    items.extend(record.to_storage() for record in records)
+    owners = {record.user_id for record in records}
+    save_json(items, filename, owners.pop() if len(owners) == 1 else None)
+
+def find_user_item(items, user_id, index, predicate=None):
+    """Return the position in items of the user's index-th (matching) entry, or None."""
+    return find_user_items(items, user_id, [index], predicate).get(index)
+
+def find_user_items(items, user_id, indexes, predicate=None):
+    """Map each of the user's wanted (matching) entry indexes to its position in items.
+
+    Indexes that don't exist are left out of the result.
+    """
+    wanted = {index for index in indexes if index >= 0}
+    found = {}
+    seen = 0
+    for position, item in enumerate(items):
+        if len(found) == len(wanted):
+            break
+        if item['user_id'] == user_id and (predicate is None or predicate(item)):
+            if seen in wanted:
+                found[seen] = position
+            seen += 1
+    return found
+
+def update_user_item(filename, user_id, index, changes, predicate=None):
+    """Apply changes to the user's index-th entry (among those matching predicate)."""
+    return bool(update_user_items(filename, user_id, [index], changes, predicate))
+
+def update_user_items(filename, user_id, indexes, changes, predicate=None):
+    """Apply the same changes to several of the user's entries in one write.
+
+    Returns the sorted indexes that existed (and were changed).
+    """
+    items = load_json(filename)
+    found = find_user_items(items, user_id, indexes, predicate)
+    if not found:
+        return []
+    for position in found.values():
+        items[position].update(changes)
+    save_json(items, filename, user_id)
+    return sorted(found)
+
+def delete_user_item(filename, user_id, index, predicate=None):
+    """Delete the user's index-th entry (among those matching predicate)."""
+    return bool(delete_user_items(filename, user_id, [index], predicate))
+
+def delete_user_items(filename, user_id, indexes, predicate=None):
+    """Delete several of the user's entries in one write; returns the sorted indexes deleted."""
+    items = load_json(filename)
+    found = find_user_items(items, user_id, indexes, predicate)
+    if not found:
+        return []
+    for position in sorted(found.values(), reverse=True):
+        del items[position]
+    save_json(items, filename, user_id)
+    return sorted(found)
+
+def get_user_page(filename, user_id, start, limit, predicate=None):
+    """Return (records, start, total) for one page of the user's entries.
+
+    start is a cursor into the user's (optionally filtered) list; only the
+    requested page is decoded for rendering. A cursor past the end falls
+    back to the last page.
+
+    There is no index behind this: every page loads the whole file and runs
+    predicate over each of the user's entries, so a page costs the same as
+    listing everything. It serves reminders, whose "active" filter depends
+    on the current time, and note listings, which deliberately don't build
+    the notes search index.
+    """
+    matches = [
+        item for item in load_json(filename)
+        if item['user_id'] == user_id and (predicate is None or predicate(item))
+    ]
+    total = len(matches)
+    if start >= total and start > 0:
+        start = (total - 1) // limit * limit if total else 0
+    decode = RECORD_TYPES[filename].from_storage
+    return [decode(item) for item in matches[start:start + limit]], start, total
 
 def save_reminder(reminder):
-    """Save a reminder to reminders.json."""
-    reminders = load_json('reminders.json')
-    reminders.append(reminder)
-    save_json(reminders, 'reminders.json')
+    """Save a Reminder to reminders.json."""
+    append_record('reminders.json', reminder)
+
+def _is_active(now):
+    return lambda reminder: as_epoch(reminder['time']) > now
 
 def update_reminder(user_id, reminder_index, new_time=None, new_message=None):
-    """Update a reminder's time or message."""
-    reminders = load_json('reminders.json')
-    user_reminders = [r for r in reminders if r['user_id'] == user_id]
-
-    if 0 <= reminder_index < len(user_reminders):
-        target_time = user_reminders[reminder_index]['time']
-        for reminder in reminders:
-            if reminder['user_id'] == user_id and reminder['time'] == target_time:
-                if new_time:
-                    reminder['time'] = new_time
-                if new_message:
-                    reminder['message'] = new_message
-                break
-        save_json(reminders, 'reminders.json')
-        return True
-    return False
+    """Update the time (epoch seconds) or message of the user's index-th active reminder."""
+    changes = {}
+    if new_time:
+        changes['time'] = new_time
+    if new_message:
+        changes['message'] = new_message
+    return update_user_item('reminders.json', user_id, reminder_index, changes, _is_active(now_epoch()))
 
 def delete_reminder(user_id, reminder_index):
-    """Delete a reminder."""
-    reminders = load_json('reminders.json')
-    user_reminders = [r for r in reminders if r['user_id'] == user_id]
-
-    if 0 <= reminder_index < len(user_reminders):
-        target_time = user_reminders[reminder_index]['time']
-        reminders = [r for r in reminders if not (r['user_id'] == user_id and r['time'] == target_time)]
-        save_json(reminders, 'reminders.json')
-        return True
-    return False
+    """Delete the user's index-th active reminder (as numbered in /reminders)."""
+    return delete_user_item('reminders.json', user_id, reminder_index, _is_active(now_epoch()))
+
+def get_due(filename, field, now):
+    """Entries (as records) whose `field` timestamp is at or before now."""
+    decode = RECORD_TYPES[filename].from_storage
+    return [decode(item) for item in load_json(filename) if as_epoch(item[field]) <= now]
+
+def remove_records(filename, records):
+    """Remove one stored entry equal to each record; entries changed since it was read are kept."""
+    unwanted = list(records)
+    if not unwanted:
+        return
+    decode = RECORD_TYPES[filename].from_storage
+    kept = []
+    for item in load_json(filename):
+        record = decode(item) if unwanted else None
+        if record in unwanted:
+            unwanted.remove(record)
+        else:
+            kept.append(item)
+    save_json(kept, filename)
 
 def get_reminders(user_id):
     """Get reminders for a specific user."""
-    reminders = load_json('reminders.json')
-    return [r for r in reminders if r['user_id'] == user_id]
+    return get_user_records('reminders.json', user_id)
 
 def get_active_reminders(user_id):
     """Get active reminders for a user."""
-    now = datetime.now()
-    reminders = get_reminders(user_id)
-    return [r for r in reminders if datetime.fromisoformat(r['time']) > now]
-
-def save_task(task):
-    """Save a task to tasks.json."""
-    tasks = load_json('tasks.json')
-    tasks.append(task)
-    save_json(tasks, 'tasks.json')
-
-def update_task(user_id, task_index, new_task=None):
-    """Update a task's content."""
-    tasks = load_json('tasks.json')
-    user_tasks = [t for t in tasks if t['user_id'] == user_id]
-
-    if 0 <= task_index < len(user_tasks):
-        task_id = user_tasks[task_index]['created_at']
-        for task in tasks:
-            if task['user_id'] == user_id and task['created_at'] == task_id:
-                if new_task:
-                    task['task'] = new_task
-                break
-        save_json(tasks, 'tasks.json')
-        return True
-    return False
+    now = now_epoch()
+    return [r for r in get_reminders(user_id) if r.time > now]
+
+def get_active_reminders_page(user_id, start, limit):
+    """Get one page of a user's active reminders as (reminders, start, total, next_due).
 
-def delete_task(user_id, task_index):
-    """Delete a task."""
-    tasks = load_json('tasks.json')
-    user_tasks = [t for t in tasks if t['user_id'] == user_id]
+    next_due is the earliest active reminder time (epoch seconds), when the
+    list next changes without a write.
+    """
+    now = now_epoch()
+    next_due = None
 
-    if 0 <= task_index < len(user_tasks):
-        task_id = user_tasks[task_index]['created_at']
-        tasks = [t for t in tasks if not (t['user_id'] == user_id and t['created_at'] == task_id)]
-        save_json(tasks, 'tasks.json')
+    def active(reminder):
+        nonlocal next_due
+        due = as_epoch(reminder['time'])
+        if due <= now:
+            return False
+        if next_due is None or due < next_due:
+            next_due = due
         return True
-    return False
-
-def get_tasks(user_id):
-    """Get tasks for a specific user."""
-    tasks = load_json('tasks.json')
-    return [task for task in tasks if task['user_id'] == user_id]
-
-def update_task_status(user_id, task_index, completed):
-    """Update task completion status."""
-    tasks = load_json('tasks.json')
-    user_tasks = [t for t in tasks if t['user_id'] == user_id]
-    if 0 <= task_index < len(user_tasks):
-        task_id = user_tasks[task_index]['created_at']
-        for task in tasks:
-            if task['user_id'] == user_id and task['created_at'] == task_id:
-                task['completed'] = completed
-                break
-    save_json(tasks, 'tasks.json')
-
-def save_goal(goal):
-    """Save a goal to goals.json."""
-    goals = load_json('goals.json')
-    goals.append(goal)
-    save_json(goals, 'goals.json')
-
-def get_goals(user_id):
-    """Get goals for a specific user."""
-    goals = load_json('goals.json')
-    return [goal for goal in goals if goal['user_id'] == user_id]
-
-def update_goal_progress(user_id, goal_id, progress):
-    """Update goal progress."""
-    goals = load_json('goals.json')
-    for goal in goals:
-        if goal['user_id'] == user_id and goal['id'] == goal_id:
-            goal['progress'] = min(100, max(0, progress))
-            break
-    save_json(goals, 'goals.json')
+
+    page, start, total = get_user_page('reminders.json', user_id, start, limit, active)
+    return page, start, total, next_due
 
 def save_expense(expense):
-    """Save an expense to expenses.json."""
-    expenses = load_json('expenses.json')
-    expenses.append(expense)
-    save_json(expenses, 'expenses.json')
-
-def save_note(note):
-    """Save a note to notes.json."""
-    notes = load_json('notes.json')
-    notes.append(note)
-    save_json(notes, 'notes.json')
-
-def get_notes(user_id):
-    """Get notes for a specific user."""
-    notes = load_json('notes.json')
-    return [note for note in notes if note['user_id'] == user_id]
\ No newline at end of file
+    """Save an Expense to expenses.json."""
+    append_record('expenses.json', expense)
+
+def get_expenses(user_id):
+    """Get expenses for a specific user."""
+    return get_user_records('expenses.json', user_id)
+
+def delete_expense(user_id, expense_index):
+    """Delete an expense."""
+    return delete_user_item('expenses.json', user_id, expense_index)
@@ -0,0 +1,159 @@
+"""Local stand-in for OpenWeatherMap, NewsAPI and MyMemory.
+
+Serves recorded responses with configurable latency and error injection so
+the external API handlers can be exercised without network access or keys:
+
+    python stub_upstream.py --port 8765 --latency 0.05 --error-rate 0.1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+RECORDED_WEATHER = {
+    "coord": {"lon": -0.1257, "lat": 51.5085},
+    "weather": [{"id": 803, "main": "Clouds", "description": "broken clouds", "icon": "04d"}],
+    "main": {"temp": 14.2, "feels_like": 13.5, "temp_min": 12.9, "temp_max": 15.3,
+             "pressure": 1016, "humidity": 72},
+    "wind": {"speed": 4.6, "deg": 250},
+    "dt": 1742205600,
+    "name": "London",
+    "cod": 200
+}
+
+RECORDED_FORECAST = {
+    "cod": "200",
+    "cnt": 8,
+    "list": [
+        {
+            "dt": 1742205600 + i * 10800,
+            "main": {"temp": 55 + (i % 4) * 2},
+            "weather": [{"description": ["light rain", "overcast clouds", "clear sky"][i % 3]}]
+        }
+        for i in range(8)
+    ]
+}
+
+RECORDED_NEWS = {
+    "status": "ok",
+    "totalResults": 5,
+    "articles": [
+        {
+            "source": {"id": None, "name": f"Recorded Source {i}"},
+            "title": f"Recorded headline {i}",
+            "description": f"Recorded description for headline {i}.",
+            "url": f"https://example.com/news/{i}"
+        }
+        for i in range(1, 6)
+    ]
+}
+
+RECORDED_TRANSLATION = {
+    "responseData": {"translatedText": "hola mundo", "match": 1},
+    "responseStatus": 200
+}
+
+ROUTES = {
+    '/data/2.5/weather': RECORDED_WEATHER,
+    '/data/2.5/forecast': RECORDED_FORECAST,
+    '/v2/top-headlines': RECORDED_NEWS,
+    '/get': RECORDED_TRANSLATION,
+}
+
+class StubUpstreamServer:
+    """Threaded HTTP server replaying recorded upstream responses."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0,
+                 error_status=503):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.calls = Counter()
+        self.errors = Counter()
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), self._make_handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def env(self):
+        """Environment overrides pointing upstream.py at this server."""
+        return {
+            'OPENWEATHERMAP_URL': f"{self.url}/data/2.5",
+            'NEWS_API_URL': f"{self.url}/v2/top-headlines",
+            'MYMEMORY_URL': f"{self.url}/get",
+        }
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parsed = urlparse(self.path)
+                with server._lock:
+                    server.calls[parsed.path] += 1
+
+                delay = server.latency + random.uniform(0, server.jitter)
+                if delay:
+                    time.sleep(delay)
+
+                body = ROUTES.get(parsed.path)
+                if body is None:
+                    self._send(404, {"message": "not found"})
+                elif random.random() < server.error_rate:
+                    with server._lock:
+                        server.errors[parsed.path] += 1
+                    self._send(server.error_status, {"message": "injected error"})
+                elif parsed.path == '/data/2.5/weather':
+                    city = parse_qs(parsed.query).get('q', ['London'])[0]
+                    self._send(200, dict(body, name=city))
+                else:
+                    self._send(200, body)
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="Base latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency in seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Fraction of 5xx responses")
+    args = parser.parse_args()
+
+    stub = StubUpstreamServer(args.host, args.port, args.latency, args.jitter, args.error_rate)
+    for name, value in stub.env().items():
+        print(f"export {name}={value}")
+    try:
+        stub._httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
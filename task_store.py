@@ -0,0 +1,344 @@
+"""Tasks storage with per-user secondary indexes for /todo filters.
+
+Tasks can carry #tags, a due date (due:fri) and a priority (!high). The
+index keeps every user's tasks as Task records plus bitmaps over them
+(open/done, one per tag, priority and word) and a due-date sorted list,
+so a filtered page is a few integer ANDs and a bisect instead of a scan.
+"""
+import re
+from bisect import bisect_left, insort
+from datetime import datetime, time, timedelta
+from typing import NamedTuple, Optional
+from records import Task
+from storage import (
+    FileIndex, append_records, update_user_items, delete_user_items, get_user_records, now_epoch
+)
+from timeparse import parse_time
+
+TASKS_FILE = 'tasks.json'
+
+PRIORITIES = {
+    'high': 1, 'h': 1, '1': 1,
+    'medium': 2, 'med': 2, 'm': 2, '2': 2,
+    'low': 3, 'l': 3, '3': 3,
+}
+PRIORITY_NAMES = {1: 'high', 2: 'medium', 3: 'low'}
+DUE_TIME = time(23, 59)  # "due:fri" means by the end of Friday
+
+_TAG = re.compile(r'#(\w+)')
+_WORD = re.compile(r'\w+')
+
+class TaskFilter(NamedTuple):
+    """A parsed /todo query; every given condition must hold."""
+    tags: tuple = ()
+    completed: Optional[bool] = None
+    priority: Optional[int] = None
+    due_range: Optional[tuple] = None  # [from, to) epoch seconds; None ends are open
+    words: tuple = ()  # the task text must have a word starting with each of these
+
+def _day_range(day, tz, days=1):
+    start = datetime.combine(day, time(0, 0), tzinfo=tz)
+    return int(start.timestamp()), int((start + timedelta(days=days)).timestamp())
+
+def _due(value, tz, now):
+    parsed = parse_time(value, tz, now, default_time=DUE_TIME)
+    return int(parsed.when.timestamp()) if parsed else None
+
+def split_task_attributes(text, tz, now=None):
+    """Pull #tags, due:<date> and !<priority> out of task text.
+
+    Returns (text, tags, due, priority); hashtags stay in the text.
+    Raises ValueError for a due date or priority it can't read.
+    """
+    now = now or datetime.now(tz)
+    words, due, priority = [], None, None
+    for word in text.split():
+        lowered = word.lower()
+        if lowered.startswith('due:') and len(word) > 4:
+            due = _due(word[4:], tz, now)
+            if due is None:
+                raise ValueError(f"Can't read the due date {word[4:]!r}")
+        elif lowered.startswith('!') and len(word) > 1:
+            priority = PRIORITIES.get(lowered[1:])
+            if priority is None:
+                raise ValueError(f"Unknown priority {word!r} (use !high, !medium or !low)")
+        else:
+            words.append(word)
+    text = ' '.join(words)
+    tags = sorted({tag.casefold() for tag in _TAG.findall(text)})
+    return text, tags, due, priority
+
+def parse_task_filter(query, tz, now=None):
+    """Parse `/todo` filters: #tag, open|done, !priority, due:today|week|overdue|<date>, words."""
+    now = now or datetime.now(tz)
+    tags, words = [], []
+    completed = priority = due_range = None
+    for word in query.split():
+        lowered = word.casefold()
+        if lowered.startswith('#') and len(lowered) > 1:
+            tags.append(lowered[1:])
+        elif lowered in ('open', 'todo', 'pending'):
+            completed = False
+        elif lowered in ('done', 'completed'):
+            completed = True
+        elif lowered.startswith('!') and lowered[1:] in PRIORITIES:
+            priority = PRIORITIES[lowered[1:]]
+        elif lowered.startswith('due:'):
+            spec = lowered[4:]
+            if spec == 'overdue':
+                due_range = (None, int(now.timestamp()))
+            elif spec == 'today':
+                due_range = _day_range(now.date(), tz)
+            elif spec == 'week':
+                due_range = _day_range(now.date(), tz, days=7)
+            else:
+                parsed = parse_time(spec, tz, now)
+                if not parsed or not parsed.has_date:
+                    raise ValueError(f"Unknown due filter {word!r} (use today, week, overdue or a date)")
+                due_range = _day_range(parsed.when.date(), tz)
+        else:
+            words.extend(_WORD.findall(lowered))
+    return TaskFilter(tuple(tags), completed, priority, due_range, tuple(words))
+
+def _bits(mask):
+    """Set bit numbers of an int, lowest first."""
+    # Scanning the binary string beats peeling bits off a big int one at a time
+    bits = bin(mask)[:1:-1]
+    i = bits.find('1')
+    while i >= 0:
+        yield i
+        i = bits.find('1', i + 1)
+
+class _UserTasks:
+    """One user's tasks with bitmaps keyed by internal id.
+
+    Ids increase in file order, so `ids` stays sorted and a task's
+    position (its number in /todo) is a bisect away.
+    """
+    __slots__ = ('ids', 'records', 'next_id', 'live', 'done', 'tags', 'priorities', 'due', 'words', '_sorted_words')
+
+    def __init__(self):
+        self.ids = []
+        self.records = {}  # id -> Task
+        self.next_id = 0
+        self.live = 0
+        self.done = 0
+        self.tags = {}  # tag -> bitmap
+        self.priorities = {}  # level -> bitmap
+        self.due = []  # sorted (due epoch, id)
+        self.words = {}  # casefolded word -> bitmap
+        self._sorted_words = None  # sorted self.words keys, for prefix lookups
+
+    def add(self, task):
+        task_id = self.next_id
+        self.next_id += 1
+        self.ids.append(task_id)
+        self.records[task_id] = task
+        self._index(task_id, task)
+
+    def _index(self, task_id, task):
+        bit = 1 << task_id
+        self.live |= bit
+        for word in set(_WORD.findall(task.task.casefold())):
+            if word not in self.words:
+                self.words[word] = 0
+                self._sorted_words = None
+            self.words[word] |= bit
+        if task.completed:
+            self.done |= bit
+        for tag in task.tags or ():
+            self.tags[tag] = self.tags.get(tag, 0) | bit
+        if task.priority:
+            self.priorities[task.priority] = self.priorities.get(task.priority, 0) | bit
+        if task.due is not None:
+            insort(self.due, (task.due, task_id))
+
+    def _unindex(self, task_id, task):
+        bit = 1 << task_id
+        self.live &= ~bit
+        self.done &= ~bit
+        for word in set(_WORD.findall(task.task.casefold())):
+            self.words[word] &= ~bit
+            if not self.words[word]:
+                del self.words[word]
+                self._sorted_words = None
+        for tag in task.tags or ():
+            self.tags[tag] &= ~bit
+            if not self.tags[tag]:
+                del self.tags[tag]
+        if task.priority:
+            self.priorities[task.priority] &= ~bit
+            if not self.priorities[task.priority]:
+                del self.priorities[task.priority]
+        if task.due is not None:
+            del self.due[bisect_left(self.due, (task.due, task_id))]
+
+    def change(self, position, changes):
+        task_id = self.ids[position]
+        task = self.records[task_id]
+        self._unindex(task_id, task)
+        for field, value in changes.items():
+            setattr(task, field, value)
+        self._index(task_id, task)
+
+    def remove(self, position):
+        task_id = self.ids.pop(position)
+        self._unindex(task_id, self.records.pop(task_id))
+        if self.next_id > 2 * len(self.ids) + 64:
+            self._renumber()
+
+    def _renumber(self):
+        """Reassign dense ids so the bitmaps stop growing with deleted tasks."""
+        tasks = [self.records[task_id] for task_id in self.ids]
+        self.__init__()
+        for task in tasks:
+            self.add(task)
+
+    def _due_within(self, mask, low, high):
+        """Narrow mask to tasks due in [low, high), from whichever side is smaller."""
+        start = 0 if low is None else bisect_left(self.due, (low,))
+        end = len(self.due) if high is None else bisect_left(self.due, (high,))
+        narrowed = 0
+        if end - start <= mask.bit_count():
+            for _, task_id in self.due[start:end]:
+                narrowed |= 1 << task_id
+            return mask & narrowed
+        for task_id in _bits(mask):
+            due = self.records[task_id].due
+            if due is not None and (low is None or due >= low) and (high is None or due < high):
+                narrowed |= 1 << task_id
+        return narrowed
+
+    def _starting_with(self, prefix):
+        """Bitmap of the tasks with a word starting with prefix."""
+        if self._sorted_words is None:
+            self._sorted_words = sorted(self.words)
+        words = self._sorted_words
+        mask = 0
+        i = bisect_left(words, prefix)
+        while i < len(words) and words[i].startswith(prefix):
+            mask |= self.words[words[i]]
+            i += 1
+        return mask
+
+    def select(self, task_filter):
+        """Bitmap of the tasks matching a TaskFilter."""
+        mask = self.live
+        for word in task_filter.words:
+            mask &= self._starting_with(word)
+        for tag in task_filter.tags:
+            mask &= self.tags.get(tag, 0)
+        if task_filter.completed is True:
+            mask &= self.done
+        elif task_filter.completed is False:
+            mask &= ~self.done
+        if task_filter.priority:
+            mask &= self.priorities.get(task_filter.priority, 0)
+        if task_filter.due_range and mask:
+            mask = self._due_within(mask, *task_filter.due_range)
+        return mask
+
+    def page(self, task_filter, start, limit):
+        """([(position, Task)], total) for one page of matches."""
+        if task_filter is None:
+            ids = self.ids[start:start + limit]
+            return [(start + i, self.records[task_id]) for i, task_id in enumerate(ids)], len(self.ids)
+
+        mask = self.select(task_filter)
+        total = mask.bit_count()
+        ids = [task_id for i, task_id in zip(range(start + limit), _bits(mask)) if i >= start]
+        return [(bisect_left(self.ids, task_id), self.records[task_id]) for task_id in ids], total
+
+class TaskIndex(FileIndex):
+    """Per-user task indexes over tasks.json, kept in step by the write functions below."""
+
+    def __init__(self, filename=TASKS_FILE):
+        super().__init__(filename, self._build)
+
+    @staticmethod
+    def _build(items):
+        users = {}  # user_id -> _UserTasks
+        for item in items:
+            users.setdefault(item['user_id'], _UserTasks()).add(Task.from_storage(item))
+        return users
+
+    def user(self, user_id):
+        return self.state.setdefault(user_id, _UserTasks())
+
+tasks_index = TaskIndex()
+
+def save_task(task):
+    """Save a Task to tasks.json."""
+    save_tasks([task])
+
+def save_tasks(tasks):
+    """Save several Tasks to tasks.json in one write."""
+    tasks_index.refresh()
+    append_records(TASKS_FILE, tasks)
+    for task in tasks:
+        tasks_index.user(task.user_id).add(task)
+    tasks_index.written()
+
+def _change(user_id, task_indexes, changes):
+    tasks_index.refresh()
+    changed = update_user_items(TASKS_FILE, user_id, task_indexes, changes)
+    user = tasks_index.user(user_id)
+    for task_index in changed:
+        user.change(task_index, changes)
+    tasks_index.written()
+    return changed
+
+def update_task(user_id, task_index, new_task=None, tags=None, due=None, priority=None):
+    """Update a task's text (and the tags in it) and, if given, its due date and priority."""
+    changes = {}
+    if new_task:
+        changes['task'] = new_task
+        changes['tags'] = tags or None
+    if due is not None:
+        changes['due'] = due
+    if priority is not None:
+        changes['priority'] = priority
+    return bool(_change(user_id, [task_index], changes))
+
+def update_task_status(user_id, task_index, completed):
+    """Update task completion status (and when it was completed)."""
+    return bool(update_tasks_status(user_id, [task_index], completed))
+
+def update_tasks_status(user_id, task_indexes, completed):
+    """Mark several tasks done (or not) in one write; returns the indexes that existed."""
+    return _change(user_id, task_indexes, {
+        'completed': completed, 'completed_at': now_epoch() if completed else None
+    })
+
+def delete_task(user_id, task_index):
+    """Delete a task."""
+    return bool(delete_tasks(user_id, [task_index]))
+
+def delete_tasks(user_id, task_indexes):
+    """Delete several tasks in one write; returns the indexes that existed."""
+    tasks_index.refresh()
+    deleted = delete_user_items(TASKS_FILE, user_id, task_indexes)
+    user = tasks_index.user(user_id)
+    for task_index in reversed(deleted):
+        user.remove(task_index)
+    tasks_index.written()
+    return deleted
+
+def get_tasks(user_id):
+    """Get tasks for a specific user."""
+    return get_user_records(TASKS_FILE, user_id)
+
+def get_tasks_page(user_id, start, limit, task_filter=None):
+    """One page of a user's (optionally filtered) tasks as ([(position, Task)], start, total).
+
+    Positions are indexes into the user's whole list, so /done and
+    /edit_task numbers stay valid in filtered views. A cursor past the end
+    falls back to the last page.
+    """
+    tasks_index.refresh()
+    user = tasks_index.user(user_id)
+    page, total = user.page(task_filter, start, limit)
+    if not page and total and start > 0:
+        start = (total - 1) // limit * limit
+        page, total = user.page(task_filter, start, limit)
+    return page, start if page else 0, total
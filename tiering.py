@@ -0,0 +1,205 @@
+"""Hot/cold tiering of per-user data.
+
+Completed tasks older than COMPLETED_TASK_DAYS move to the owner's task
+history archive, where /todo history reads them back. Everything in COLD_COLLECTIONS belonging to a user
+who has not sent a command for INACTIVE_USER_DAYS moves to their cold
+archives and is restored, before the command runs, the next time they
+write to the bot. Collections that drive scheduled notifications
+(reminders, timers, birthdays, events, auto messages) always stay hot.
+"""
+import asyncio
+import gzip
+import json
+import os
+import shutil
+import tempfile
+from collections import Counter, defaultdict
+from archive import archive_name, iter_archive, discard_archive
+from records import Task
+from storage import (
+    DATA_DIR, ensure_data_dir, data_path, file_lock, file_stamp, bump_version,
+    load_json, save_json, as_epoch
+)
+
+COMPLETED_TASK_DAYS = 30
+INACTIVE_USER_DAYS = 90
+COLD_COLLECTIONS = ('tasks.json', 'goals.json', 'expenses.json', 'notes.json')
+ACTIVITY_FILE = 'user_activity.json'
+
+DAY = 86400
+
+class UserTiers:
+    """Last-seen times and cold/hot state of every user.
+
+    Activity is recorded in memory on every update and persisted by the
+    periodic tiering pass and at shutdown, so commands never pay for a
+    write; state changes (a new user, a rehydrated one) are saved at once.
+    """
+
+    def __init__(self):
+        self._users = None  # user_id -> {'last_seen': epoch, 'cold': bool}
+        self._dirty = False
+
+    def _load(self):
+        if self._users is None:
+            stored = load_json(ACTIVITY_FILE)
+            self._users = {int(k): v for k, v in stored.items()} if isinstance(stored, dict) else {}
+        return self._users
+
+    def flush(self):
+        if self._dirty:
+            save_json({str(k): v for k, v in self._load().items()}, ACTIVITY_FILE)
+            self._dirty = False
+
+    def touch(self, user_id, now):
+        """Record activity; restores the user's cold data first if they had been tiered out."""
+        users = self._load()
+        state = users.get(user_id)
+        self._dirty = True
+        if state is None:
+            users[user_id] = {'last_seen': now, 'cold': False}
+            self.flush()
+        else:
+            state['last_seen'] = now
+            if state['cold']:
+                self.rehydrate(user_id)
+
+    def rehydrate(self, user_id):
+        """Move a user's cold archives back into the hot collections.
+
+        Safe to repeat after a crash part-way: entries already back in a
+        hot collection are not restored twice.
+        """
+        for filename in COLD_COLLECTIONS:
+            archived = list(iter_archive(user_id, filename, cold=True))
+            if archived:
+                items = load_json(filename)
+                restored = _missing(archived, [item for item in items if item['user_id'] == user_id])
+                if restored:
+                    items.extend(restored)
+                    save_json(items, filename, user_id)
+            discard_archive(user_id, filename, cold=True)
+        self._load()[user_id]['cold'] = False
+        self._dirty = True
+        self.flush()
+
+    def _stage(self, staging, now, users):
+        """Split every collection and stage the results (worker thread).
+
+        users maps user_id -> (last_seen, cold) as of the start of the pass.
+        Returns (staged, going_cold, unseen, moved): staged lists
+        (target, temp path, stamp of the file it replaces), each collection's
+        archives before the collection itself.
+        """
+        inactive_after = now - INACTIVE_USER_DAYS * DAY
+        task_cutoff = now - COMPLETED_TASK_DAYS * DAY
+        staged, going_cold, unseen = [], set(), set()
+        moved = 0
+
+        def stage_archive(user_id, filename, items, cold):
+            target = archive_name(user_id, filename, cold)
+            stamp = file_stamp(target)
+            # An interrupted earlier pass may have archived some of these already
+            items = _missing(items, iter_archive(user_id, filename, cold))
+            if items:
+                tmp_path = os.path.join(staging, str(len(staged)))
+                if stamp is not None:
+                    shutil.copyfile(data_path(target), tmp_path)
+                with gzip.open(tmp_path, 'at', encoding='utf-8') as f:
+                    f.writelines(json.dumps(item) + '\n' for item in items)
+                os.makedirs(os.path.dirname(data_path(target)), exist_ok=True)
+                staged.append((target, tmp_path, stamp))
+
+        for filename in COLD_COLLECTIONS:
+            stamp = file_stamp(filename)
+            cold, history, kept = defaultdict(list), defaultdict(list), []
+            for item in load_json(filename):
+                user_id = item['user_id']
+                if user_id not in users:
+                    # Unknown users start their inactivity clock now
+                    unseen.add(user_id)
+                    kept.append(item)
+                    continue
+                last_seen, is_cold = users[user_id]
+                if is_cold or last_seen < inactive_after:
+                    cold[user_id].append(item)
+                elif (filename == 'tasks.json' and item.get('completed')
+                      and as_epoch(item.get('completed_at') or item['created_at']) < task_cutoff):
+                    history[user_id].append(item)
+                else:
+                    kept.append(item)
+            if not cold and not history:
+                continue
+            for user_id, items in history.items():
+                stage_archive(user_id, filename, items, cold=False)
+            for user_id, items in cold.items():
+                stage_archive(user_id, filename, items, cold=True)
+                going_cold.add(user_id)
+            tmp_path = os.path.join(staging, str(len(staged)))
+            with open(tmp_path, 'w') as f:
+                json.dump(kept, f, indent=2)
+            staged.append((filename, tmp_path, stamp))
+            moved += sum(map(len, cold.values())) + sum(map(len, history.values()))
+        return staged, going_cold, unseen, moved
+
+    async def tier_out(self, now):
+        """Move old completed tasks and inactive users' data to the archives.
+
+        Collections and archives are read and staged on a worker thread,
+        then swapped in on the event loop only if none of them changed and
+        no user going cold has sent a command meanwhile. Returns the number
+        of entries moved, or None if the pass was pre-empted.
+        """
+        users = self._load()
+        snapshot = {user_id: (state['last_seen'], state['cold']) for user_id, state in users.items()}
+        ensure_data_dir()
+        staging = tempfile.mkdtemp(prefix='.tiering-', dir=DATA_DIR)
+        try:
+            staged, going_cold, unseen, moved = await asyncio.to_thread(self._stage, staging, now, snapshot)
+            inactive_after = now - INACTIVE_USER_DAYS * DAY
+            if (any(file_stamp(target) != stamp for target, _, stamp in staged)
+                    or any(users[user_id]['last_seen'] >= inactive_after and not users[user_id]['cold']
+                           for user_id in going_cold)):
+                return None
+
+            for user_id in unseen:
+                if user_id not in users:
+                    users[user_id] = {'last_seen': now, 'cold': False}
+                    self._dirty = True
+            for user_id in going_cold:
+                users[user_id]['cold'] = True
+                self._dirty = True
+            # Flagged before the files move: if we stop part-way, the user's
+            # next command restores whatever reached the archives, and
+            # rehydrate skips entries that are still hot
+            self.flush()
+            for target, tmp_path, _ in staged:
+                with file_lock(target):
+                    os.replace(tmp_path, data_path(target))
+                bump_version(target)
+            return moved
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+
+def _missing(items, present):
+    """The items not already in present, counting duplicates, in their original order."""
+    counts = Counter(json.dumps(item, sort_keys=True) for item in present)
+    missing = []
+    for item in items:
+        key = json.dumps(item, sort_keys=True)
+        if counts[key]:
+            counts[key] -= 1
+        else:
+            missing.append(item)
+    return missing
+
+user_tiers = UserTiers()
+
+def get_task_history(user_id, start, limit):
+    """One page of the user's archived completed tasks, newest first, as (tasks, start, total)."""
+    archived = list(iter_archive(user_id, 'tasks.json'))
+    total = len(archived)
+    if start >= total:
+        start = max(0, (total - 1) // limit * limit)
+    newest_first = archived[::-1][start:start + limit]
+    return [Task.from_storage(item) for item in newest_first], start, total
@@ -0,0 +1,208 @@
+"""Shared parser for the time expressions users type after /remind, /timer, etc.
+
+    in 20m | in 1h30m | in 2 days
+    14:30 | 9am | 9:30pm | noon | midnight
+    today 18:00 | tonight | tomorrow 9am | tomorrow at 9am | 9am tomorrow
+    fri | next fri 14:30 | monday at noon
+    2025-03-20 | 2025-03-20 14:30 | 2025-03-20T14:30
+    12/25 | 12/25/2025 | 12/25/2025 10:00 | dec 25 | 25 dec 2025
+
+Text is matched against one precompiled grammar and reduced to a small spec
+that does not depend on the current time, so it can be memoized (users
+repeat the same few forms); the spec is then resolved against "now" in the
+user's timezone.
+"""
+import re
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import NamedTuple, Optional
+
+_UNIT_SECONDS = {
+    'w': 604800, 'week': 604800, 'weeks': 604800,
+    'd': 86400, 'day': 86400, 'days': 86400,
+    'h': 3600, 'hr': 3600, 'hrs': 3600, 'hour': 3600, 'hours': 3600,
+    'm': 60, 'min': 60, 'mins': 60, 'minute': 60, 'minutes': 60,
+}
+_UNIT = r'(?:weeks?|w|days?|d|hours?|hrs?|hr|h|minutes?|mins?|m)'
+_DURATION_PART = re.compile(rf'(\d+)\s*({_UNIT})(?![a-z])')
+_DURATION = re.compile(rf'^(?:in\s+)?((?:\d+\s*{_UNIT}(?![a-z])\s*)+)$')
+
+_DAY_OFFSETS = {'today': 0, 'tonight': 0, 'tomorrow': 1, 'tmrw': 1, 'tmr': 1}
+_WEEKDAYS = {
+    'mon': 0, 'monday': 0, 'tue': 1, 'tues': 1, 'tuesday': 1,
+    'wed': 2, 'weds': 2, 'wednesday': 2, 'thu': 3, 'thur': 3, 'thurs': 3, 'thursday': 3,
+    'fri': 4, 'friday': 4, 'sat': 5, 'saturday': 5, 'sun': 6, 'sunday': 6,
+}
+_MONTHS = {
+    'jan': 1, 'january': 1, 'feb': 2, 'february': 2, 'mar': 3, 'march': 3,
+    'apr': 4, 'april': 4, 'may': 5, 'jun': 6, 'june': 6, 'jul': 7, 'july': 7,
+    'aug': 8, 'august': 8, 'sep': 9, 'sept': 9, 'september': 9, 'oct': 10, 'october': 10,
+    'nov': 11, 'november': 11, 'dec': 12, 'december': 12,
+}
+
+def _words(names):
+    # Longest first so "monday" isn't matched as "mon" + leftovers
+    return '|'.join(sorted(names, key=len, reverse=True))
+
+_DATE = (
+    r'(?:(?P<dayword>today|tonight|tomorrow|tmrw|tmr)'
+    rf'|(?P<next>next\s+)?(?P<weekday>{_words(_WEEKDAYS)})'
+    r'|(?P<iso>(?P<iy>\d{4})-(?P<im>\d{1,2})-(?P<id>\d{1,2}))'
+    r'|(?P<us>(?P<um>\d{1,2})/(?P<ud>\d{1,2})(?:/(?P<uy>\d{4}))?)'
+    rf'|(?P<mon1>{_words(_MONTHS)})\.?\s+(?P<mday1>\d{{1,2}})(?:,?\s+(?P<year1>\d{{4}}))?'
+    rf'|(?P<mday2>\d{{1,2}})\s+(?P<mon2>{_words(_MONTHS)})(?:\s+(?P<year2>\d{{4}}))?)'
+)
+_TIME = (
+    r'(?:(?P<noon>noon)|(?P<midnight>midnight)'
+    r'|(?P<hour>\d{1,2})(?::(?P<minute>\d{2}))?\s*(?P<ampm>am|pm)'
+    r'|(?P<hour24>\d{1,2}):(?P<minute24>\d{2}))'
+)
+_EXPRESSION = re.compile(rf'^(?:at\s+)?(?:{_DATE})?(?:\s*(?:t|,|at\s|\s)\s*)?(?:{_TIME})?$')
+_TIME_FIRST = re.compile(rf'^(?:at\s+)?{_TIME}\s+(?:on\s+)?{_DATE}$')  # "9am tomorrow"
+
+# Time used for "tonight" when no time is given
+TONIGHT = (20, 0)
+
+class ParsedTime(NamedTuple):
+    """A resolved time expression."""
+    when: datetime  # aware, in the caller's timezone (midnight if no time was given)
+    has_date: bool  # a day was named ("tomorrow", "fri", "12/25", ...)
+    has_time: bool  # a time of day was given (or implied, as by "in 20m")
+    offset: Optional[int] = None  # seconds from now, for "in ..." expressions
+
+def _normalize(text):
+    return ' '.join(text.lower().split())
+
+def _duration_seconds(text):
+    match = _DURATION.match(text)
+    if not match:
+        return None
+    return sum(int(n) * _UNIT_SECONDS[unit] for n, unit in _DURATION_PART.findall(match.group(1)))
+
+def _time_spec(m):
+    if m['noon']:
+        return (12, 0)
+    if m['midnight']:
+        return (0, 0)
+    if m['hour'] is not None:
+        hour, minute = int(m['hour']), int(m['minute'] or 0)
+        if not 1 <= hour <= 12 or minute > 59:
+            return False
+        return (hour % 12 + (12 if m['ampm'] == 'pm' else 0), minute)
+    if m['hour24'] is not None:
+        hour, minute = int(m['hour24']), int(m['minute24'])
+        if hour > 23 or minute > 59:
+            return False
+        return (hour, minute)
+    return None
+
+def _date_spec(m):
+    try:
+        if m['dayword']:
+            return ('rel', _DAY_OFFSETS[m['dayword']])
+        if m['weekday']:
+            return ('weekday', _WEEKDAYS[m['weekday']], bool(m['next']))
+        if m['iso']:
+            date(int(m['iy']), int(m['im']), int(m['id']))
+            return ('ymd', int(m['iy']), int(m['im']), int(m['id']))
+        if m['us']:
+            month, day, year = int(m['um']), int(m['ud']), m['uy']
+        elif m['mon1']:
+            month, day, year = _MONTHS[m['mon1']], int(m['mday1']), m['year1']
+        elif m['mon2']:
+            month, day, year = _MONTHS[m['mon2']], int(m['mday2']), m['year2']
+        else:
+            return None
+        if year:
+            date(int(year), month, day)
+            return ('ymd', int(year), month, day)
+        date(2000, month, day)  # leap year, so 02/29 is accepted
+        return ('md', month, day)
+    except ValueError:
+        return False
+
+@lru_cache(maxsize=4096)
+def _parse_spec(text):
+    """Match normalized text against the grammar; returns a now-independent spec or None."""
+    if text.startswith('in '):
+        seconds = _duration_seconds(text)
+        return ('offset', seconds) if seconds else None
+
+    m = _EXPRESSION.match(text) or _TIME_FIRST.match(text)
+    if not m:
+        return None
+    day, clock = _date_spec(m), _time_spec(m)
+    if day is False or clock is False or (day is None and clock is None):
+        return None
+    if clock is None and m['dayword'] == 'tonight':
+        clock = TONIGHT
+    return ('at', day, clock)
+
+def next_month_day(month, day, today):
+    """The next date (today or later) falling on month/day; 02/29 waits for a leap year."""
+    year = today.year
+    while True:
+        try:
+            target = date(year, month, day)
+        except ValueError:  # Feb 29 outside a leap year
+            year += 1
+            continue
+        if target >= today:
+            return target
+        year += 1
+
+def _resolve(spec, now, default_time):
+    if spec[0] == 'offset':
+        return ParsedTime(now + timedelta(seconds=spec[1]), False, True, spec[1])
+
+    _, day, clock = spec
+    clock_time = time(*clock) if clock else default_time or time(0, 0)
+    today = now.date()
+
+    if day is None:
+        when = datetime.combine(today, clock_time, tzinfo=now.tzinfo)
+        if when <= now:  # a bare time that already passed means tomorrow
+            when += timedelta(days=1)
+        return ParsedTime(when, False, True)
+
+    kind = day[0]
+    if kind == 'rel':
+        target = today + timedelta(days=day[1])
+    elif kind == 'weekday':
+        delta = (day[1] - today.weekday()) % 7
+        if delta == 0 and (day[2] or (clock and datetime.combine(today, clock_time, tzinfo=now.tzinfo) <= now)):
+            delta = 7
+        target = today + timedelta(days=delta)
+    elif kind == 'ymd':
+        target = date(day[1], day[2], day[3])
+    else:  # 'md'
+        target = next_month_day(day[1], day[2], today)
+    return ParsedTime(datetime.combine(target, clock_time, tzinfo=now.tzinfo), True, clock is not None)
+
+def parse_time(text, tz, now=None, default_time=None):
+    """Parse a whole time expression in timezone tz; returns a ParsedTime or None.
+
+    default_time (a datetime.time) fills in the time of day for date-only input.
+    """
+    spec = _parse_spec(_normalize(text))
+    if spec is None:
+        return None
+    return _resolve(spec, now or datetime.now(tz), default_time)
+
+def parse_leading(words, tz, now=None, default_time=None, max_words=5):
+    """Parse the longest time expression at the start of a word list.
+
+    Returns (ParsedTime, remaining_words), or (None, words) if none matches.
+    """
+    for n in range(min(len(words), max_words), 0, -1):
+        parsed = parse_time(' '.join(words[:n]), tz, now, default_time)
+        if parsed is not None:
+            return parsed, list(words[n:])
+    return None, list(words)
+
+def parse_duration(text):
+    """Seconds in a duration such as "20", "20m", "1h30m" or "in 2 hours" (a bare number is minutes)."""
+    text = _normalize(text)
+    if text.isdigit():
+        return int(text) * 60
+    return _duration_seconds(text) or None
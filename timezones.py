@@ -0,0 +1,60 @@
+from datetime import datetime
+from functools import lru_cache
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from storage import load_json, save_json, as_epoch
+
+# The bot used to assume everyone was in IST; it stays the default
+DEFAULT_TIMEZONE = 'Asia/Kolkata'
+SETTINGS_FILE = 'user_settings.json'
+
+_user_timezones = None  # user_id -> IANA name, loaded once from SETTINGS_FILE
+
+@lru_cache(maxsize=None)
+def get_zone(name):
+    """Cached ZoneInfo for an IANA name; raises ValueError if it is unknown."""
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        raise ValueError(f"Unknown timezone: {name}")
+
+def _timezones():
+    global _user_timezones
+    if _user_timezones is None:
+        _user_timezones = {
+            s['user_id']: s['timezone'] for s in load_json(SETTINGS_FILE) if s.get('timezone')
+        }
+    return _user_timezones
+
+def user_timezone_name(user_id):
+    return _timezones().get(user_id, DEFAULT_TIMEZONE)
+
+def user_zone(user_id):
+    """The user's tzinfo (IST unless they chose another with /timezone)."""
+    return get_zone(user_timezone_name(user_id))
+
+def set_user_timezone(user_id, name):
+    """Validate and persist a user's timezone; returns the ZoneInfo."""
+    zone = get_zone(name)
+    settings = load_json(SETTINGS_FILE)
+    for entry in settings:
+        if entry['user_id'] == user_id:
+            entry['timezone'] = zone.key
+            break
+    else:
+        settings.append({'user_id': user_id, 'timezone': zone.key})
+    save_json(settings, SETTINGS_FILE, user_id)
+    _timezones()[user_id] = zone.key
+    return zone
+
+def local_now(user_id):
+    """Current time in the user's timezone."""
+    return datetime.now(user_zone(user_id))
+
+def local_time(epoch, user_id):
+    """Aware datetime for a stored timestamp in the user's timezone."""
+    return datetime.fromtimestamp(as_epoch(epoch), user_zone(user_id))
+
+def format_local(epoch, user_id, fmt='%Y-%m-%d %I:%M %p'):
+    """Format a stored timestamp in the user's timezone, with its abbreviation."""
+    local = local_time(epoch, user_id)
+    return f"{local.strftime(fmt)} {local.tzname()}"
@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import os
+import random
+import time
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Endpoints can be pointed at stub_upstream.py for offline benchmarking
+WEATHER_URL = os.environ.get('OPENWEATHERMAP_URL', 'http://api.openweathermap.org/data/2.5')
+NEWS_URL = os.environ.get('NEWS_API_URL', 'https://newsapi.org/v2/top-headlines')
+TRANSLATE_URL = os.environ.get('MYMEMORY_URL', 'https://api.mymemory.translated.net/get')
+
+# Offline fallbacks served when an upstream is down or its breaker is open
+SIMULATED_NEWS = {
+    "general": [
+        {"title": "Daily Update", "description": "Latest events and updates from around the world"},
+        {"title": "Community News", "description": "Local developments and announcements"}
+    ],
+    "technology": [
+        {"title": "Tech Innovation", "description": "Latest technological breakthroughs and updates"},
+        {"title": "Digital Trends", "description": "Current trends in the digital world"}
+    ]
+}
+
+FALLBACK_TRANSLATIONS = {
+    'hi': {'hello': 'नमस्ते', 'world': 'दुनिया', 'how are you': 'आप कैसे हैं'},
+    'es': {'hello': 'hola', 'world': 'mundo', 'how are you': '¿cómo estás?'},
+    'fr': {'hello': 'bonjour', 'world': 'monde', 'how are you': 'comment allez-vous?'},
+    'de': {'hello': 'hallo', 'world': 'welt', 'how are you': 'wie geht es dir?'}
+}
+
+def offline_translate(text, lang):
+    """Word-by-word translation from the built-in phrase table."""
+    words = text.lower().split()
+    return ' '.join(FALLBACK_TRANSLATIONS.get(lang, {}).get(word, word) for word in words)
+
+class UpstreamError(Exception):
+    """Raised for transport failures and retryable (5xx/429) responses."""
+
+class CircuitBreaker:
+    """Closed/open/half-open breaker guarding a single upstream."""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow_request(self):
+        """Return True if a call may go out now."""
+        if self.state == self.OPEN:
+            if self.clock() - self.opened_at < self.reset_timeout:
+                return False
+            # Cooldown elapsed: let a single probe through
+            self.state = self.HALF_OPEN
+            self._probe_in_flight = False
+        if self.state == self.HALF_OPEN:
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+        return True
+
+    def release_probe(self):
+        """Free the half-open probe slot if the probe ended without a recorded outcome."""
+        self._probe_in_flight = False
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = self.clock()
+            self._probe_in_flight = False
+
+class RetryBudget:
+    """Token bucket limiting retries and hedges to a fraction of traffic."""
+
+    def __init__(self, ratio=0.2, max_tokens=10.0):
+        self.ratio = ratio
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+
+    def deposit(self):
+        """Credit the budget for one first-attempt request."""
+        self.tokens = min(self.max_tokens, self.tokens + self.ratio)
+
+    def withdraw(self):
+        """Spend one token on a retry/hedge; False if the budget is exhausted."""
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class Upstream:
+    """A third-party API with its own breaker, retry budget and stale cache."""
+
+    def __init__(self, name, timeout=5.0, deadline=8.0, max_attempts=3,
+                 backoff_base=0.2, backoff_cap=2.0, hedge_after=None,
+                 cache_ttl=600, cache_size=256, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.timeout = timeout
+        self.deadline = deadline
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.hedge_after = hedge_after
+        self.cache_ttl = cache_ttl
+        self.cache_size = cache_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        self.budget = RetryBudget()
+        self.session = requests.Session()
+        self._cache = {}
+        self.stats = {
+            'calls': 0, 'failures': 0, 'retries': 0, 'hedges': 0,
+            'short_circuits': 0, 'stale_hits': 0
+        }
+
+    async def get(self, url, params=None):
+        """GET through the breaker; returns a response, a cached response or None.
+
+        Non-retryable client errors (e.g. 404 for an unknown city) are returned
+        as-is so callers can report them; they do not count against the breaker.
+        """
+        params = params or {}
+        key = (url, tuple(sorted(params.items())))
+        if not self.breaker.allow_request():
+            self.stats['short_circuits'] += 1
+            return self._cached(key)
+
+        probing = self.breaker.state == CircuitBreaker.HALF_OPEN
+        self.budget.deposit()
+        started = time.monotonic()
+        try:
+            for attempt in range(self.max_attempts):
+                self.stats['calls'] += 1
+                try:
+                    if self.hedge_after is not None:
+                        response = await self._hedged(url, params)
+                    else:
+                        response = await self._fetch(url, params)
+                except UpstreamError as e:
+                    self.stats['failures'] += 1
+                    self.breaker.record_failure()
+                    logger.warning("%s upstream failed (attempt %d): %s", self.name, attempt + 1, e)
+                    delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                    out_of_time = time.monotonic() - started + delay + self.timeout > self.deadline
+                    if (attempt + 1 == self.max_attempts or out_of_time
+                            or not self.breaker.allow_request() or not self.budget.withdraw()):
+                        break
+                    self.stats['retries'] += 1
+                    await asyncio.sleep(delay)
+                    continue
+
+                self.breaker.record_success()
+                if response.status_code == 200:
+                    self._cache.pop(key, None)
+                    self._cache[key] = (time.monotonic(), response)
+                    if len(self._cache) > self.cache_size:
+                        self._cache.pop(next(iter(self._cache)))
+                return response
+        finally:
+            if probing:
+                # A probe cancelled or failed in some unexpected way must not block the next one
+                self.breaker.release_probe()
+        return self._cached(key)
+
+    async def _fetch(self, url, params):
+        try:
+            response = await asyncio.to_thread(
+                self.session.get, url, params=params, timeout=self.timeout
+            )
+        except requests.RequestException as e:
+            raise UpstreamError(str(e)) from e
+        if response.status_code >= 500 or response.status_code == 429:
+            raise UpstreamError(f"HTTP {response.status_code}")
+        return response
+
+    async def _hedged(self, url, params):
+        """Send a second copy if the first is slower than hedge_after; first success wins."""
+        first = asyncio.ensure_future(self._fetch(url, params))
+        done, _ = await asyncio.wait({first}, timeout=self.hedge_after)
+        if done or not self.budget.withdraw():
+            return await first
+
+        self.stats['hedges'] += 1
+        pending = {first, asyncio.ensure_future(self._fetch(url, params))}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    def _cached(self, key):
+        entry = self._cache.get(key)
+        if entry and time.monotonic() - entry[0] <= self.cache_ttl:
+            self.stats['stale_hits'] += 1
+            return entry[1]
+        return None
+
+weather_api = Upstream('weather')
+news_api = Upstream('news')
+translation_api = Upstream('translation', hedge_after=0.8)
@@ -1,62 +1,121 @@
-from datetime import datetime, timedelta
-
-def parse_time(time_str):
-    """Parse time string into datetime object in IST."""
-    today = datetime.now() + timedelta(hours=5, minutes=30)  # Convert to IST
-    try:
-        # Try parsing as HH:MM
-        time = datetime.strptime(time_str, "%H:%M")
-        # Set to today's date
-        result = datetime.combine(today.date(), time.time())
-        # If the time has already passed today, set it for tomorrow
-        if result < today:
-            result += timedelta(days=1)
-        return result
-    except ValueError:
-        try:
-            # Try parsing as MM/DD/YYYY HH:MM
-            return datetime.strptime(time_str, "%m/%d/%Y %H:%M") + timedelta(hours=5, minutes=30)
-        except ValueError:
-            return None
-
-def format_task_list(tasks):
-    """Format task list for display with IST timestamps."""
-    if not tasks:
-        return "No tasks found!"
-
-    formatted = "📝 Your Tasks:\n\n"
-    for i, task in enumerate(tasks, 1):
-        status = "✅" if task['completed'] else "⬜️"
-        # Convert timestamp to IST
-        created_time = datetime.fromisoformat(task['created_at']) + timedelta(hours=5, minutes=30)
-        formatted += f"{i}. {status} {task['task']}\n"
-        formatted += f"   Created: {created_time.strftime('%Y-%m-%d %I:%M %p')} IST\n"
-        formatted += f"   /edit_task_{i} | /delete_task_{i}\n\n"
-
-    return formatted
-
-def format_reminder_list(reminders):
-    """Format reminder list for display with IST timestamps."""
-    if not reminders:
+import re
+from timezones import format_local, local_time
+
+# Items per page in list views; keeps every page well under Telegram's 4096 chars
+PAGE_SIZE = 10
+MAX_ITEM_CHARS = 300
+MAX_BATCH = 100  # items one batch command may touch
+
+_NUMBER_SEPARATORS = re.compile(r'[\s,]+')
+
+def clip(text, limit=MAX_ITEM_CHARS):
+    """Shorten text for list views."""
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+def parse_numbers(args):
+    """Zero-based indexes, sorted and unique, from list numbers like "1 3 5-8" or "2,4".
+
+    Raises ValueError for anything that isn't a number or range, or for
+    more than MAX_BATCH numbers.
+    """
+    indexes = set()
+    for part in _NUMBER_SEPARATORS.split(' '.join(args).strip()):
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        if not first.isdigit() or (dash and not last.isdigit()):
+            raise ValueError(f"Can't read {part!r}")
+        first, last = int(first), int(last) if dash else int(first)
+        if first < 1 or last < first:
+            raise ValueError(f"Can't read {part!r}")
+        if len(indexes) + last - first + 1 > MAX_BATCH:
+            raise ValueError(f"That's more than {MAX_BATCH} items at once")
+        indexes.update(range(first - 1, last))
+    if not indexes:
+        raise ValueError("No numbers given")
+    return sorted(indexes)
+
+def format_numbers(indexes):
+    """List numbers for zero-based indexes, e.g. "2, 5, 9"."""
+    return ', '.join(str(index + 1) for index in indexes)
+
+def _page_heading(title, start, count, total):
+    if count == total:
+        return f"{title}:\n"
+    return f"{title} ({start + 1}-{start + count} of {total}):\n"
+
+PRIORITY_MARKS = {1: "🔴 ", 2: "🟡 ", 3: "🟢 "}
+
+def format_task_page(tasks, start, total, user_id, title="📝 Your Tasks"):
+    """Format one page of (position, task) pairs in the user's timezone.
+
+    Tasks keep their number in the full list, so filtered pages can skip numbers.
+    """
+    if not total:
+        return "No tasks found!" if title == "📝 Your Tasks" else "No tasks match!"
+
+    lines = [_page_heading(title, start, len(tasks), total)]
+    for position, task in tasks:
+        i = position + 1
+        status = "✅" if task.completed else "⬜️"
+        due = f"   Due: {format_local(task.due, user_id, '%a %Y-%m-%d %I:%M %p')}\n" if task.due else ""
+        lines.append(
+            f"{i}. {status} {PRIORITY_MARKS.get(task.priority, '')}{clip(task.task)}\n"
+            f"{due}"
+            f"   Created: {format_local(task.created_at, user_id)}\n"
+            f"   /edit_task_{i} | /delete_task_{i}\n"
+        )
+    return "\n".join(lines)
+
+def format_task_history_page(tasks, start, total, user_id):
+    """Format one page of archived completed tasks."""
+    if not total:
+        return "No archived tasks yet! Completed tasks move here after 30 days."
+
+    lines = [_page_heading("🗄 Completed Task History", start, len(tasks), total)]
+    for task in tasks:
+        completed = task.completed_at or task.created_at
+        lines.append(
+            f"✅ {PRIORITY_MARKS.get(task.priority, '')}{clip(task.task)}\n"
+            + (f"   Completed: {format_local(completed, user_id)}\n" if completed else "")
+        )
+    return "\n".join(lines)
+
+def format_size(size):
+    return f"{size} B" if size < 1024 else f"{size / 1024:.1f} KB"
+
+def format_note_page(notes, start, total, user_id):
+    """Format one page of note titles (bodies are opened with the buttons)."""
+    if not total:
+        return "No notes found!"
+
+    lines = [_page_heading("📝 Your Notes", start, len(notes), total)]
+    for i, note in enumerate(notes, start + 1):
+        created = f", {format_local(note.created_at, user_id, '%Y-%m-%d')}" if note.created_at else ""
+        lines.append(
+            f"{i}. 📌 {clip(note.title, 100)} ({format_size(note.size or 0)}{created})\n"
+            f"   /edit_note_{i} | /delete_note_{i}\n"
+        )
+    return "\n".join(lines)
+
+def format_reminder_page(reminders, start, total, user_id):
+    """Format one page of reminders in the user's timezone; numbering continues from start."""
+    if not total:
         return "No reminders found!"
 
-    formatted = "⏰ Your Reminders:\n\n"
-    for i, reminder in enumerate(reminders, 1):
-        # Convert timestamp to IST
-        reminder_time = datetime.fromisoformat(reminder['time']) + timedelta(hours=5, minutes=30)
-        formatted += f"{i}. {reminder_time.strftime('%Y-%m-%d %I:%M %p')} IST - {reminder['message']}\n"
-        formatted += f"   /edit_reminder_{i} | /delete_reminder_{i}\n\n"
-
-    return formatted
-
-def to_ist(utc_time):
-    """Convert UTC datetime to IST."""
-    if isinstance(utc_time, str):
-        utc_time = datetime.fromisoformat(utc_time)
-    return utc_time + timedelta(hours=5, minutes=30)
-
-def from_ist(ist_time):
-    """Convert IST datetime to UTC for storage."""
-    if isinstance(ist_time, str):
-        ist_time = datetime.fromisoformat(ist_time)
-    return ist_time - timedelta(hours=5, minutes=30)
\ No newline at end of file
+    lines = [_page_heading("⏰ Your Reminders", start, len(reminders), total)]
+    for i, reminder in enumerate(reminders, start + 1):
+        lines.append(
+            f"{i}. {format_local(reminder.time, user_id)} - {clip(reminder.message)}\n"
+            f"   /edit_reminder_{i} | /delete_reminder_{i}\n"
+        )
+    return "\n".join(lines)
+
+def format_password_services(services, heading, user_id):
+    """Render stored services (metadata only) as a message."""
+    text = f"{heading}\n\n"
+    for entry in services:
+        stored = entry.get('created_at')
+        stored = local_time(stored, user_id).strftime('%Y-%m-%d') if stored else ''
+        text += f"🔑 {entry['service']}" + (f" (stored {stored})" if stored else "") + "\n"
+    return text + "\nUse /password get <service> to retrieve one."
@@ -0,0 +1,241 @@
+import asyncio
+import base64
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.fernet import Fernet, InvalidToken, MultiFernet
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from storage import DATA_DIR, ensure_data_dir, load_json, save_json, path_stamp
+
+KEYRING_FILE = os.environ.get('VAULT_KEYRING', os.path.join(DATA_DIR, 'vault_keys.json'))
+SALTS_FILE = 'vault_salts.json'
+
+# Records encrypted with a per-user key derived from the master key
+USER_KDF = 'pbkdf2-user-v1'
+USER_KDF_ITERATIONS = 100000
+USER_KEY_CACHE_SIZE = 1024
+
+# PBKDF2 releases the GIL, so a small thread pool keeps the event loop free
+_kdf_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='vault-kdf')
+
+def key_id_for(key):
+    """Short, stable identifier for a Fernet key (stored with each record)."""
+    if isinstance(key, str):
+        key = key.encode()
+    return hashlib.sha256(key).hexdigest()[:12]
+
+def derive_user_key(master_key, salt, iterations=USER_KDF_ITERATIONS):
+    """Derive a user's Fernet key from the master key and their salt."""
+    kdf = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt, iterations=iterations)
+    return base64.urlsafe_b64encode(kdf.derive(base64.urlsafe_b64decode(master_key)))
+
+class PasswordVault:
+    """Encrypts passwords with keys from ENCRYPTION_KEY and/or a persisted keyring.
+
+    The keyring survives restarts, so stored passwords stay readable. Each
+    record carries the id of the master key that encrypted it; records
+    written before key ids existed are tried against every known key.
+
+    New records use a per-user key derived from the master key and a
+    per-user salt. Derived keys are kept in a bounded LRU, and cache misses
+    are derived on a worker thread so the event loop never runs the KDF.
+
+    The keyring is re-read whenever its file changes, so a key added or
+    retired by key_rotation.py reaches a running bot on its next
+    encrypt, decrypt or rotation check.
+    """
+
+    def __init__(self, keyring_file=KEYRING_FILE, cache_size=USER_KEY_CACHE_SIZE,
+                 iterations=USER_KDF_ITERATIONS):
+        self.keyring_file = keyring_file
+        self.keys = {}  # key_id -> base64 key
+        self.active_key_id = None
+        self._keyring_stamp = None
+        self._fernets = {}
+        self.cache_size = cache_size
+        self.iterations = iterations
+        self._user_fernets = OrderedDict()  # (key_id, user_id) -> Fernet
+        self._pending = {}  # (key_id, user_id) -> Future of an in-flight derivation
+        self._salts = None
+        self._salts_lock = threading.Lock()
+        self.derivations = 0
+        self._load_keys()
+
+    def _load_keys(self):
+        self._keyring_stamp = path_stamp(self.keyring_file)
+        keyring = self._read_keyring()
+        if keyring is None:
+            keyring = self._create_keyring()
+            self._keyring_stamp = path_stamp(self.keyring_file)
+        self._use_keyring(keyring)
+
+        # A newly configured ENCRYPTION_KEY becomes the active key; older
+        # keys stay in the keyring so existing records keep decrypting
+        # until the rotation job has re-encrypted them.
+        env_key = os.environ.get('ENCRYPTION_KEY')
+        if env_key and key_id_for(env_key) not in self.keys:
+            self.add_key(env_key)
+
+    def _use_keyring(self, keyring):
+        self.keys = dict(keyring['keys'])
+        self.active_key_id = keyring['active']
+        # Forget anything derived from a key that has been retired
+        self._fernets = {kid: f for kid, f in self._fernets.items() if kid in self.keys}
+        self._user_fernets = OrderedDict(
+            (ck, f) for ck, f in self._user_fernets.items() if ck[0] in self.keys
+        )
+
+    def refresh(self):
+        """Re-read the keyring if another process (e.g. key_rotation.py) changed it."""
+        stamp = path_stamp(self.keyring_file)
+        if stamp is None or stamp == self._keyring_stamp:
+            return
+        self._keyring_stamp = stamp
+        self._use_keyring(self._read_keyring())
+
+    def _read_keyring(self):
+        if not os.path.exists(self.keyring_file):
+            return None
+        with open(self.keyring_file, 'r') as f:
+            return json.load(f)
+
+    def _create_keyring(self):
+        """Persist a fresh random key; no KDF needed since Fernet keys are already random."""
+        ensure_data_dir()
+        key = os.environ.get('ENCRYPTION_KEY') or Fernet.generate_key().decode()
+        keyring = {'active': key_id_for(key), 'keys': {key_id_for(key): key}}
+        try:
+            fd = os.open(self.keyring_file, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            # Another process created it first; use theirs
+            return self._read_keyring()
+        with os.fdopen(fd, 'w') as f:
+            json.dump(keyring, f, indent=2)
+        return keyring
+
+    def _write_keyring(self):
+        tmp_path = f"{self.keyring_file}.tmp"
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'active': self.active_key_id, 'keys': self.keys}, f, indent=2)
+        os.replace(tmp_path, self.keyring_file)
+        self._keyring_stamp = path_stamp(self.keyring_file)
+
+    def add_key(self, key=None):
+        """Add a master key (random if not given), make it active and persist the keyring."""
+        self.refresh()
+        key = key or Fernet.generate_key().decode()
+        key_id = key_id_for(key)
+        self.keys[key_id] = key
+        self.active_key_id = key_id
+        self._write_keyring()
+        return key_id
+
+    def retire_keys(self, keep):
+        """Drop every master key not in `keep`; the caller checks that no record uses them."""
+        self.refresh()
+        self._use_keyring({
+            'active': self.active_key_id,
+            'keys': {kid: key for kid, key in self.keys.items() if kid in keep}
+        })
+        self._write_keyring()
+
+    def fernet(self, key_id):
+        fernet = self._fernets.get(key_id)
+        if fernet is None:
+            fernet = self._fernets[key_id] = Fernet(self.keys[key_id])
+        return fernet
+
+    def encrypt(self, password: str):
+        """Encrypt a password; returns (token, key_id)."""
+        token = self.fernet(self.active_key_id).encrypt(password.encode()).decode()
+        return token, self.active_key_id
+
+    def decrypt(self, token: str, key_id=None):
+        """Decrypt a password, or return None if no known key opens it."""
+        try:
+            if key_id in self.keys:
+                return self.fernet(key_id).decrypt(token.encode()).decode()
+            fernets = [self.fernet(kid) for kid in self.keys]
+            return MultiFernet(fernets).decrypt(token.encode()).decode()
+        except (InvalidToken, ValueError):
+            return None
+
+    def user_salt(self, user_id):
+        """Return the user's salt, creating and persisting one on first use."""
+        with self._salts_lock:
+            if self._salts is None:
+                self._salts = load_json(SALTS_FILE) or {}
+            salt = self._salts.get(str(user_id))
+            if salt is None:
+                salt = self._salts[str(user_id)] = base64.b64encode(os.urandom(16)).decode()
+                save_json(self._salts, SALTS_FILE)
+        return base64.b64decode(salt)
+
+    def _derive(self, user_id, key_id):
+        """Cold path, run on the KDF pool: salt lookup/creation plus PBKDF2."""
+        return derive_user_key(self.keys[key_id], self.user_salt(user_id), self.iterations)
+
+    async def user_fernet(self, user_id, key_id=None):
+        """Per-user Fernet for a master key, from the LRU or derived off-loop."""
+        key_id = key_id or self.active_key_id
+        cache_key = (key_id, user_id)
+        fernet = self._user_fernets.get(cache_key)
+        if fernet is not None:
+            self._user_fernets.move_to_end(cache_key)
+            return fernet
+
+        # Concurrent misses for the same user share one derivation
+        pending = self._pending.get(cache_key)
+        if pending is None:
+            loop = asyncio.get_running_loop()
+            pending = self._pending[cache_key] = loop.run_in_executor(
+                _kdf_executor, self._derive, user_id, key_id
+            )
+            self.derivations += 1
+        try:
+            fernet = Fernet(await pending)
+        finally:
+            self._pending.pop(cache_key, None)
+
+        self._user_fernets[cache_key] = fernet
+        self._user_fernets.move_to_end(cache_key)
+        while len(self._user_fernets) > self.cache_size:
+            self._user_fernets.popitem(last=False)
+        return fernet
+
+    async def encrypt_for(self, user_id, password: str):
+        """Encrypt with the user's key; returns (token, key_id, kdf)."""
+        self.refresh()
+        key_id = self.active_key_id  # a rotation may activate another key while we wait
+        fernet = await self.user_fernet(user_id, key_id)
+        return fernet.encrypt(password.encode()).decode(), key_id, USER_KDF
+
+    async def decrypt_for(self, user_id, token: str, key_id=None, kdf=None):
+        """Decrypt a record written by encrypt_for (or a legacy master-key record)."""
+        self.refresh()
+        if kdf != USER_KDF:
+            return self.decrypt(token, key_id)
+        if key_id not in self.keys:
+            return None
+        try:
+            fernet = await self.user_fernet(user_id, key_id)
+            return fernet.decrypt(token.encode()).decode()
+        except (InvalidToken, ValueError):
+            return None
+
+_vault = None
+_vault_lock = threading.Lock()
+
+def get_vault():
+    """Return the shared vault, loading keys on first use rather than at import."""
+    global _vault
+    if _vault is None:
+        with _vault_lock:
+            if _vault is None:
+                _vault = PasswordVault()
+    return _vault
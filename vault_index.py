@@ -0,0 +1,107 @@
+import bisect
+import logging
+from storage import FileIndex, iter_json_array, save_json
+
+PASSWORDS_FILE = 'passwords.json'
+
+logger = logging.getLogger(__name__)
+
+class _Passwords:
+    """Records by (user_id, service) in file order, and each user's sorted services."""
+    __slots__ = ('records', 'services')
+
+    def __init__(self):
+        self.records = {}  # (user_id, service) -> record
+        self.services = {}  # user_id -> sorted [(service.casefold(), service)]
+
+class VaultIndex(FileIndex):
+    """In-memory index over passwords.json keyed by (user_id, service).
+
+    Listing and prefix search only touch plaintext metadata; the encrypted
+    password is decrypted solely by get_password. The file is streamed in
+    when the index is built, and rebuilt if it is replaced behind the
+    index's back (e.g. by key rotation).
+    """
+
+    def __init__(self, filename=PASSWORDS_FILE):
+        super().__init__(filename, self._build, iter_json_array)
+
+    def _build(self, records):
+        state = _Passwords()
+        duplicates = 0
+        for record in records:
+            key = (record['user_id'], record['service'])
+            if key in state.records:  # first entry wins, as before
+                duplicates += 1
+                continue
+            state.records[key] = record
+            state.services.setdefault(record['user_id'], []).append(
+                (record['service'].casefold(), record['service'])
+            )
+        if duplicates:
+            logger.warning(
+                "%s has %d duplicate (user, service) entries; keeping the first of each, "
+                "the rest are dropped on the next write", self.filename, duplicates
+            )
+        for services in state.services.values():
+            services.sort()
+        return state
+
+    def _save(self):
+        save_json(list(self.state.records.values()), self.filename)
+        self.written()
+
+    def get(self, user_id, service):
+        state = self.refresh()
+        return state.records.get((user_id, service))
+
+    def put(self, record):
+        """Insert or replace the record for (user_id, service) and persist.
+
+        Returns True if an existing password for the service was replaced.
+        """
+        state = self.refresh()
+        key = (record['user_id'], record['service'])
+        replaced = key in state.records
+        if not replaced:
+            bisect.insort(
+                state.services.setdefault(record['user_id'], []),
+                (record['service'].casefold(), record['service'])
+            )
+        state.records[key] = record
+        self._save()
+        return replaced
+
+    def remove(self, user_id, service):
+        state = self.refresh()
+        if state.records.pop((user_id, service), None) is None:
+            return False
+        services = state.services[user_id]
+        entry = (service.casefold(), service)
+        del services[bisect.bisect_left(services, entry)]
+        self._save()
+        return True
+
+    def list_services(self, user_id):
+        """Metadata for all of a user's services, sorted case-insensitively."""
+        state = self.refresh()
+        return [self._metadata(user_id, service) for _, service in state.services.get(user_id, [])]
+
+    def find(self, user_id, prefix):
+        """Metadata for services starting with prefix (case-insensitive)."""
+        state = self.refresh()
+        services = state.services.get(user_id, [])
+        folded = prefix.casefold()
+        start = bisect.bisect_left(services, (folded,))
+        matches = []
+        for key, service in services[start:]:
+            if not key.startswith(folded):
+                break
+            matches.append(self._metadata(user_id, service))
+        return matches
+
+    def _metadata(self, user_id, service):
+        record = self.state.records[(user_id, service)]
+        return {'service': service, 'created_at': record.get('created_at')}
+
+vault_index = VaultIndex()
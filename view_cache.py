@@ -0,0 +1,52 @@
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from storage import collection_version
+
+VIEW_CACHE_SIZE = 2048
+
+def next_midnight(now):
+    """Start of the day after an aware datetime, in epoch seconds.
+
+    Views showing "Today"/"In N days" expire here.
+    """
+    midnight = datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), tzinfo=now.tzinfo)
+    return midnight.timestamp()
+
+class ViewCache:
+    """Bounded LRU of rendered per-user views.
+
+    An entry is reused only while the versions of the collections it was
+    rendered from are unchanged (storage bumps them on every write) and its
+    optional expiry time has not passed.
+    """
+
+    def __init__(self, max_entries=VIEW_CACHE_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # (user_id, view, args) -> (versions, expires_at, value)
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_render(self, user_id, view, args, collections, render):
+        """Return the cached view or call render(), which returns (value, expires_at epoch)."""
+        key = (user_id, view, args)
+        # Read versions before rendering so a write racing the render invalidates it
+        versions = tuple(collection_version(filename, user_id) for filename in collections)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == versions and (entry[1] is None or time.time() < entry[1]):
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+        self.misses += 1
+        value, expires_at = render()
+        self._entries[key] = (versions, expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def stats(self):
+        return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+view_cache = ViewCache()